@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+"""Script to create and restore backups of the MateBot database
+
+Backups are consistent snapshots of all tables, stored as gzip-compressed
+JSON lines. Creating a backup doesn't lock the tables, so the bot may keep
+running. The bot should be powered off while a backup is being restored.
+"""
+
+
+def main():
+    """
+    Create or restore a backup depending on the command line arguments
+    """
+
+    import argparse
+    import logging.config
+
+    from mate_bot.config import config
+    from mate_bot.state import backup
+    from mate_bot.state.dbhelper import BackendHelper
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    dump = commands.add_parser("dump", help="write a snapshot of the database into an archive")
+    dump.add_argument("path", help="path of the archive, e.g. backup.jsonl.gz")
+    restore = commands.add_parser("restore", help="load an archive into the database")
+    restore.add_argument("path", help="path of the archive")
+    restore.add_argument("--replace", action="store_true", help="delete existing rows before loading")
+    args = parser.parse_args()
+
+    logging.config.dictConfig(config["logging"])
+    BackendHelper.db_config = config["database"]
+
+    if args.command == "dump":
+        counts = backup.dump(args.path)
+    else:
+        counts = backup.restore(args.path, args.replace)
+
+    for table, count in counts.items():
+        print("{}: {} rows".format(table, count))
+
+
+if __name__ == "__main__":
+    main()
+else:
+    raise ImportError("Do not import this script!")
@@ -32,6 +32,7 @@ CREATE TABLE collectives (
     `communistic` BOOLEAN NOT NULL,
     `creator` INT NOT NULL,
     `created` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    `changed` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (creator) REFERENCES users(id) ON DELETE CASCADE
 );
 
@@ -49,6 +50,7 @@ CREATE TABLE collective_messages (
     `collectives_id` INT NOT NULL,
     `chat_id` BIGINT NOT NULL,
     `msg_id` INT NOT NULL,
+    UNIQUE KEY (collectives_id, chat_id),
     FOREIGN KEY (collectives_id) REFERENCES collectives(id) ON DELETE CASCADE
 );
 
@@ -60,3 +62,58 @@ CREATE TABLE externals (
     FOREIGN KEY (internal) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (external) REFERENCES users(id) ON DELETE CASCADE
 );
+
+CREATE TABLE consumptions (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `transactions_id` INT NOT NULL UNIQUE,
+    `consumable` VARCHAR(255) NOT NULL,
+    `quantity` SMALLINT NOT NULL,
+    `amount` MEDIUMINT NOT NULL,
+    `registered` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE consumptions_daily (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `day` DATE NOT NULL,
+    `consumable` VARCHAR(255) NOT NULL,
+    `quantity` INT NOT NULL,
+    `amount` INT NOT NULL,
+    UNIQUE KEY (day, consumable)
+);
+
+CREATE TABLE consumptions_weekly (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `week` DATE NOT NULL,
+    `consumable` VARCHAR(255) NOT NULL,
+    `quantity` INT NOT NULL,
+    `amount` INT NOT NULL,
+    UNIQUE KEY (week, consumable)
+);
+
+CREATE TABLE balances_daily (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `users_id` INT NOT NULL,
+    `day` DATE NOT NULL,
+    `balance` MEDIUMINT NOT NULL,
+    UNIQUE KEY (users_id, day),
+    FOREIGN KEY (users_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE transactions_archive (
+    `id` INT NOT NULL PRIMARY KEY,
+    `sender` INT NOT NULL,
+    `receiver` INT NOT NULL,
+    `amount` MEDIUMINT NOT NULL,
+    `reason` VARCHAR(255),
+    `registered` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (sender) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (receiver) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE balance_checkpoints (
+    `id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT,
+    `users_id` INT NOT NULL UNIQUE,
+    `balance` INT NOT NULL,
+    `transactions_id` INT NOT NULL,
+    FOREIGN KEY (users_id) REFERENCES users(id) ON DELETE CASCADE
+);
@@ -1,82 +1,194 @@
 #!/usr/bin/env python3
 
+import time
+
+# taken before all other imports, so that the startup report includes their costs
+STARTED = time.perf_counter()
+
+import sys
+import signal
 import typing
 import logging.config
 
-from telegram.ext import (
-    Updater, Dispatcher, CommandHandler,
-    CallbackQueryHandler, InlineQueryHandler
-)
+import telegram
+from telegram.ext import Updater
 
 from mate_bot import err
+from mate_bot import metrics
 from mate_bot import registry
 from mate_bot.config import config
-from mate_bot.commands.handler import FilteredChosenInlineResultHandler
+from mate_bot.outbound import outbound_queue
+from mate_bot.profiling import profiler
+from mate_bot.webhook import start_webhook
+from mate_bot.collectives.expiry import schedule_expiry
+from mate_bot.state.archive import schedule_archival
+from mate_bot.commands.handler import RouterHandler
 from mate_bot.state.dbhelper import BackendHelper
+from mate_bot.state.transactions import transaction_digest
+from mate_bot.throttle import throttle
+from mate_bot.tracing import tracer
 
 
-handler_types = typing.Union[
-    typing.Type[CommandHandler],
-    typing.Type[CallbackQueryHandler],
-    typing.Type[InlineQueryHandler],
-    typing.Type[FilteredChosenInlineResultHandler]
-]
+class NoDebugFilter(logging.Filter):
+    """
+    Logging filter that filters out any DEBUG message for the specified logger or handler
+    """
+
+    def filter(self, record: logging.LogRecord) -> int:
+        if super().filter(record):
+            return record.levelno > logging.DEBUG
+        return True
 
 
-def _add(dispatcher: Dispatcher, handler: handler_types, pool: dict, pattern: bool = True) -> None:
+class StartupTimer:
     """
-    Add the executors from the given pool to the dispatcher using the given handler type
-
-    :param dispatcher: Telegram's dispatcher to add the executor to
-    :type dispatcher: telegram.ext.Dispatcher
-    :param handler: type of the handler (subclass of ``telegram.ext.Handler``)
-    :type handler: handler_types
-    :param pool: collection of all executors for one handler type
-    :type pool: dict
-    :param pattern: switch whether the keys of the pool are patterns or names
-    :type pattern: bool
-    :return: None
+    Measure the duration of the different phases during the startup of the bot
+
+    :param start: optional ``time.perf_counter()`` value when the first phase started (defaults to now)
+    :type start: typing.Optional[float]
     """
 
-    logger.info(f"Adding {handler.__name__} executors...")
-    for name in pool:
-        if pattern:
-            dispatcher.add_handler(handler(pool[name], pattern=name))
-        else:
-            dispatcher.add_handler(handler(name, pool[name]))
+    def __init__(self, start: typing.Optional[float] = None):
+        self._phases: typing.List[typing.Tuple[str, float]] = []
+        self._last = time.perf_counter() if start is None else start
 
+    def __call__(self, phase: str) -> None:
+        """
+        Mark the end of the phase that started with the end of the previous phase
 
-class NoDebugFilter(logging.Filter):
+        :param phase: name of the phase that just finished
+        :type phase: str
+        :return: None
+        """
+
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self, log: logging.Logger) -> None:
+        """
+        Log the durations of all phases and the total startup time
+
+        :param log: logger that receives the report
+        :type log: logging.Logger
+        :return: None
+        """
+
+        total = sum(duration for _, duration in self._phases)
+        details = ", ".join(f"{phase}: {duration * 1000:.1f}ms" for phase, duration in self._phases)
+        log.info(f"Startup took {total * 1000:.1f}ms ({details})")
+
+
+def toggle_profiling(signum: int, frame: typing.Any) -> None:
     """
-    Logging filter that filters out any DEBUG message for the specified logger or handler
+    Signal handler that starts profiling or stops the active profiling session
+
+    :param signum: number of the received signal
+    :type signum: int
+    :param frame: current stack frame
+    :type frame: typing.Any
+    :return: None
     """
 
-    def filter(self, record: logging.LogRecord) -> int:
-        if super().filter(record):
-            return record.levelno > logging.DEBUG
-        return True
+    if profiler.active:
+        profiler.stop()
+    else:
+        settings = config["profiling"]
+        profiler.start(settings["updates"], settings["seconds"], settings["directory"])
 
 
 if __name__ == "__main__":
+    timer = StartupTimer(STARTED)
+    timer("imports")
     logging.config.dictConfig(config["logging"])
     for handler in logging.root.handlers:
         handler.addFilter(NoDebugFilter("telegram"))
     logger = logging.getLogger()
+    timer("logging")
+
     BackendHelper.db_config = config["database"]
     BackendHelper.query_logger = logging.getLogger("database")
-    BackendHelper.get_value("users")
+    if not BackendHelper.check_connection():
+        logger.critical("Database connection check failed! Exiting.")
+        sys.exit(1)
+    timer("database")
 
     logger.debug("Registering bot token with Updater...")
-    updater = Updater(config["token"], use_context = True)
+    request = metrics.InstrumentedRequest(con_pool_size = 8)
+    updater = Updater(bot = telegram.Bot(config["token"], request = request), use_context = True)
 
     logger.info("Adding error handler...")
     updater.dispatcher.add_error_handler(err.log_error)
+    timer("updater")
+
+    logger.info("Adding router handler for all executors...")
+    updater.dispatcher.add_handler(RouterHandler(
+        registry.commands,
+        registry.callback_queries,
+        registry.inline_queries,
+        registry.inline_results
+    ))
+    timer("handlers")
+
+    logger.info("Scheduling expiry of stale collectives...")
+    schedule_expiry(updater.job_queue)
+
+    logger.info("Scheduling transaction digests...")
+    transaction_digest.schedule(updater.job_queue)
+
+    logger.info("Scheduling archival of old transactions...")
+    schedule_archival(updater.job_queue)
+
+    logger.info("Starting outbound queue...")
+    outbound_queue.start()
+    timer("jobs")
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, toggle_profiling)
+
+    tracer.configure(config["tracing"])
+    if tracer.enabled:
+        logger.info("Starting trace exporter...")
+        tracer.start()
+
+    if config["metrics"]["enabled"]:
+        logger.info("Starting metrics server...")
+        metrics.registry.register(metrics.Gauge(
+            "matebot_outbound_queue_length",
+            "Number of messages waiting in the outbound queue",
+            function = lambda: len(outbound_queue)
+        ))
+        metrics.registry.register(metrics.Gauge(
+            "matebot_update_queue_length",
+            "Number of updates waiting to be processed by the dispatcher",
+            function = updater.dispatcher.update_queue.qsize
+        ))
+        metrics.registry.register(metrics.Gauge(
+            "matebot_workers",
+            "Number of threads in the thread pool of the dispatcher",
+            function = lambda: updater.dispatcher.workers
+        ))
+        metrics.registry.add_collector(metrics.throttle_collector(throttle))
+        metrics.MetricsServer(config["metrics"]["listen"], config["metrics"]["port"]).start()
+        timer("metrics")
+
+    if config["webhook"]["enabled"]:
+        logger.info("Starting bot using webhooks...")
+        start_webhook(updater, config["webhook"])
+    else:
+        logger.info("Starting bot using polling...")
+        updater.start_polling()
+    timer("start")
+    timer.report(logger)
+    updater.idle()
 
-    _add(updater.dispatcher, CommandHandler, registry.commands, False)
-    _add(updater.dispatcher, CallbackQueryHandler, registry.callback_queries, True)
-    _add(updater.dispatcher, InlineQueryHandler, registry.inline_queries, True)
-    _add(updater.dispatcher, FilteredChosenInlineResultHandler, registry.inline_results, True)
+    logger.info("Sending remaining transaction digests...")
+    transaction_digest.flush()
 
-    logger.info("Starting bot...")
-    updater.start_polling()
-    updater.idle()
+    logger.info("Sending remaining outbound messages...")
+    outbound_queue.stop()
+    request.stop()
+
+    logger.info("Exporting remaining traces...")
+    tracer.stop()
+    profiler.stop()
@@ -0,0 +1,182 @@
+"""
+MateBot codec for compact and versioned callback data of inline keyboards
+"""
+
+import re
+import string
+import typing
+
+
+MAX_CALLBACK_DATA = 64
+
+_DIGITS = string.digits + string.ascii_lowercase
+
+
+def _to_base36(value: int) -> str:
+    """
+    Convert an integer to its base 36 representation using lowercase letters
+
+    :param value: any integer
+    :type value: int
+    :return: string representation in base 36
+    :rtype: str
+    """
+
+    if value < 0:
+        return "-" + _to_base36(-value)
+    result = ""
+    while True:
+        value, digit = divmod(value, 36)
+        result = _DIGITS[digit] + result
+        if value == 0:
+            return result
+
+
+class CallbackCodec:
+    """
+    Encoder and decoder of the callback data for the buttons of one executor
+
+    The callback data starts with the name of the executor, followed by the
+    format version, the action's code and the fields of the action, each
+    separated by a colon (e.g. ``"communism:1:0:g"``). The action's code is
+    its position in the ``actions`` dictionary, integer fields are stored
+    in base 36 and choice fields store the position of the chosen value,
+    which keeps the data well below the limit of 64 bytes imposed by Telegram.
+    Therefore, the version must be increased whenever the actions or their
+    fields are reordered or changed, since older buttons may still exist.
+
+    Buttons sent before the introduction of this codec used a space-separated
+    format (e.g. ``"communism toggle 16"``) with the action's name, decimal
+    integers and the names of the choices. This format is still accepted as
+    version ``0`` as long as the order of the fields didn't change.
+
+    One regular expression for all actions is compiled when creating the
+    codec, so that decoding needs a single match. The callback data is
+    rejected when the version is unknown, the action is unknown or the
+    number or format of the fields do not fit to the action.
+
+    :param name: name of the executor, which is also the prefix of the data
+    :type name: str
+    :param actions: dict of action names and tuples of their field types,
+        where a field type is either ``int`` or a tuple of allowed strings
+    :type actions: typing.Dict[str, tuple]
+    :param version: format version of the encoded data (must be positive)
+    :type version: int
+    :raises ValueError: when the name, an action or a field type is invalid
+    """
+
+    SEPARATOR = ":"
+
+    def __init__(self, name: str, actions: typing.Dict[str, tuple], version: int = 1):
+        if not re.fullmatch(r"\w+", name):
+            raise ValueError(f"Invalid callback codec name: {name!r}")
+        if version < 1:
+            raise ValueError("The version of a callback codec must be positive")
+        if len(actions) > len(_DIGITS):
+            raise ValueError(f"Too many actions for callback codec {name!r}")
+
+        self.name = name
+        self.version = version
+        self.actions = actions
+        self._codes = {}
+        self._groups = {}
+
+        current = []
+        legacy = []
+        for index, (action, fields) in enumerate(actions.items()):
+            if not re.fullmatch(r"\w+", action):
+                raise ValueError(f"Invalid action name: {action!r}")
+
+            code = _DIGITS[index]
+            self._codes[action] = code
+            current_fields = ""
+            legacy_fields = ""
+            for field in fields:
+                if field is int:
+                    current_fields += r":(-?[0-9a-z]+)"
+                    legacy_fields += r" (-?\d+)"
+                elif isinstance(field, tuple) and 0 < len(field) <= len(_DIGITS):
+                    current_fields += r":([0-9a-z])"
+                    legacy_fields += " (" + "|".join(map(re.escape, field)) + ")"
+                else:
+                    raise ValueError(f"Invalid field type {field!r} of action {action!r}")
+
+            current.append((f"c{index}", f"{code}{current_fields}", action, fields, False))
+            legacy.append((f"l{index}", f"{action}{legacy_fields}", action, fields, True))
+
+        group = 1
+        for key, _, action, fields, is_legacy in current + legacy:
+            self._groups[key] = (action, fields, group + 1, is_legacy)
+            group += len(fields) + 1
+
+        def alternatives(specs: list) -> str:
+            return "|".join(f"(?P<{key}>{regex})" for key, regex, *_ in specs)
+
+        self._pattern = re.compile(
+            f"{re.escape(name)}(?:"
+            f"{self.SEPARATOR}{version}{self.SEPARATOR}(?:{alternatives(current)})"
+            f"| (?:{alternatives(legacy)})"
+            f")"
+        )
+
+    def encode(self, action: str, *fields: typing.Union[int, str]) -> str:
+        """
+        Encode the action and its fields into callback data
+
+        :param action: name of the action
+        :type action: str
+        :param fields: values of the fields of the action
+        :type fields: typing.Union[int, str]
+        :return: callback data string
+        :rtype: str
+        :raises KeyError: when the action is unknown
+        :raises ValueError: when the fields don't fit the action or the data is too long
+        """
+
+        types = self.actions[action]
+        if len(fields) != len(types):
+            raise ValueError(f"Action {action!r} expects {len(types)} fields, got {len(fields)}")
+
+        parts = [self.name, str(self.version), self._codes[action]]
+        for value, field in zip(fields, types):
+            if field is int:
+                if not isinstance(value, int):
+                    raise ValueError(f"Expected integer field for action {action!r}, got {value!r}")
+                parts.append(_to_base36(value))
+            else:
+                parts.append(_DIGITS[field.index(value)])
+
+        data = self.SEPARATOR.join(parts)
+        if len(data.encode("UTF-8")) > MAX_CALLBACK_DATA:
+            raise ValueError(f"Callback data {data!r} exceeds {MAX_CALLBACK_DATA} bytes")
+        return data
+
+    def decode(self, data: str) -> typing.Optional[typing.Tuple[str, tuple]]:
+        """
+        Decode callback data into the action and its typed fields
+
+        :param data: callback data string of an incoming callback query
+        :type data: str
+        :return: tuple of the action's name and the tuple of its fields or None if invalid
+        :rtype: typing.Optional[typing.Tuple[str, tuple]]
+        """
+
+        match = self._pattern.fullmatch(data.strip())
+        if match is None:
+            return None
+
+        action, types, first, legacy = self._groups[match.lastgroup]
+        values = []
+        for offset, field in enumerate(types):
+            value = match.group(first + offset)
+            if field is int:
+                values.append(int(value, 10 if legacy else 36))
+            elif legacy:
+                values.append(value)
+            else:
+                index = int(value, 36)
+                if index >= len(field):
+                    return None
+                values.append(field[index])
+
+        return action, tuple(values)
@@ -12,6 +12,8 @@ import telegram
 
 from mate_bot import err
 from mate_bot.config import config
+from mate_bot.outbound import outbound_queue, PRIORITY_USER
+from mate_bot.collectives.cache import render_cache
 from mate_bot.collectives.coordinators import MessageCoordinator, UserCoordinator
 from mate_bot.state.user import MateBotUser
 from mate_bot.state.dbhelper import EXECUTE_TYPE as _EXECUTE_TYPE
@@ -341,6 +343,7 @@ class BaseCollective(MessageCoordinator, UserCoordinator):
             raise RuntimeError("Operation not allowed")
 
         self.set_value("collectives", column, self._id, value)
+        render_cache.invalidate(self._id)
 
     def _get_remote_record(self) -> _EXECUTE_TYPE:
         """
@@ -430,6 +433,7 @@ class BaseCollective(MessageCoordinator, UserCoordinator):
                     connection.close()
 
             self._active = False
+            render_cache.invalidate(self._id)
 
             return True
         return False
@@ -508,6 +512,9 @@ class BaseCollective(MessageCoordinator, UserCoordinator):
         ])
 
         if rows == 1:
+            if result and self._created is not None:
+                render_cache.invalidate(self._id)
+
             self._active = record["active"]
             self._amount = record["amount"]
             self._externals = record["externals"]
@@ -518,6 +525,49 @@ class BaseCollective(MessageCoordinator, UserCoordinator):
 
         return result and rows == 1
 
+    def edit_message(
+            self,
+            chat: int,
+            msg: int,
+            content: str,
+            markup: telegram.InlineKeyboardMarkup,
+            bot: telegram.Bot,
+            parse_mode: str = "Markdown"
+    ) -> None:
+        """
+        Edit the content of one collective message using the outbound queue
+
+        The edit is sent asynchronously. A pending edit of the same
+        message will be replaced by this one, so that outdated content
+        never overwrites a newer version of the message.
+
+        :param chat: Telegram Chat ID
+        :type chat: int
+        :param msg: Telegram Message ID inside the specified chat
+        :type msg: int
+        :param content: message context as text (with support according to ``parse_mode``
+        :type content: str
+        :param markup: inline keyboard that should be used for the message
+        :type markup: telegram.InlineKeyboardMarkup
+        :param bot: Telegram Bot object
+        :type bot: telegram.Bot
+        :param parse_mode: parse mode of the message content (default: Markdown)
+        :type parse_mode: str
+        :return: None
+        """
+
+        outbound_queue.submit(
+            chat,
+            bot.edit_message_text,
+            content,
+            chat_id=chat,
+            message_id=msg,
+            reply_markup=markup,
+            parse_mode=parse_mode,
+            priority=PRIORITY_USER,
+            key=("edit", chat, msg)
+        )
+
     def edit_all_messages(
             self,
             content: str,
@@ -528,6 +578,8 @@ class BaseCollective(MessageCoordinator, UserCoordinator):
         """
         Edit the content of the collective messages in all chats
 
+        See :meth:`edit_message` for details about the asynchronous editing.
+
         :param content: message context as text (with support according to ``parse_mode``
         :type content: str
         :param markup: inline keyboard that should be used for the messages
@@ -539,29 +591,8 @@ class BaseCollective(MessageCoordinator, UserCoordinator):
         :return: None
         """
 
-        static_error_message = (
-            "Message is not modified: specified new message content and reply markup "
-            "are exactly the same as a current content and reply markup of the message"
-        )
-
         for c, m in self.get_messages():
-            try:
-                bot.edit_message_text(
-                    content,
-                    chat_id=c,
-                    message_id=m,
-                    reply_markup=markup,
-                    parse_mode=parse_mode
-                )
-
-            except telegram.error.BadRequest as exc:
-                if str(exc) == static_error_message:
-                    logger.warning(
-                        "Ignoring telegram.error.BadRequest exception in edit_all_messages",
-                        exc_info=True
-                    )
-                else:
-                    raise
+            self.edit_message(c, m, content, markup, bot, parse_mode)
 
     def forward(
             self,
@@ -598,15 +629,15 @@ class BaseCollective(MessageCoordinator, UserCoordinator):
         )
 
         for c, m in self.get_messages(forwarded.chat_id):
-            bot.edit_message_text(
-                chat_id=c,
-                message_id=m,
-                text=self.get_markdown(
+            self.edit_message(
+                c,
+                m,
+                self.get_markdown(
                     "_\nThis management message has been disabled. Look below in this "
                     "chat to get a more recent version with updated content._"
                 ),
-                reply_markup=telegram.InlineKeyboardMarkup([]),
-                parse_mode="Markdown"
+                telegram.InlineKeyboardMarkup([]),
+                bot
             )
 
         self.replace_message(forwarded.chat_id, forwarded.message_id)
@@ -0,0 +1,156 @@
+"""
+MateBot render cache for collective management messages
+"""
+
+import typing
+import functools
+import threading
+import collections
+
+from mate_bot.state.user import add_update_hook
+
+
+class RenderCache:
+    """
+    Cache of rendered management messages and inline keyboards of collective operations
+
+    Every collective operation has a state version that is increased whenever
+    the collective changes (e.g. a user joined or the number of externals changed).
+    Rendered values are stored together with the version they were created for.
+    A cached value is only returned when its version still matches the current
+    version of the collective, so that outdated messages are never re-used.
+    Use :meth:`invalidate` after changing or closing a collective operation.
+
+    The cache is bounded by the number of collectives it stores entries for.
+    When the limit is exceeded, the least recently used collective is evicted.
+
+    :param size: maximum number of collective operations with cached entries
+    :type size: int
+    """
+
+    def __init__(self, size: int = 256):
+        if not isinstance(size, int):
+            raise TypeError(f"Expected int as size, not {type(size)}")
+        if size <= 0:
+            raise ValueError("The size of the cache must be positive")
+
+        self._size = size
+        self._lock = threading.Lock()
+        self._versions: typing.Dict[int, int] = {}
+        self._entries: typing.OrderedDict[int, typing.Dict[typing.Hashable, typing.Any]] = collections.OrderedDict()
+
+    def __contains__(self, collective_id: int) -> bool:
+        with self._lock:
+            return collective_id in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def version(self, collective_id: int) -> int:
+        """
+        Get the current state version of the collective operation
+
+        :param collective_id: internal ID of the collective operation
+        :type collective_id: int
+        :return: current state version (starting with zero)
+        :rtype: int
+        """
+
+        with self._lock:
+            return self._versions.get(collective_id, 0)
+
+    def fetch(
+            self,
+            collective_id: int,
+            key: typing.Hashable,
+            factory: typing.Callable[[], typing.Any]
+    ) -> typing.Any:
+        """
+        Return the cached value for the key or create and store it using the factory
+
+        The factory is called without holding the lock of the cache. If the
+        collective was invalidated while the factory was running, the new
+        value is returned but not stored, because it might already be outdated.
+
+        :param collective_id: internal ID of the collective operation
+        :type collective_id: int
+        :param key: identifier of the rendered value (e.g. the method name and its arguments)
+        :type key: typing.Hashable
+        :param factory: callable without arguments that renders the value
+        :type factory: typing.Callable[[], typing.Any]
+        :return: cached or freshly rendered value
+        """
+
+        with self._lock:
+            version = self._versions.get(collective_id, 0)
+            entries = self._entries.get(collective_id)
+            if entries is not None and key in entries:
+                self._entries.move_to_end(collective_id)
+                return entries[key]
+
+        value = factory()
+
+        with self._lock:
+            if self._versions.get(collective_id, 0) == version:
+                self._entries.setdefault(collective_id, {})[key] = value
+                self._entries.move_to_end(collective_id)
+                while len(self._entries) > self._size:
+                    self._entries.popitem(last=False)
+
+        return value
+
+    def invalidate(self, collective_id: int) -> None:
+        """
+        Increase the state version of the collective and drop its cached entries
+
+        :param collective_id: internal ID of the collective operation
+        :type collective_id: int
+        :return: None
+        """
+
+        with self._lock:
+            self._versions[collective_id] = self._versions.get(collective_id, 0) + 1
+            self._entries.pop(collective_id, None)
+
+    def clear(self) -> None:
+        """
+        Drop all cached entries of all collective operations
+
+        :return: None
+        """
+
+        with self._lock:
+            for collective_id in self._entries:
+                self._versions[collective_id] = self._versions.get(collective_id, 0) + 1
+            self._entries.clear()
+
+
+render_cache = RenderCache()
+
+# Names of users are part of the rendered messages
+add_update_hook(lambda uid, column: render_cache.clear())
+
+
+def cached_rendering(func: typing.Callable) -> typing.Callable:
+    """
+    Decorate a rendering method of a collective operation to use the :data:`render_cache`
+
+    The wrapped method is called with the collective operation as first
+    argument and optional hashable positional arguments. The cache key
+    is built from the method's name and those arguments. Inactive or
+    not yet created collective operations are always rendered freshly.
+
+    :param func: method of a collective that renders a message or a keyboard
+    :type func: typing.Callable
+    :return: wrapped method using the render cache
+    :rtype: typing.Callable
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        if self.get() is None or not self.active:
+            return func(self, *args)
+        return render_cache.fetch(self.get(), (func.__name__,) + args, lambda: func(self, *args))
+
+    return wrapper
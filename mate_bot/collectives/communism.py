@@ -7,7 +7,9 @@ import logging
 
 import telegram
 
+from mate_bot.codec import CallbackCodec
 from mate_bot.collectives.base import BaseCollective, COLLECTIVE_ARGUMENTS
+from mate_bot.collectives.cache import cached_rendering
 from mate_bot.state.transactions import LoggedTransaction
 
 
@@ -35,6 +37,14 @@ class Communism(BaseCollective):
         attribute ``_communistic`` (which is ``None`` by default and should be set properly)
     """
 
+    callback_codec = CallbackCodec("communism", {
+        "toggle": (int,),
+        "increase": (int,),
+        "decrease": (int,),
+        "accept": (int,),
+        "cancel": (int,)
+    })
+
     _communistic = True
 
     _ALLOWED_COLUMNS = ["externals", "active"]
@@ -46,6 +56,7 @@ class Communism(BaseCollective):
         if isinstance(arguments, tuple):
             self.add_user(arguments[0])
 
+    @cached_rendering
     def get_core_info(self) -> str:
         """
         Retrieve the core information for the communism description message
@@ -67,6 +78,7 @@ class Communism(BaseCollective):
             f"Joined users: {usernames}\n"
         )
 
+    @cached_rendering
     def get_markdown(self, status: typing.Optional[str] = None) -> str:
         """
         Generate the full message text as markdown string
@@ -100,6 +112,7 @@ class Communism(BaseCollective):
 
         return markdown
 
+    @cached_rendering
     def _get_inline_keyboard(self) -> telegram.InlineKeyboardMarkup:
         """
         Get the inline keyboard to control the communism
@@ -112,7 +125,7 @@ class Communism(BaseCollective):
             return telegram.InlineKeyboardMarkup([])
 
         def f(c):
-            return f"communism {c} {self.get()}"
+            return self.callback_codec.encode(c, self.get())
 
         return telegram.InlineKeyboardMarkup([
             [
@@ -144,19 +157,17 @@ class Communism(BaseCollective):
 
         messages = self.get_messages(message.chat.id)
         for msg in messages:
-            message.bot.edit_message_text(
+            self.edit_message(
+                msg[0],
+                msg[1],
                 f"*Communism by {self.creator.name}*\n\n{self.get_core_info()}"
                 "\n_This communism management message is not active anymore. "
                 "A more recent message has been sent to the chat to replace this one._",
-                chat_id=msg[0],
-                message_id=msg[1],
-                parse_mode="Markdown",
-                reply_to_message_id=reply.message_id,
-                reply_markup=telegram.InlineKeyboardMarkup([])
+                telegram.InlineKeyboardMarkup([]),
+                message.bot
             )
-            self.unregister_message(msg[0], msg[1])
 
-        self.register_message(message.chat.id, reply.message_id)
+        self.replace_message(message.chat.id, reply.message_id)
         self.edit_all_messages(
             self.get_markdown(),
             self._get_inline_keyboard(),
@@ -215,7 +226,7 @@ class Communism(BaseCollective):
 
         self._fulfilled = True
         self.edit_all_messages(self.get_markdown(), self._get_inline_keyboard(), bot)
-        [self.unregister_message(c, m) for c, m in self.get_messages()]
+        self.unregister_all_messages()
 
         return True
 
@@ -234,7 +245,7 @@ class Communism(BaseCollective):
 
         self._fulfilled = False
         self.edit_all_messages(self.get_markdown(), self._get_inline_keyboard(), bot)
-        [self.unregister_message(c, m) for c, m in self.get_messages()]
+        self.unregister_all_messages()
 
         return True
 
@@ -6,6 +6,7 @@ import typing
 
 
 from mate_bot import err
+from mate_bot.collectives.cache import render_cache
 from mate_bot.state.dbhelper import BackendHelper
 from mate_bot.state.user import MateBotUser
 
@@ -33,13 +34,15 @@ class MessageCoordinator(BackendHelper):
             if not isinstance(chat, int):
                 raise TypeError("Expected optional integer as argument")
 
-        result = []
-        for record in self.get_values_by_key("collective_messages", "collectives_id", self._id)[1]:
-            result.append((record["chat_id"], record["msg_id"]))
+        if chat is None:
+            records = self.get_values_by_key("collective_messages", "collectives_id", self._id)[1]
+        else:
+            records = self._execute(
+                "SELECT chat_id, msg_id FROM collective_messages WHERE collectives_id=%s AND chat_id=%s",
+                (self._id, chat)
+            )[1]
 
-        if chat is not None:
-            result = list(filter(lambda r: r[0] == chat, result))
-        return result
+        return [(record["chat_id"], record["msg_id"]) for record in records]
 
     def register_message(self, chat: int, msg: int) -> bool:
         """
@@ -61,12 +64,8 @@ class MessageCoordinator(BackendHelper):
         if not isinstance(chat, int) or not isinstance(msg, int):
             raise TypeError("Expected integers as arguments")
 
-        for record in self.get_messages():
-            if record[0] == chat:
-                return False
-
         return self._execute(
-            "INSERT INTO collective_messages (collectives_id, chat_id, msg_id) VALUES (%s, %s, %s)",
+            "INSERT IGNORE INTO collective_messages (collectives_id, chat_id, msg_id) VALUES (%s, %s, %s)",
             (self._id, chat, msg)
         )[0] == 1
 
@@ -95,17 +94,42 @@ class MessageCoordinator(BackendHelper):
             (self._id, chat, msg)
         )[0] == 1
 
+    def unregister_all_messages(self, chat: typing.Optional[int] = None) -> int:
+        """
+        Unregister all Telegram messages for the current collective at once
+
+        :param chat: when given, only the message in this chat will be unregistered
+        :type chat: typing.Optional[int]
+        :return: number of unregistered messages
+        :rtype: int
+        :raises TypeError: when the chat ID is no integer
+        """
+
+        if chat is None:
+            return self._execute(
+                "DELETE FROM collective_messages WHERE collectives_id=%s",
+                (self._id,)
+            )[0]
+
+        if not isinstance(chat, int):
+            raise TypeError("Expected optional integer as argument")
+
+        return self._execute(
+            "DELETE FROM collective_messages WHERE collectives_id=%s AND chat_id=%s",
+            (self._id, chat)
+        )[0]
+
     def replace_message(self, chat: int, msg: int) -> bool:
         """
         Replace the currently stored message in the chat with the new ID
 
-        Note that it is important to verify the return value of this
-        method. It will not raise exceptions in case the specified chat
-        didn't store any old message, it will silently create the record.
+        This method will silently create the record in case the specified
+        chat didn't store any old message. The operation is therefore
+        idempotent and always leaves exactly one message for the chat.
 
         :param chat: Telegram Chat ID
         :type chat: int
-        :param msg: old Telegram Message ID inside the specified chat
+        :param msg: new Telegram Message ID inside the specified chat
         :type msg: int
         :return: success of the operation
         :rtype: bool
@@ -115,11 +139,11 @@ class MessageCoordinator(BackendHelper):
         if not isinstance(chat, int) or not isinstance(msg, int):
             raise TypeError("Expected integers as arguments")
 
-        if not self._execute(
-            "UPDATE collective_messages SET msg_id=%s WHERE collectives_id=%s AND chat_id=%s",
-            (msg, self._id, chat)
-        )[0]:
-            return self.register_message(chat, msg)
+        self._execute(
+            "INSERT INTO collective_messages (collectives_id, chat_id, msg_id) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE msg_id=VALUES(msg_id)",
+            (self._id, chat, msg)
+        )
         return True
 
 
@@ -144,6 +168,15 @@ class UserCoordinator(BackendHelper):
             raise TypeError("Expected integer or MateBotUser instance")
         return user
 
+    def _touch(self) -> None:
+        """
+        Mark the collective as changed right now to track its latest activity
+
+        :return: None
+        """
+
+        self._execute("UPDATE collectives SET changed=CURRENT_TIMESTAMP WHERE id=%s", (self._id,))
+
     def is_participating(
             self,
             user: typing.Union[int, MateBotUser]
@@ -198,6 +231,8 @@ class UserCoordinator(BackendHelper):
                 "VALUES (%s, %s, %s)",
                 (self._id, user, vote)
             )
+            self._touch()
+            render_cache.invalidate(self._id)
 
             return rows == 1
         return False
@@ -219,6 +254,8 @@ class UserCoordinator(BackendHelper):
                 "WHERE collectives_id=%s AND users_id=%s",
                 (self._id, user)
             )
+            self._touch()
+            render_cache.invalidate(self._id)
 
             return rows == 1 and len(values) == 1
         return False
@@ -0,0 +1,174 @@
+"""
+MateBot scheduled expiry of stale collective operations
+"""
+
+import typing
+import logging
+
+import telegram
+import telegram.ext
+
+from mate_bot.config import config
+from mate_bot.collectives.base import BaseCollective
+from mate_bot.collectives.communism import Communism
+from mate_bot.collectives.payment import Payment
+from mate_bot.state.dbhelper import BackendHelper
+
+
+logger = logging.getLogger("collectives")
+
+EXPIRY_NOTE = (
+    "\n_This collective operation has been expired automatically, "
+    "since it was not closed in time. No transactions have been processed._"
+)
+
+
+def get_stale_collectives(
+        age: int,
+        limit: int,
+        after: int = 0
+) -> typing.List[typing.Tuple[int, bool]]:
+    """
+    Retrieve a batch of active collective operations that have been idle for the given age
+
+    The idle time is measured from the latest activity of the collective
+    operation (see the column ``changed``), not from its creation.
+
+    :param age: minimal idle time of the collective operations in seconds
+    :type age: int
+    :param limit: maximal number of collective operations returned
+    :type limit: int
+    :param after: only return collective operations with a higher ID
+    :type after: int
+    :return: list of tuples of the collective's ID and its type flag (``communistic``)
+    :rtype: typing.List[typing.Tuple[int, bool]]
+    """
+
+    rows, values = BackendHelper._execute(
+        "SELECT id, communistic FROM collectives "
+        "WHERE active=true AND changed < CURRENT_TIMESTAMP - INTERVAL %s SECOND AND id > %s "
+        "ORDER BY id LIMIT %s",
+        (age, after, limit)
+    )
+
+    return [(record["id"], bool(record["communistic"])) for record in values]
+
+
+def expire_collective(collective: BaseCollective, bot: typing.Optional[telegram.Bot] = None) -> bool:
+    """
+    Abort the collective operation and disable all its management messages
+
+    Every management message will be edited exactly once using the
+    outbound queue, so errors raised by Telegram (e.g. a deleted message or
+    a chat the bot was removed from) don't stop the expiry. Afterwards,
+    all messages of the collective operation will be unregistered.
+
+    :param collective: active collective operation that should be expired
+    :type collective: BaseCollective
+    :param bot: optional Telegram Bot object used to edit the management messages
+    :type bot: typing.Optional[telegram.Bot]
+    :return: whether the collective operation was aborted by this call
+    :rtype: bool
+    """
+
+    if not collective._abort():
+        return False
+
+    messages = collective.get_messages()
+    if bot is not None:
+        text = collective.get_markdown(EXPIRY_NOTE)
+        for chat, msg in messages:
+            collective.edit_message(chat, msg, text, telegram.InlineKeyboardMarkup([]), bot)
+
+    collective.unregister_all_messages()
+
+    logger.info(f"Expired collective {collective.get()} with {len(messages)} message(s)")
+    return True
+
+
+def expire_batch(
+        age: int,
+        limit: int,
+        after: int = 0,
+        bot: typing.Optional[telegram.Bot] = None
+) -> typing.Optional[int]:
+    """
+    Expire one batch of stale collective operations
+
+    Collective operations that can't be expired (e.g. because their
+    records are broken) are skipped. Since the next batch starts after
+    the highest ID of this batch, they are not retried over and over.
+
+    :param age: minimal idle time of the collective operations in seconds
+    :type age: int
+    :param limit: maximal number of collective operations in the batch
+    :type limit: int
+    :param after: only handle collective operations with a higher ID
+    :type after: int
+    :param bot: optional Telegram Bot object used to edit the management messages
+    :type bot: typing.Optional[telegram.Bot]
+    :return: highest ID of the batch if it was full (so more stale collectives may exist) or None
+    :rtype: typing.Optional[int]
+    """
+
+    batch = get_stale_collectives(age, limit, after)
+
+    for collective_id, communistic in batch:
+        try:
+            if communistic:
+                collective = Communism(collective_id)
+            else:
+                collective = Payment(collective_id)
+            expire_collective(collective, bot)
+
+        except (IndexError, TypeError, RuntimeError):
+            logger.exception(f"Skipping collective {collective_id} during expiry")
+
+    if len(batch) >= limit:
+        return batch[-1][0]
+    return None
+
+
+def expire_stale_collectives(context: telegram.ext.CallbackContext) -> None:
+    """
+    Job callback that expires one batch of stale collective operations
+
+    The age, batch size and interval are read from the ``collectives``
+    section of the configuration. Only one batch is handled per call to
+    keep the job queue responsive. When the batch was full, another run
+    of this job is scheduled shortly to work off the remaining backlog.
+    The job context of this run stores the highest ID of the previous
+    batch, so that every collective operation is handled once per pass.
+
+    :param context: callback context of the job queue
+    :type context: telegram.ext.CallbackContext
+    :return: None
+    """
+
+    settings = config["collectives"]
+    after = context.job.context if context.job is not None else None
+    last = expire_batch(settings["expiry-age"], settings["expiry-batch"], after or 0, context.bot)
+
+    if last is not None:
+        logger.debug("Batch of stale collectives was full, scheduling the next run...")
+        context.job_queue.run_once(expire_stale_collectives, settings["expiry-delay"], context=last)
+
+
+def schedule_expiry(job_queue: telegram.ext.JobQueue) -> typing.Optional[telegram.ext.Job]:
+    """
+    Register the repeating expiry of stale collective operations in the job queue
+
+    The expiry is disabled when the configured interval is zero.
+
+    :param job_queue: job queue of the running Updater
+    :type job_queue: telegram.ext.JobQueue
+    :return: the newly scheduled job or None
+    :rtype: typing.Optional[telegram.ext.Job]
+    """
+
+    interval = config["collectives"]["expiry-interval"]
+    if interval <= 0:
+        logger.info("Expiry of stale collectives is disabled")
+        return None
+
+    return job_queue.run_repeating(expire_stale_collectives, interval, first=interval)
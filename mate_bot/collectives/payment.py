@@ -7,8 +7,10 @@ import logging
 
 import telegram
 
+from mate_bot.codec import CallbackCodec
 from mate_bot.config import config
 from mate_bot.collectives.base import BaseCollective, COLLECTIVE_ARGUMENTS
+from mate_bot.collectives.cache import cached_rendering
 from mate_bot.state.transactions import LoggedTransaction
 from mate_bot.state.user import CommunityUser, MateBotUser
 
@@ -28,6 +30,11 @@ class Payment(BaseCollective):
         attribute ``_communistic`` (which is ``None`` by default and should be set properly)
     """
 
+    callback_codec = CallbackCodec("pay", {
+        "approve": (int,),
+        "disapprove": (int,)
+    })
+
     _communistic = False
 
     _ALLOWED_COLUMNS = ["active"]
@@ -57,6 +64,7 @@ class Payment(BaseCollective):
 
         return approved, disapproved
 
+    @cached_rendering
     def get_core_info(self) -> str:
         """
         Retrieve the basic information for the payment request's management message
@@ -79,6 +87,7 @@ class Payment(BaseCollective):
             f"\nDisapproved ({len(disapproved)}): {contra}\n"
         )
 
+    @cached_rendering
     def get_markdown(self, status: typing.Optional[str] = None) -> str:
         """
         Generate the full message text as markdown string
@@ -100,6 +109,7 @@ class Payment(BaseCollective):
 
         return markdown
 
+    @cached_rendering
     def _get_inline_keyboard(self) -> telegram.InlineKeyboardMarkup:
         """
         Get the inline keyboard to control the payment operation
@@ -112,7 +122,7 @@ class Payment(BaseCollective):
             return telegram.InlineKeyboardMarkup([])
 
         def f(c):
-            return f"pay {c} {self.get()}"
+            return self.callback_codec.encode(c, self.get())
 
         return telegram.InlineKeyboardMarkup([
             [
@@ -140,7 +150,7 @@ class Payment(BaseCollective):
             return False
         self.active = False
         self.edit_all_messages(self.get_markdown(), self._get_inline_keyboard(), bot)
-        [self.unregister_message(c, m) for c, m in self.get_messages()]
+        self.unregister_all_messages()
         return True
 
     def show(self, message: telegram.Message) -> None:
@@ -156,20 +166,18 @@ class Payment(BaseCollective):
         messages = self.get_messages(message.chat.id)
 
         for msg in messages:
-            message.bot.edit_message_text(
+            self.edit_message(
+                msg[0],
+                msg[1],
                 self.get_markdown(
                     "\n_This payment request management message is not active anymore. "
                     "A more recent message has been sent to the chat to replace this one._"
                 ),
-                chat_id=msg[0],
-                message_id=msg[1],
-                parse_mode="Markdown",
-                reply_to_message_id=reply.message_id,
-                reply_markup=telegram.InlineKeyboardMarkup([])
+                telegram.InlineKeyboardMarkup([]),
+                message.bot
             )
-            self.unregister_message(msg[0], msg[1])
 
-        self.register_message(message.chat.id, reply.message_id)
+        self.replace_message(message.chat.id, reply.message_id)
         self.edit_all_messages(
             self.get_markdown(),
             self._get_inline_keyboard(),
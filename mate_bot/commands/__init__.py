@@ -2,48 +2,48 @@
 MateBot collection of command executors
 """
 
+from mate_bot import registry
 from mate_bot.config import config
-from mate_bot.commands.balance import BalanceCommand
-from mate_bot.commands.blame import BlameCommand
-from mate_bot.commands.communism import CommunismCommand, CommunismCallbackQuery
-from mate_bot.commands.data import DataCommand
-from mate_bot.commands.forward import ForwardInlineQuery, ForwardInlineResult
-from mate_bot.commands.help import HelpCommand, HelpInlineQuery
-from mate_bot.commands.history import HistoryCommand
-from mate_bot.commands.pay import PayCommand, PayCallbackQuery
-from mate_bot.commands.send import SendCommand, SendCallbackQuery
-from mate_bot.commands.start import StartCommand
-from mate_bot.commands.vouch import VouchCommand, VouchCallbackQuery
-from mate_bot.commands.zwegat import ZwegatCommand
-from mate_bot.commands.consume import ConsumeCommand
-
-
-# In order to register all executors in the registry, we just
-# have to create an object of their corresponding class. The
-# constructors of the base classes care about adding the
-# specific executor object to the correct registry pool.
-
-BalanceCommand()
-BlameCommand()
-CommunismCommand()
-DataCommand()
-HelpCommand()
-HistoryCommand()
-PayCommand()
-SendCommand()
-StartCommand()
-VouchCommand()
-ZwegatCommand()
+from mate_bot.commands.lazy import LazyExecutor
+
+
+# In order to register all executors in the registry, we create a
+# placeholder for every executor. The placeholders only store the
+# key (name or pattern) of the executor in the correct registry pool.
+# The modules of the executors are imported on first use. Then, the
+# constructors of the base classes care about replacing the
+# placeholder with the specific executor object in the registry pool.
+
+LazyExecutor(registry.commands, "balance", "mate_bot.commands.balance", "BalanceCommand")
+LazyExecutor(registry.commands, "blame", "mate_bot.commands.blame", "BlameCommand")
+LazyExecutor(registry.commands, "communism", "mate_bot.commands.communism", "CommunismCommand")
+LazyExecutor(registry.commands, "data", "mate_bot.commands.data", "DataCommand")
+LazyExecutor(registry.commands, "help", "mate_bot.commands.help", "HelpCommand")
+LazyExecutor(registry.commands, "history", "mate_bot.commands.history", "HistoryCommand")
+LazyExecutor(registry.commands, "pay", "mate_bot.commands.pay", "PayCommand")
+LazyExecutor(registry.commands, "profile", "mate_bot.commands.profile", "ProfileCommand")
+LazyExecutor(registry.commands, "send", "mate_bot.commands.send", "SendCommand")
+LazyExecutor(registry.commands, "start", "mate_bot.commands.start", "StartCommand")
+LazyExecutor(registry.commands, "stats", "mate_bot.commands.stats", "StatsCommand")
+LazyExecutor(registry.commands, "trend", "mate_bot.commands.trend", "TrendCommand")
+LazyExecutor(registry.commands, "vouch", "mate_bot.commands.vouch", "VouchCommand")
+LazyExecutor(registry.commands, "zwegat", "mate_bot.commands.zwegat", "ZwegatCommand")
 
 for consumable in config["consumables"]:
-    ConsumeCommand(**consumable)
-
-CommunismCallbackQuery()
-PayCallbackQuery()
-SendCallbackQuery()
-VouchCallbackQuery()
-
-ForwardInlineQuery(r"^\d+(\s?\S?)*")
-HelpInlineQuery(r"")
-
-ForwardInlineResult(r"^forward-\d+-\d+-\d+")
+    LazyExecutor(
+        registry.commands,
+        consumable["name"],
+        "mate_bot.commands.consume",
+        "ConsumeCommand",
+        **consumable
+    )
+
+LazyExecutor(registry.callback_queries, "^communism", "mate_bot.commands.communism", "CommunismCallbackQuery")
+LazyExecutor(registry.callback_queries, "^pay", "mate_bot.commands.pay", "PayCallbackQuery")
+LazyExecutor(registry.callback_queries, "^send", "mate_bot.commands.send", "SendCallbackQuery")
+LazyExecutor(registry.callback_queries, "^vouch", "mate_bot.commands.vouch", "VouchCallbackQuery")
+
+LazyExecutor(registry.inline_queries, r"^\d+(\s?\S?)*", "mate_bot.commands.forward", "ForwardInlineQuery", r"^\d+(\s?\S?)*")
+LazyExecutor(registry.inline_queries, r"", "mate_bot.commands.help", "HelpInlineQuery", r"")
+
+LazyExecutor(registry.inline_results, r"^forward-\d+-\d+-\d+", "mate_bot.commands.forward", "ForwardInlineResult", r"^forward-\d+-\d+-\d+")
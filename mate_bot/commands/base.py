@@ -8,11 +8,16 @@ import logging
 import telegram.ext
 
 from mate_bot import registry
+from mate_bot.codec import CallbackCodec
 from mate_bot.config import config
-from mate_bot.err import ParsingError
+from mate_bot.err import CallbackError, ParsingError
+from mate_bot.outbound import outbound_queue, PRIORITY_NOTIFICATION
 from mate_bot.parsing.parser import CommandParser
 from mate_bot.parsing.util import Namespace
+from mate_bot.profiling import profile_update
 from mate_bot.state.user import MateBotUser
+from mate_bot.throttle import throttle
+from mate_bot.tracing import trace_update
 
 
 logger = logging.getLogger("commands")
@@ -172,26 +177,36 @@ class BaseCommand:
         creditor = user.creditor
         if creditor is None:
             user.external = external
-            bot.send_message(
+            outbound_queue.submit(
+                user.tid,
+                bot.send_message,
                 user.tid,
                 "Your account was updated. You are now an internal "
-                f"user because you executed /{self.name} in an internal chat."
+                f"user because you executed /{self.name} in an internal chat.",
+                priority=PRIORITY_NOTIFICATION
             )
         else:
-            bot.send_message(
+            outbound_queue.submit(
+                user.tid,
+                bot.send_message,
                 user.tid,
                 f"You receive this message because you executed /{self.name} in "
                 f"an internal chat. It looks like {MateBotUser(creditor)} vouches "
                 f"for you. You can't have a voucher when you try to become an internal "
-                f"user. Therefore, your account status was not updated."
+                f"user. Therefore, your account status was not updated.",
+                priority=PRIORITY_NOTIFICATION
             )
 
+    @trace_update("command")
+    @profile_update
     def __call__(self, update: telegram.Update, context: telegram.ext.CallbackContext) -> None:
         """
         Parse arguments of the incoming update and execute the .run() method
 
         This method is the callback method used by telegram.CommandHandler.
         Note that this method also catches any exceptions and prints them.
+        Updates exceeding the limits of the :mod:`mate_bot.throttle`
+        are dropped before accessing the database.
 
         :param update: incoming Telegram update
         :type update: telegram.Update
@@ -200,6 +215,16 @@ class BaseCommand:
         :return: None
         """
 
+        sender = update.effective_user
+        if sender is None:
+            return
+
+        message = update.effective_message
+        if not throttle.allow(self.name, sender.id, message.chat_id):
+            if throttle.notify(sender.id):
+                message.reply_text("You are sending commands too fast. Please slow down a bit.")
+            return
+
         try:
             logger.debug(f"{type(self).__name__} by {update.effective_message.from_user.name}")
 
@@ -244,31 +269,48 @@ class BaseCallbackQuery:
     "hello" as the name of this handler. Furthermore, you set
     "^hello" as pattern to filter callback queries against.
 
+    When a :class:`mate_bot.codec.CallbackCodec` is given, the callback
+    data is decoded with a single match of its precompiled expression.
+    The decoded action and its typed fields are stored in the attributes
+    `action` and `fields`. The action's name is then used to look up the
+    target callable, so the keys of `targets` must be the codec's actions.
+    Callback data that can't be decoded will be rejected with an alert.
+
     :param name: name of the command the callback is for
     :type name: str
     :param pattern: regular expression to filter callback query executors
     :type pattern: str
     :param targets: dict to associate data replies with function calls
     :type targets: Optional[typing.Dict[str, typing.Callable]]
+    :param codec: optional codec to decode the callback data
+    :type codec: typing.Optional[CallbackCodec]
     """
 
     def __init__(
             self,
             name: str,
             pattern: str,
-            targets: typing.Optional[typing.Dict[str, typing.Callable]] = None
+            targets: typing.Optional[typing.Dict[str, typing.Callable]] = None,
+            codec: typing.Optional[CallbackCodec] = None
     ):
 
         if not isinstance(targets, dict) and targets is not None:
             raise TypeError("Expected dict or None")
+        if codec is not None and targets is not None and not set(targets).issubset(codec.actions):
+            raise ValueError("Every target must be an action of the codec")
 
         self.name = name
         self.pattern = pattern
         self.data = None
+        self.action = None
+        self.fields = None
         self.targets = targets
+        self.codec = codec
 
         registry.callback_queries[self.pattern] = self
 
+    @trace_update("callback_query")
+    @profile_update
     def __call__(self, update: telegram.Update, context: telegram.ext.CallbackContext) -> None:
         """
         :param update: incoming Telegram update
@@ -277,6 +319,7 @@ class BaseCallbackQuery:
         :type context: telegram.ext.CallbackContext
         :return: None
         :raises RuntimeError: when either no callback data or no pattern match is present
+        :raises CallbackError: when the callback data can't be decoded by the codec
         :raises IndexError: when a callback data string has no unique target callable
         :raises TypeError: when a target is not a callable object (implicitly)
         """
@@ -289,8 +332,29 @@ class BaseCallbackQuery:
         if context.match is None:
             raise RuntimeError("No pattern match found")
 
+        query = update.callback_query
+        chat = query.message.chat_id if query.message is not None else None
+        if not throttle.allow(self.name, query.from_user.id, chat):
+            query.answer("Too many requests. Please slow down a bit.")
+            return
+
         self.data = (data[:context.match.start()] + data[context.match.end():]).strip()
 
+        if self.codec is not None:
+            decoded = self.codec.decode(data)
+            if decoded is None:
+                update.callback_query.answer("Invalid callback query data!", show_alert=True)
+                raise CallbackError(f"Invalid callback data for {self.codec.name}: '{data}'")
+            self.action, self.fields = decoded
+
+            if self.targets is None:
+                self.run(update)
+            elif self.action in self.targets:
+                self.targets[self.action](update)
+            else:
+                raise IndexError(f"No target callable found for: '{self.action}'")
+            return
+
         if self.targets is None:
             self.run(update)
             return
@@ -338,6 +402,8 @@ class BaseInlineQuery:
 
         registry.inline_queries[self.pattern] = self
 
+    @trace_update("inline_query")
+    @profile_update
     def __call__(self, update: telegram.Update, context: telegram.ext.CallbackContext) -> None:
         """
         :param update: incoming Telegram update
@@ -436,6 +502,8 @@ class BaseInlineResult:
 
         registry.inline_results[self.pattern] = self
 
+    @trace_update("inline_result")
+    @profile_update
     def __call__(self, update: telegram.Update, context: telegram.ext.CallbackContext) -> None:
         """
         :param update: incoming Telegram update
@@ -3,11 +3,13 @@ MateBot command executor classes for /blame
 """
 
 import logging
+import datetime
 
 import telegram
 
 from mate_bot.commands.base import BaseCommand
-from mate_bot.state.user import MateBotUser
+from mate_bot.state.ledger import ledger
+from mate_bot.state.user import BaseBotUser, CommunityUser, MateBotUser
 from mate_bot.parsing.util import Namespace
 
 
@@ -25,7 +27,8 @@ class BlameCommand(BaseCommand):
             "Use this command to show the user(s) with the highest debts.\n\n"
             "Put the user(s) with the highest debts to the pillory and make them "
             "settle their debts, e.g. by buying stuff like new bottle crates. "
-            "This command can only be executed by internal users."
+            "When the extended reports are available, the users who spent the most "
+            "money during the last 30 days are shown, too. This command can only be executed by internal users."
         )
 
     def run(self, args: Namespace, update: telegram.Update) -> None:
@@ -43,14 +46,38 @@ class BlameCommand(BaseCommand):
 
         debtors = MateBotUser.get_worst_debtors()
         if len(debtors) == 0:
-            update.effective_message.reply_text(
-                "Good news! No one has to be blamed, all users have positive balances!"
-            )
-            return
-
-        if len(debtors) == 1:
-            msg = "The user with the highest debt is:\n"
+            msg = "Good news! No one has to be blamed, all users have positive balances!"
         else:
-            msg = "The users with the highest debts are:\n"
-        msg += "\n".join(map(lambda x: x.username if x.username else x.name, debtors))
+            if len(debtors) == 1:
+                msg = "The user with the highest debt is:\n"
+            else:
+                msg = "The users with the highest debts are:\n"
+            msg += "\n".join(map(lambda x: x.username if x.username else x.name, debtors))
+
+        if ledger.available:
+            msg += self._get_report()
         update.effective_message.reply_text(msg)
+
+    @staticmethod
+    def _get_report() -> str:
+        """
+        Create the report about the users who spent the most money during the last 30 days
+
+        :return: text of the report, prefixed by an empty line
+        :rtype: str
+        """
+
+        ledger.refresh()
+        spenders = ledger.top_debtors(
+            datetime.datetime.now() - datetime.timedelta(days=30),
+            count=3,
+            exclude=[CommunityUser().uid]
+        )
+        if len(spenders) == 0:
+            return ""
+
+        report = "\n\nThe highest net spending of the last 30 days:"
+        for uid, flow in spenders:
+            name = BaseBotUser.get_username_from_uid(uid) or BaseBotUser.get_name_from_uid(uid)
+            report += f"\n{name}: {-flow / 100:.2f}€"
+        return report
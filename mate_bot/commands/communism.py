@@ -109,7 +109,8 @@ class CommunismCallbackQuery(BaseCallbackQuery):
                 "decrease": self.decrease,
                 "accept": self.accept,
                 "cancel": self.cancel
-            }
+            },
+            Communism.callback_codec
         )
 
     def _get_communism(self) -> Communism:
@@ -121,17 +122,11 @@ class CommunismCallbackQuery(BaseCallbackQuery):
         :raises err.CallbackError: when something went wrong
         """
 
-        if self.data is None or self.data == "":
-            raise err.CallbackError("Empty stripped callback data")
+        if not self.fields:
+            raise err.CallbackError("Missing communism ID in callback data")
 
-        communism_id = self.data.split(" ")[-1]
         try:
-            communism_id = int(communism_id)
-        except ValueError as exc:
-            raise err.CallbackError("Wrong communism ID format", exc)
-
-        try:
-            return Communism(communism_id)
+            return Communism(self.fields[0])
         except IndexError as exc:
             raise err.CallbackError("The collective does not exist in the database", exc)
         except (TypeError, RuntimeError) as exc:
@@ -141,8 +136,8 @@ class CommunismCallbackQuery(BaseCallbackQuery):
         """
         Retrieve the Communism object based on the callback data
 
-        By convention, everything after the last space symbol
-        should be interpreted as communism ID. If some error occurs
+        The communism ID is the only field of every action decoded
+        by the codec of the :class:`Communism`. If some error occurs
         while trying to get the Communism object, an alert message
         will be shown to the user and an exception will be raised.
 
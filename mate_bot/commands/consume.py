@@ -13,7 +13,7 @@ from mate_bot.parsing.types import natural as natural_type
 from mate_bot.config import config
 from mate_bot.commands.base import BaseCommand
 from mate_bot.parsing.util import Namespace
-from mate_bot.state.transactions import LoggedTransaction
+from mate_bot.state.transactions import ConsumeTransaction, fast_consume
 
 
 logger = logging.getLogger("commands")
@@ -25,6 +25,10 @@ class ConsumeCommand(BaseCommand):
 
     Subclasses of this class should only overwrite
     the constructor in order to implement a new command.
+
+    Consumptions are the most frequent operations of the bot. Therefore,
+    the transaction is processed by :func:`mate_bot.state.transactions.fast_consume`
+    whenever possible, which needs only one database transaction.
     """
 
     def __init__(self, name: str, description: str, price: int, messages: _typing.List[str], symbol: str):
@@ -58,10 +62,6 @@ class ConsumeCommand(BaseCommand):
         :return: None
         """
 
-        sender = MateBotUser(update.effective_message.from_user)
-        if not self.ensure_permissions(sender, 1, update.effective_message):
-            return
-
         if args.number > config["general"]["max-consume"]:
             update.effective_message.reply_text(
                 "You can't consume that many goods at once!"
@@ -69,13 +69,27 @@ class ConsumeCommand(BaseCommand):
             return
 
         reason = f"consume: {args.number}x {self.name}"
-        LoggedTransaction(
-            sender,
-            CommunityUser(),
+        balance = fast_consume(
+            update.effective_message.from_user,
             self.price * args.number,
             reason,
-            update.effective_message.bot
-        ).commit()
+            update.effective_message.bot,
+            (self.name, args.number)
+        )
+
+        if balance is None:
+            sender = MateBotUser(update.effective_message.from_user)
+            if not self.ensure_permissions(sender, 1, update.effective_message):
+                return
+
+            ConsumeTransaction(
+                sender,
+                CommunityUser(),
+                self.price * args.number,
+                self.name,
+                args.number,
+                update.effective_message.bot
+            ).commit()
 
         update.effective_message.reply_text(
             _random.choice(self.messages) + self.symbol * args.number,
@@ -7,17 +7,25 @@ import logging
 import datetime
 
 import telegram
+import telegram.ext
 
+from mate_bot import metrics
 from mate_bot.collectives.base import BaseCollective
 from mate_bot.collectives.communism import Communism
 from mate_bot.collectives.payment import Payment
 from mate_bot.commands.base import BaseInlineQuery, BaseInlineResult
-from mate_bot.state.user import MateBotUser, CommunityUser
+from mate_bot.commands.inline import InlineAnswerCache
+from mate_bot.state.user import MateBotUser, CommunityUser, add_update_hook
 from mate_bot.state import finders
 
 
 logger = logging.getLogger("commands")
 
+forward_answers = InlineAnswerCache(size=256, ttl=30.0)
+
+# The answers contain names and usernames of users
+add_update_hook(lambda uid, column: forward_answers.clear())
+
 
 class ForwardInlineQuery(BaseInlineQuery):
     """
@@ -29,8 +37,38 @@ class ForwardInlineQuery(BaseInlineQuery):
     To use this feature, the bot must be able to receive *all* updates
     for chosen inline query results. You may need to enable this
     updates via the ``@BotFather``. Set the quota to 100%.
+
+    Queries are answered in the thread pool of the dispatcher, so that
+    slow user searches don't block other updates. Answers are taken from
+    :data:`forward_answers` whenever possible. Queries superseded by a
+    newer query of the same user are dropped without being answered.
     """
 
+    def __call__(self, update: telegram.Update, context: telegram.ext.CallbackContext) -> None:
+        """
+        :param update: incoming Telegram update
+        :type update: telegram.Update
+        :param context: Telegram callback context
+        :type context: telegram.ext.CallbackContext
+        :return: None
+        """
+
+        query = update.inline_query
+        forward_answers.enter(query.from_user.id, query.id)
+
+        def answer() -> None:
+            metrics.async_tasks.inc()
+            try:
+                if not forward_answers.is_superseded(query.from_user.id, query.id):
+                    super(ForwardInlineQuery, self).__call__(update, context)
+            except Exception as exc:
+                context.dispatcher.dispatch_error(update, exc)
+            finally:
+                forward_answers.leave(query.from_user.id, query.id)
+                metrics.async_tasks.dec()
+
+        context.dispatcher.run_async(answer)
+
     def get_result_id(
             self,
             collective_id: typing.Optional[int] = None,
@@ -93,46 +131,68 @@ class ForwardInlineQuery(BaseInlineQuery):
         if len(query.query) == 0:
             return
 
-        split = query.query.split(" ")
+        split = query.query.split()
 
         try:
             collective_id = int(split[0])
-            community = CommunityUser()
-
-            users = []
-            for word in split[1:]:
-                if len(word) <= 1:
-                    continue
-                if word.startswith("@"):
-                    word = word[1:]
-
-                for target in finders.find_names_by_pattern(word):
-                    user = finders.find_user_by_name(target)
-                    if user is not None and user not in users:
-                        if user.uid != community.uid:
-                            users.append(user)
-
-                for target in finders.find_usernames_by_pattern(word):
-                    user = finders.find_user_by_username(target)
-                    if user is not None and user not in users:
-                        if user.uid != community.uid:
-                            users.append(user)
-
-            users.sort(key=lambda u: u.name.lower())
-
-            answers = []
-            for choice in users:
-                answers.append(self.get_result(
-                    str(choice),
-                    f"I am forwarding this collective to {choice.name}...",
-                    collective_id,
-                    choice.tid
-                ))
-
-            query.answer([self.get_help()] + answers)
-
         except (IndexError, ValueError):
             query.answer([self.get_help()])
+            return
+
+        words = []
+        for word in split[1:]:
+            if word.startswith("@"):
+                word = word[1:]
+            if len(word) > 1 and word.lower() not in words:
+                words.append(word.lower())
+
+        answers = forward_answers.fetch(
+            (collective_id, tuple(words)),
+            lambda: [self.get_help()] + self._search(collective_id, words)
+        )
+        if not forward_answers.is_superseded(query.from_user.id, query.id):
+            query.answer(answers)
+
+    def _search(self, collective_id: int, words: typing.List[str]) -> typing.List[telegram.InlineQueryResult]:
+        """
+        Search for users whose names or usernames match any of the words
+
+        :param collective_id: internal ID of the collective operation to be forwarded
+        :type collective_id: int
+        :param words: normalized search words
+        :type words: typing.List[str]
+        :return: list of inline results to forward the collective to the found users
+        :rtype: typing.List[telegram.InlineQueryResult]
+        """
+
+        community = CommunityUser()
+
+        users = []
+        for word in words:
+            for target in finders.find_names_by_pattern(word):
+                user = finders.find_user_by_name(target)
+                if user is not None and user not in users:
+                    if user.uid != community.uid:
+                        users.append(user)
+
+            for target in finders.find_usernames_by_pattern(word):
+                user = finders.find_user_by_username(target)
+                if user is not None and user not in users:
+                    if user.uid != community.uid:
+                        users.append(user)
+
+        users.sort(key=lambda u: u.name.lower())
+
+        answers = []
+        for choice in users:
+            answers.append(self.get_result(
+                str(choice),
+                f"I am forwarding this collective to {choice.name}...",
+                collective_id,
+                choice.tid
+            ))
+
+        return answers
 
 
 class ForwardInlineResult(BaseInlineResult):
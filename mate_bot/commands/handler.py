@@ -7,6 +7,9 @@ import typing
 
 import telegram.ext
 
+from mate_bot import metrics
+from mate_bot.commands.lazy import LazyExecutor
+
 
 class FilteredChosenInlineResultHandler(telegram.ext.InlineQueryHandler):
     """
@@ -44,3 +47,242 @@ class FilteredChosenInlineResultHandler(telegram.ext.InlineQueryHandler):
                 if match:
                     return match
         return False
+
+
+class RouterHandler(telegram.ext.Handler):
+    """
+    Single handler that routes all updates to the executors stored in the registry
+
+    Registering one handler per executor lets the dispatcher try every
+    handler's ``check_update`` for every incoming update. This handler
+    instead resolves commands by a dictionary lookup of the command's name.
+    Callback queries, inline queries and chosen inline results are resolved
+    using a table of the literal prefixes of the executors' patterns (e.g.
+    ``"^communism"`` is stored as ``"communism"``). The leading word of the
+    callback data, query or result ID is used to look up the candidates,
+    so the data has to separate the prefix from the rest by a non-word
+    character (e.g. ``"communism toggle 42"``, which is the convention).
+    Only patterns without such a literal prefix are checked one by one.
+    The candidates are always verified using their regular expression,
+    and the first matching executor in registry order handles the update.
+
+    The behavior mimics the built-in handlers of the ``telegram.ext`` package:
+    commands addressed to another bot are ignored, ``context.args`` holds the
+    arguments of commands and ``context.match`` holds the pattern match
+    (executors with an empty pattern accept all updates of their type).
+
+    Note that the keys of the registry are read once during initialization,
+    while the executors themselves are looked up for every update.
+
+    :param commands: pool of command executors, see :mod:`mate_bot.registry`
+    :type commands: dict
+    :param callback_queries: pool of callback query executors
+    :type callback_queries: dict
+    :param inline_queries: pool of inline query executors
+    :type inline_queries: dict
+    :param inline_results: pool of inline result executors
+    :type inline_results: dict
+    """
+
+    _LITERAL_PREFIX = re.compile(r"^\^(\w+)(?=$|[ \-$]|\\[sb])")
+    _LEADING_WORD = re.compile(r"\w*")
+
+    def __init__(self, commands: dict, callback_queries: dict, inline_queries: dict, inline_results: dict):
+        super().__init__(self._route)
+        self.commands = commands
+        self.callback_queries = self._build_table(callback_queries)
+        self.inline_queries = self._build_table(inline_queries)
+        self.inline_results = self._build_table(inline_results)
+
+    @classmethod
+    def _build_table(cls, pool: dict) -> typing.Tuple[dict, typing.Dict[str, list], list]:
+        """
+        Create the lookup table for a pool of executors with patterns
+
+        Every entry of the table is a tuple of the executor's position in
+        the pool, its key (pattern string) and the compiled pattern.
+
+        :param pool: pool of executors keyed by their patterns
+        :type pool: dict
+        :return: tuple of the pool, the literal prefix table and the list of remaining patterns
+        """
+
+        literals = {}
+        others = []
+        for index, pattern in enumerate(pool):
+            entry = (index, pattern, re.compile(pattern))
+            match = cls._LITERAL_PREFIX.match(pattern)
+            if match:
+                literals.setdefault(match.group(1), []).append(entry)
+            else:
+                others.append(entry)
+        return pool, literals, others
+
+    @classmethod
+    def _resolve(
+            cls,
+            table: typing.Tuple[dict, typing.Dict[str, list], list],
+            data: typing.Optional[str]
+    ) -> typing.Optional[tuple]:
+        """
+        Find the executor whose pattern matches the given data
+
+        :param table: lookup table created by :meth:`_build_table`
+        :param data: callback data, query string or result ID of the incoming update
+        :type data: typing.Optional[str]
+        :return: tuple of the executor and the pattern match (or None for empty patterns)
+        """
+
+        pool, literals, others = table
+        candidates = others
+        if data:
+            prefixed = literals.get(cls._LEADING_WORD.match(data).group())
+            if prefixed:
+                candidates = sorted(prefixed + others)
+
+        for _, pattern, compiled in candidates:
+            if not pattern:
+                return pool[pattern], None
+            if data:
+                match = compiled.match(data)
+                if match:
+                    return pool[pattern], match
+        return None
+
+    def _check_command(self, message: telegram.Message) -> typing.Optional[tuple]:
+        """
+        Find the command executor for the message using the same rules as the ``CommandHandler``
+
+        :param message: incoming message
+        :type message: telegram.Message
+        :return: tuple of the executor and the list of arguments
+        """
+
+        if not message.entities or not message.text:
+            return None
+        entity = message.entities[0]
+        if entity.type != telegram.MessageEntity.BOT_COMMAND or entity.offset != 0:
+            return None
+
+        command = message.text[1:entity.length].split("@")
+        command.append(message.bot.username)
+        if command[1].lower() != message.bot.username.lower():
+            return None
+
+        executor = self.commands.get(command[0].lower())
+        if executor is None:
+            return None
+        return executor, message.text.split()[1:]
+
+    def check_update(self, update: telegram.Update) -> typing.Optional[tuple]:
+        """
+        Determine which executor should handle the update
+
+        :param update: incoming Telegram Update
+        :type update: telegram.Update
+        :return: tuple of the executor, the pattern match and the command arguments or None
+        """
+
+        if not isinstance(update, telegram.Update):
+            return None
+
+        if update.callback_query:
+            result = self._resolve(self.callback_queries, update.callback_query.data)
+        elif update.inline_query:
+            result = self._resolve(self.inline_queries, update.inline_query.query)
+        elif update.chosen_inline_result:
+            result = self._resolve(self.inline_results, update.chosen_inline_result.result_id)
+        elif update.message or update.edited_message:
+            result = self._check_command(update.message or update.edited_message)
+            if result is not None:
+                return result[0], None, result[1]
+            return None
+        else:
+            return None
+
+        if result is None:
+            return None
+        return result[0], result[1], None
+
+    def collect_additional_context(
+            self,
+            context: telegram.ext.CallbackContext,
+            update: telegram.Update,
+            dispatcher: telegram.ext.Dispatcher,
+            check_result: tuple
+    ) -> None:
+        _, match, args = check_result
+        if args is not None:
+            context.args = args
+        if match is not None:
+            context.matches = [match]
+
+    def handle_update(
+            self,
+            update: telegram.Update,
+            dispatcher: telegram.ext.Dispatcher,
+            check_result: tuple,
+            context: typing.Optional[telegram.ext.CallbackContext] = None
+    ) -> typing.Any:
+        if context is None:
+            raise RuntimeError("The RouterHandler requires the context-based callback API")
+        self.collect_additional_context(context, update, dispatcher, check_result)
+        executor = check_result[0]
+        if isinstance(executor, LazyExecutor):
+            executor = executor.load()
+        labels = (self._kind(update), self._label(executor))
+        metrics.updates.inc(*labels)
+        try:
+            with metrics.update_duration.time(*labels):
+                return executor(update, context)
+        except Exception:
+            metrics.update_errors.inc(*labels)
+            raise
+
+    @staticmethod
+    def _label(executor: typing.Any) -> str:
+        """
+        Get the name of the executor to be used as label value of the metrics
+
+        Commands and callback queries are labeled by their name, so that every
+        registered executor (e.g. every consumable) gets its own series.
+        Inline queries and results have no name, but only one executor
+        per class, so they are labeled by the name of their class.
+
+        :param executor: loaded executor handling the update
+        :type executor: typing.Any
+        :return: label value
+        :rtype: str
+        """
+
+        name = getattr(executor, "name", None)
+        if isinstance(name, str) and name:
+            return name
+        return type(executor).__name__
+
+    @staticmethod
+    def _kind(update: telegram.Update) -> str:
+        """
+        Get the kind of the update to be used as label value of the metrics
+
+        :param update: incoming Telegram Update
+        :type update: telegram.Update
+        :return: one of ``callback_query``, ``inline_query``, ``inline_result`` or ``command``
+        :rtype: str
+        """
+
+        if update.callback_query:
+            return "callback_query"
+        if update.inline_query:
+            return "inline_query"
+        if update.chosen_inline_result:
+            return "inline_result"
+        return "command"
+
+    @staticmethod
+    def _route(update: telegram.Update, context: telegram.ext.CallbackContext) -> None:
+        """
+        Placeholder callback, because the executor is determined per update
+        """
+
+        raise RuntimeError("The RouterHandler calls the executors directly")
@@ -5,6 +5,7 @@ MateBot command executor classes for /help
 import typing
 import logging
 import datetime
+import threading
 
 import telegram
 
@@ -17,6 +18,139 @@ from mate_bot.state.user import MateBotUser
 
 logger = logging.getLogger("commands")
 
+LEVEL_INTERNAL = "internal"
+LEVEL_EXTERNAL = "external"
+LEVEL_UNVOUCHED = "unvouched"
+
+EXTERNAL_NOTE = "\n\nYou are an external user. Some commands may be restricted."
+UNVOUCHED_NOTE = (
+    "\nYou don't have any creditor. Your possible interactions "
+    "with the bot are very limited for security purposes. You "
+    "can ask some internal user to act as your voucher. To "
+    "do this, the internal user needs to execute `/vouch "
+    "<your username>`. Afterwards, you may use this bot."
+)
+
+
+class HelpCatalogue:
+    """
+    Precomputed help messages for all commands of a pool of the registry
+
+    The help message of every command and the overview of all commands
+    for every permission level are built at the first request. They
+    are built again only when the version of the pool changed (see
+    :class:`mate_bot.registry.Registry`). Inline results created by
+    :meth:`inline_result` are stored until the next rebuild, too.
+
+    :param commands: pool of command executors, see :mod:`mate_bot.registry`
+    :type commands: mate_bot.registry.Registry
+    """
+
+    def __init__(self, commands: registry.Registry):
+        self._commands = commands
+        self._version = None
+        self._lock = threading.Lock()
+        self._texts: typing.Dict[str, str] = {}
+        self._overviews: typing.Dict[str, str] = {}
+        self._results: typing.Dict[typing.Optional[str], telegram.InlineQueryResult] = {}
+
+    def _refresh(self) -> None:
+        """
+        Build all help messages again if the pool of commands changed
+
+        :return: None
+        """
+
+        if self._version == self._commands.version:
+            return
+
+        with self._lock:
+            if self._version == self._commands.version:
+                return
+
+            # Accessing the executors may load lazy placeholders, which changes the version
+            executors = list(self._commands.values())
+            texts = {command.name: HelpCommand.get_help_for_command(command) for command in executors}
+            usage = self._commands["help"].usage if "help" in self._commands else ""
+            overview = HelpCommand.get_help_usage(self._commands, usage)
+
+            self._texts = texts
+            self._overviews = {
+                LEVEL_INTERNAL: overview,
+                LEVEL_EXTERNAL: overview + EXTERNAL_NOTE,
+                LEVEL_UNVOUCHED: overview + EXTERNAL_NOTE + UNVOUCHED_NOTE
+            }
+            self._results = {}
+            self._version = self._commands.version
+            logger.debug(f"Built help catalogue for {len(texts)} commands")
+
+    def command(self, name: str) -> typing.Optional[str]:
+        """
+        Get the help message for a specific command in Markdown
+
+        :param name: name of the command (case-insensitive)
+        :type name: str
+        :return: help message or None if the command doesn't exist
+        :rtype: typing.Optional[str]
+        """
+
+        self._refresh()
+        return self._texts.get(name.lower())
+
+    def overview(self, level: str = LEVEL_INTERNAL) -> str:
+        """
+        Get the help message without arguments for the given permission level
+
+        :param level: one of the constants ``LEVEL_INTERNAL``, ``LEVEL_EXTERNAL`` or ``LEVEL_UNVOUCHED``
+        :type level: str
+        :return: fully formatted help message
+        :rtype: str
+        :raises KeyError: when the level is unknown
+        """
+
+        self._refresh()
+        return self._overviews[level]
+
+    def inline_result(
+            self,
+            name: typing.Optional[str],
+            factory: typing.Callable[[], telegram.InlineQueryResult]
+    ) -> telegram.InlineQueryResult:
+        """
+        Get the inline result for the help on a command, creating it using the factory once
+
+        :param name: name of the command or None for the general help
+        :type name: typing.Optional[str]
+        :param factory: callable creating the inline result
+        :type factory: typing.Callable[[], telegram.InlineQueryResult]
+        :return: stored or created inline result
+        :rtype: telegram.InlineQueryResult
+        """
+
+        self._refresh()
+        result = self._results.get(name)
+        if result is None:
+            result = factory()
+            self._results[name] = result
+        return result
+
+    @staticmethod
+    def get_level(user: MateBotUser) -> str:
+        """
+        Get the permission level of a user that determines the help overview
+
+        :param user: MateBotUser object who issued the help command
+        :type user: MateBotUser
+        :return: permission level of the user
+        :rtype: str
+        """
+
+        if not user.external:
+            return LEVEL_INTERNAL
+        if user.creditor is None:
+            return LEVEL_UNVOUCHED
+        return LEVEL_EXTERNAL
+
 
 class HelpCommand(BaseCommand):
     """
@@ -43,11 +177,11 @@ class HelpCommand(BaseCommand):
         """
 
         if args.command:
-            msg = self.get_help_for_command(args.command)
+            msg = help_catalogue.command(args.command.name)
 
         else:
             user = MateBotUser(update.effective_message.from_user)
-            msg = self.get_help_usage(registry.commands, self.usage, user)
+            msg = help_catalogue.overview(help_catalogue.get_level(user))
 
         update.effective_message.reply_markdown(msg)
 
@@ -74,16 +208,10 @@ class HelpCommand(BaseCommand):
         msg = f"{usage}\n\nList of commands:\n\n{command_list}"
 
         if user and isinstance(user, MateBotUser) and user.external:
-            msg += "\n\nYou are an external user. Some commands may be restricted."
+            msg += EXTERNAL_NOTE
 
             if user.creditor is None:
-                msg += (
-                    "\nYou don't have any creditor. Your possible interactions "
-                    "with the bot are very limited for security purposes. You "
-                    "can ask some internal user to act as your voucher. To "
-                    "do this, the internal user needs to execute `/vouch "
-                    "<your username>`. Afterwards, you may use this bot."
-                )
+                msg += UNVOUCHED_NOTE
 
         return msg
 
@@ -107,6 +235,8 @@ class HelpInlineQuery(BaseInlineQuery):
     Get inline help messages like /help does as command
     """
 
+    cache_time = 3600
+
     def get_result_id(self, *args) -> str:
         """
         Generate a result ID based on the current time and the static word ``help``
@@ -128,10 +258,10 @@ class HelpInlineQuery(BaseInlineQuery):
         :rtype: typing.Optional[telegram.InlineQueryResult]
         """
 
-        if command not in registry.commands:
+        text = help_catalogue.command(command)
+        if text is None:
             return
 
-        text = HelpCommand.get_help_for_command(registry.commands[command])
         return self.get_result(f"Help on /{command}", text)
 
     def get_help(self) -> telegram.InlineQueryResult:
@@ -156,13 +286,21 @@ class HelpInlineQuery(BaseInlineQuery):
         """
         Answer the inline query by providing the result of :meth:`get_help`
 
+        The results are created once and taken from the help catalogue.
+        Since they are the same for every user, Telegram is allowed
+        to cache the answer for :attr:`cache_time` seconds.
+
         :param query: inline query as part of an incoming Update
         :type query: telegram.InlineQuery
         :return: None
         """
 
-        first_word = query.query.split(" ")[0]
-        if first_word.lower() in registry.commands:
-            query.answer([self.get_command_help(first_word.lower())])
+        first_word = query.query.split(" ")[0].lower()
+        if help_catalogue.command(first_word) is not None:
+            result = help_catalogue.inline_result(first_word, lambda: self.get_command_help(first_word))
         else:
-            query.answer([self.get_help()])
+            result = help_catalogue.inline_result(None, self.get_help)
+        query.answer([result], cache_time=self.cache_time)
+
+
+help_catalogue = HelpCatalogue(registry.commands)
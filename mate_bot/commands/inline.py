@@ -0,0 +1,170 @@
+"""
+MateBot cache of inline query answers with request coalescing
+"""
+
+import time
+import typing
+import threading
+import collections
+
+
+class _PendingAnswer:
+    """
+    Answer that is currently being computed by another thread
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class InlineAnswerCache:
+    """
+    Cache of inline query answers keyed by the normalized query text
+
+    Telegram sends a new inline query for nearly every keystroke, so many
+    users in a group produce lots of similar or identical queries. Answers
+    are therefore stored for a few seconds (least recently used answers are
+    evicted when the cache is full). When an answer for the same key is
+    already being computed by another thread, :meth:`fetch` waits for that
+    computation instead of starting another one (request coalescing).
+
+    Additionally, the cache keeps track of the latest inline query of every
+    user. A query that is not the latest query of its user anymore is
+    superseded and doesn't need to be answered at all, since the user
+    can only see the results of the most recent query.
+
+    :param size: maximum number of cached answers
+    :type size: int
+    :param ttl: number of seconds an answer stays valid
+    :type ttl: float
+    """
+
+    def __init__(self, size: int = 256, ttl: float = 30.0):
+        if not isinstance(size, int):
+            raise TypeError(f"Expected int as size, not {type(size)}")
+        if size <= 0:
+            raise ValueError("The size of the cache must be positive")
+
+        self._size = size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: typing.OrderedDict[typing.Hashable, typing.Tuple[typing.Any, float]] = \
+            collections.OrderedDict()
+        self._pending: typing.Dict[typing.Hashable, _PendingAnswer] = {}
+        self._latest: typing.Dict[int, str] = {}
+        self._generation = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def enter(self, user: int, query: str) -> None:
+        """
+        Mark the query as the latest inline query of the user
+
+        :param user: Telegram ID of the user who sent the query
+        :type user: int
+        :param query: unique ID of the inline query
+        :type query: str
+        :return: None
+        """
+
+        with self._lock:
+            self._latest[user] = query
+
+    def is_superseded(self, user: int, query: str) -> bool:
+        """
+        Check whether a newer inline query of the user has been entered
+
+        :param user: Telegram ID of the user who sent the query
+        :type user: int
+        :param query: unique ID of the inline query
+        :type query: str
+        :return: whether the query has been superseded by a newer query
+        :rtype: bool
+        """
+
+        with self._lock:
+            return self._latest.get(user, query) != query
+
+    def leave(self, user: int, query: str) -> None:
+        """
+        Forget the query of the user after it has been handled, unless a newer one exists
+
+        :param user: Telegram ID of the user who sent the query
+        :type user: int
+        :param query: unique ID of the inline query
+        :type query: str
+        :return: None
+        """
+
+        with self._lock:
+            if self._latest.get(user) == query:
+                del self._latest[user]
+
+    def fetch(self, key: typing.Hashable, factory: typing.Callable[[], typing.Any]) -> typing.Any:
+        """
+        Get the cached answer for the key or compute it using the factory
+
+        Exceptions raised by the factory are not cached, but they
+        are raised in all threads waiting for the same answer.
+
+        :param key: normalized query
+        :type key: typing.Hashable
+        :param factory: callable computing the answer
+        :type factory: typing.Callable[[], typing.Any]
+        :return: cached or computed answer
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                del self._entries[key]
+
+            generation = self._generation
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = _PendingAnswer()
+                self._pending[key] = pending
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = factory()
+        except BaseException as exc:
+            pending.error = exc
+            raise
+        finally:
+            with self._lock:
+                if pending.error is None and generation == self._generation:
+                    self._entries[key] = (pending.value, time.monotonic() + self._ttl)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self._size:
+                        self._entries.popitem(last=False)
+                del self._pending[key]
+            pending.event.set()
+
+        return pending.value
+
+    def clear(self) -> None:
+        """
+        Remove all cached answers
+
+        Answers that are currently being computed will not be stored.
+
+        :return: None
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
@@ -0,0 +1,80 @@
+"""
+MateBot lazy executor placeholders to speed up the bot's startup
+"""
+
+import typing
+import logging
+import importlib
+import threading
+
+
+logger = logging.getLogger("commands")
+
+
+class LazyExecutor:
+    """
+    Placeholder in an executor pool that imports and creates the real executor on first use
+
+    The placeholder stores itself under the given key in the given pool of the
+    :mod:`mate_bot.registry`. The real executor is created when the placeholder
+    is called (e.g. by a handler) or when one of its attributes is accessed
+    (e.g. by the help command). The constructor of the real executor then
+    replaces the placeholder in the pool, so that later lookups in the
+    registry return the real executor directly.
+
+    :param pool: executor pool of the registry that should store the executor
+    :type pool: dict
+    :param key: key of the executor in the pool (its name or pattern)
+    :type key: str
+    :param module: fully qualified name of the module that defines the executor class
+    :type module: str
+    :param cls: name of the executor class in the module
+    :type cls: str
+    :param args: positional arguments for the constructor of the executor class
+    :param kwargs: keyword arguments for the constructor of the executor class
+    """
+
+    def __init__(self, pool: dict, key: str, module: str, cls: str, *args, **kwargs):
+        self._pool = pool
+        self._key = key
+        self._module = module
+        self._cls = cls
+        self._args = args
+        self._kwargs = kwargs
+        self._executor = None
+        self._lock = threading.Lock()
+
+        pool[key] = self
+
+    def __repr__(self) -> str:
+        return f"LazyExecutor({self._module}.{self._cls}, {self._key!r})"
+
+    def __call__(self, *args, **kwargs) -> typing.Any:
+        return self.load()(*args, **kwargs)
+
+    def __getattr__(self, item: str) -> typing.Any:
+        if item.startswith("_"):
+            raise AttributeError(item)
+        return getattr(self.load(), item)
+
+    def load(self) -> typing.Any:
+        """
+        Import the module and create the executor unless this happened already
+
+        :return: the real executor object
+        :raises RuntimeError: when the executor registered itself using another key
+        """
+
+        if self._executor is not None:
+            return self._executor
+
+        with self._lock:
+            if self._executor is None:
+                cls = getattr(importlib.import_module(self._module), self._cls)
+                executor = cls(*self._args, **self._kwargs)
+                if self._pool.get(self._key) is not executor:
+                    raise RuntimeError(f"{executor} did not register itself as {self._key!r}")
+                logger.debug(f"Loaded executor {self._cls} for {self._key!r}")
+                self._executor = executor
+
+        return self._executor
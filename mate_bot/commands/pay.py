@@ -97,7 +97,7 @@ class PayCallbackQuery(BaseCallbackQuery):
     """
 
     def __init__(self):
-        super().__init__("pay", "^pay")
+        super().__init__("pay", "^pay", codec=Payment.callback_codec)
 
     def _get_payment(self, query: telegram.CallbackQuery) -> typing.Optional[Payment]:
         """
@@ -109,24 +109,8 @@ class PayCallbackQuery(BaseCallbackQuery):
         :rtype: typing.Optional[Pay]
         """
 
-        if self.data is None or self.data.strip() == "":
-            query.answer("Empty stripped callback data!", show_alert=True)
-            return
-
-        try:
-            vote, payment_id = self.data.split(" ")
-        except IndexError:
-            query.answer("Invalid callback data format!", show_alert=True)
-            raise
-
         try:
-            payment_id = int(payment_id)
-        except ValueError:
-            query.answer("Wrong payment ID format!", show_alert=True)
-            raise
-
-        try:
-            pay = Payment(payment_id)
+            pay = Payment(self.fields[0])
             if pay.active:
                 return pay
             query.answer("The pay is not active anymore!")
@@ -160,14 +144,7 @@ class PayCallbackQuery(BaseCallbackQuery):
                 )
                 return
 
-            if self.data.startswith("approve"):
-                vote = True
-            elif self.data.startswith("disapprove"):
-                vote = False
-            else:
-                update.callback_query.answer("Invalid callback query data!", show_alert=True)
-                raise ValueError(f"Invalid callback query data: '{self.data}'")
-
+            vote = self.action == "approve"
             success = payment.add_user(user, vote)
             if not success:
                 update.callback_query.answer("You already voted on this payment request.")
@@ -0,0 +1,88 @@
+"""
+MateBot command executor classes for /profile
+"""
+
+import logging
+
+import telegram
+
+from mate_bot.config import config
+from mate_bot.commands.base import BaseCommand
+from mate_bot.parsing.types import natural as natural_type
+from mate_bot.parsing.util import Namespace
+from mate_bot.profiling import profiler
+
+
+logger = logging.getLogger("commands")
+
+
+class ProfileCommand(BaseCommand):
+    """
+    Command executor for /profile
+    """
+
+    def __init__(self):
+        super().__init__(
+            "profile",
+            "Use this command to profile the bot for the next updates.\n\n"
+            "You can specify the number of updates and the number of seconds "
+            "to profile. Profiling stops when one of both limits is reached. "
+            "Use `/profile stop` to stop profiling early and `/profile status` "
+            "to see whether profiling is active.\n\n"
+            "This command can only be used in debugging chats."
+        )
+
+        self.parser.add_argument(
+            "updates",
+            nargs="?",
+            default=config["profiling"]["updates"],
+            type=natural_type
+        )
+        self.parser.add_argument(
+            "seconds",
+            nargs="?",
+            default=config["profiling"]["seconds"],
+            type=natural_type
+        )
+        self.parser.new_usage().add_argument(
+            "action",
+            type=lambda x: str(x).lower(),
+            choices=("stop", "status")
+        )
+
+    def run(self, args: Namespace, update: telegram.Update) -> None:
+        """
+        :param args: parsed namespace containing the arguments
+        :type args: argparse.Namespace
+        :param update: incoming Telegram update
+        :type update: telegram.Update
+        :return: None
+        """
+
+        if update.effective_message.chat.id not in config["chats"]["debugging"]:
+            update.effective_message.reply_text("This command can only be used in debugging chats.")
+            return
+
+        if args.action == "status":
+            state = "active" if profiler.active else "not active"
+            dumps = "\n".join(profiler.last_dumps) or "None"
+            update.effective_message.reply_text(f"Profiling is {state}.\n\nLatest dumps:\n{dumps}")
+
+        elif args.action == "stop":
+            if not profiler.active:
+                update.effective_message.reply_text("Profiling is not active.")
+                return
+            paths = profiler.stop()
+            update.effective_message.reply_text(
+                f"Profiling stopped. {len(paths)} dumps have been written:\n" + "\n".join(paths)
+            )
+
+        elif profiler.start(args.updates, args.seconds, config["profiling"]["directory"]):
+            logger.info(f"Profiling started by {update.effective_message.from_user.name}")
+            update.effective_message.reply_text(
+                f"Profiling the next {args.updates} updates or {args.seconds} seconds. "
+                f"The dumps will be written to {config['profiling']['directory']}."
+            )
+
+        else:
+            update.effective_message.reply_text("Profiling is already active.")
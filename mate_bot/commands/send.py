@@ -6,6 +6,7 @@ import logging
 
 import telegram
 
+from mate_bot.codec import CallbackCodec
 from mate_bot.parsing.types import amount as amount_type
 from mate_bot.parsing.types import user as user_type
 from mate_bot.parsing.util import Namespace
@@ -16,6 +17,11 @@ from mate_bot.state.transactions import LoggedTransaction
 
 logger = logging.getLogger("commands")
 
+callback_codec = CallbackCodec("send", {
+    "confirm": (int, int, int),
+    "abort": (int, int, int)
+})
+
 
 class SendCommand(BaseCommand):
     """
@@ -62,7 +68,7 @@ class SendCommand(BaseCommand):
             return
 
         def e(variant: str) -> str:
-            return f"send {variant} {args.amount} {sender.uid} {args.receiver.uid}"
+            return callback_codec.encode(variant, args.amount, sender.uid, args.receiver.uid)
 
         update.effective_message.reply_text(
             f"Do you want to send {args.amount / 100 :.2f}€ to {str(args.receiver)}?"
@@ -83,7 +89,7 @@ class SendCallbackQuery(BaseCallbackQuery):
     """
 
     def __init__(self):
-        super().__init__("send", "^send")
+        super().__init__("send", "^send", codec=callback_codec)
 
     def run(self, update: telegram.Update) -> None:
         """
@@ -95,17 +101,11 @@ class SendCallbackQuery(BaseCallbackQuery):
         """
 
         try:
-            variant, amount, original_sender, receiver = self.data.split(" ")
-            amount = int(amount)
-            receiver = MateBotUser(int(receiver))
-            original_sender = MateBotUser(int(original_sender))
-
-            if variant == "confirm":
-                confirmation = True
-            elif variant == "abort":
-                confirmation = False
-            else:
-                raise ValueError(f"Invalid confirmation setting: '{variant}'")
+            variant = self.action
+            amount, original_sender, receiver = self.fields
+            receiver = MateBotUser(receiver)
+            original_sender = MateBotUser(original_sender)
+            confirmation = variant == "confirm"
 
             sender = MateBotUser(update.callback_query.from_user)
             if sender != original_sender:
@@ -0,0 +1,139 @@
+"""
+MateBot command executor classes for /stats
+"""
+
+import csv
+import io
+import logging
+import tempfile
+
+import telegram
+
+from mate_bot.commands.base import BaseCommand
+from mate_bot.parsing.types import natural as natural_type
+from mate_bot.parsing.util import Namespace
+from mate_bot.state.consumptions import get_rollups
+
+
+logger = logging.getLogger("commands")
+
+
+class StatsCommand(BaseCommand):
+    """
+    Command executor for /stats
+    """
+
+    MAX_PERIODS = 52
+
+    def __init__(self):
+        super().__init__(
+            "stats",
+            "Use this command to see how many goods have been consumed.\n\n"
+            "You can choose between daily and weekly statistics (default `week`) "
+            f"and the number of periods to show (default 4, at most {self.MAX_PERIODS}).\n\n"
+            "You could also export the complete statistics as CSV file using "
+            "`/stats export`, optionally followed by `day` or `week`. Note that "
+            "this variant is restricted to your personal chat with the bot."
+        )
+
+        self.parser.add_argument(
+            "period",
+            nargs="?",
+            default="week",
+            type=lambda x: str(x).lower(),
+            choices=("day", "week")
+        )
+        self.parser.add_argument(
+            "count",
+            nargs="?",
+            default=4,
+            type=natural_type
+        )
+        export_usage = self.parser.new_usage()
+        export_usage.add_argument(
+            "export",
+            type=lambda x: str(x).lower(),
+            choices=("export",)
+        )
+        export_usage.add_argument(
+            "period",
+            nargs="?",
+            default="day",
+            type=lambda x: str(x).lower(),
+            choices=("day", "week")
+        )
+
+    def run(self, args: Namespace, update: telegram.Update) -> None:
+        """
+        :param args: parsed namespace containing the arguments
+        :type args: argparse.Namespace
+        :param update: incoming Telegram update
+        :type update: telegram.Update
+        :return: None
+        """
+
+        if args.export is None:
+            self._handle_report(args, update)
+        else:
+            self._handle_export(args, update)
+
+    def _handle_report(self, args: Namespace, update: telegram.Update) -> None:
+        """
+        Handle the request to show the consumptions of the latest periods
+
+        :param args: parsed namespace containing the arguments
+        :type args: argparse.Namespace
+        :param update: incoming Telegram update
+        :type update: telegram.Update
+        :return: None
+        """
+
+        count = min(args.count, self.MAX_PERIODS)
+        rollups = get_rollups(args.period, count)
+        if len(rollups) == 0:
+            update.effective_message.reply_text("Nothing has been consumed in this time.")
+            return
+
+        periods = {}
+        for entry in rollups:
+            periods.setdefault(entry["period"], []).append(f"{entry['quantity']}x {entry['consumable']}")
+
+        label = "day" if args.period == "day" else "week starting"
+        text = "\n".join(f"{label} {period}: {', '.join(entries)}" for period, entries in periods.items())
+        update.effective_message.reply_markdown(f"Consumptions of the last {count} {args.period}s:\n```\n{text}\n```")
+
+    @staticmethod
+    def _handle_export(args: Namespace, update: telegram.Update) -> None:
+        """
+        Handle the request to export the complete statistics as CSV file
+
+        :param args: parsed namespace containing the arguments
+        :type args: argparse.Namespace
+        :param update: incoming Telegram update
+        :type update: telegram.Update
+        :return: None
+        """
+
+        if update.effective_chat.type != update.effective_chat.PRIVATE:
+            update.effective_message.reply_text("This command can only be used in private chat.")
+            return
+
+        rollups = get_rollups(args.period)
+        if len(rollups) == 0:
+            update.effective_message.reply_text("Nothing has been consumed yet.")
+            return
+
+        content = io.StringIO()
+        writer = csv.DictWriter(content, ["period", "consumable", "quantity", "amount"])
+        writer.writeheader()
+        writer.writerows(rollups)
+
+        with tempfile.TemporaryFile(mode="w+b") as file:
+            file.write(content.getvalue().encode("UTF-8"))
+            file.seek(0)
+
+            update.effective_message.reply_document(
+                document=file,
+                filename=f"consumptions_{args.period}.csv",
+                caption=f"This file contains the consumptions per {args.period} (amounts in Cent)."
+            )
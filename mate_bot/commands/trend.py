@@ -0,0 +1,94 @@
+"""
+MateBot command executor classes for /trend
+"""
+
+import typing
+import logging
+import datetime
+
+import telegram
+
+from mate_bot.state.user import MateBotUser
+from mate_bot.state.balances import get_series
+from mate_bot.parsing.types import natural as natural_type
+from mate_bot.parsing.util import Namespace
+from mate_bot.commands.base import BaseCommand
+
+
+logger = logging.getLogger("commands")
+
+
+BARS = "▁▂▃▄▅▆▇█"
+
+
+def sparkline(values: typing.List[typing.Optional[int]]) -> str:
+    """
+    Render a series of values as a line of block characters
+
+    Unknown values (None) are rendered as spaces. A constant
+    series is rendered using the lowest block character.
+
+    :param values: series of values
+    :type values: typing.List[typing.Optional[int]]
+    :return: sparkline with one character per value
+    :rtype: str
+    """
+
+    known = [v for v in values if v is not None]
+    if len(known) == 0:
+        return " " * len(values)
+
+    low, high = min(known), max(known)
+    scale = (len(BARS) - 1) / (high - low) if high > low else 0
+    return "".join(" " if v is None else BARS[round((v - low) * scale)] for v in values)
+
+
+class TrendCommand(BaseCommand):
+    """
+    Command executor for /trend
+    """
+
+    MAX_DAYS = 90
+
+    def __init__(self):
+        super().__init__(
+            "trend",
+            "Use this command to see how your balance developed.\n\n"
+            "The bot replies with a small chart showing your balance at the end "
+            "of each of the last days. You can specify the number of days "
+            f"(default 30, at most {self.MAX_DAYS})."
+        )
+
+        self.parser.add_argument(
+            "days",
+            nargs="?",
+            default=30,
+            type=natural_type
+        )
+
+    def run(self, args: Namespace, update: telegram.Update) -> None:
+        """
+        :param args: parsed namespace containing the arguments
+        :type args: argparse.Namespace
+        :param update: incoming Telegram update
+        :type update: telegram.Update
+        :return: None
+        """
+
+        user = MateBotUser(update.effective_message.from_user)
+        days = min(args.days, self.MAX_DAYS)
+        start, series = get_series(user.uid, days)
+
+        known = [v for v in series if v is not None]
+        if len(known) == 0:
+            update.effective_message.reply_text("There is no history of your balance yet.")
+            return
+
+        end = start + datetime.timedelta(days=days - 1)
+        update.effective_message.reply_markdown(
+            f"Your balance from {start} to {end}:\n"
+            f"```\n{sparkline(series)}\n```\n"
+            f"Minimum: {min(known) / 100:.2f}€\n"
+            f"Maximum: {max(known) / 100:.2f}€\n"
+            f"Current: {user.balance / 100:.2f}€"
+        )
@@ -6,6 +6,7 @@ import logging
 
 import telegram
 
+from mate_bot.codec import CallbackCodec
 from mate_bot.commands.base import BaseCommand, BaseCallbackQuery
 from mate_bot.parsing import types
 from mate_bot.parsing.util import Namespace
@@ -15,6 +16,11 @@ from mate_bot.state.transactions import Transaction
 
 logger = logging.getLogger("commands")
 
+callback_codec = CallbackCodec("vouch", {
+    "add": (int, int, ("accept", "deny")),
+    "remove": (int, int, ("accept", "deny"))
+})
+
 
 class VouchCommand(BaseCommand):
     """
@@ -68,11 +74,15 @@ class VouchCommand(BaseCommand):
                     [
                         telegram.InlineKeyboardButton(
                             "YES",
-                            callback_data=f"vouch {args.command} {args.user.uid} {owner.uid} accept"
+                            callback_data=callback_codec.encode(
+                                args.command, args.user.uid, owner.uid, "accept"
+                            )
                         ),
                         telegram.InlineKeyboardButton(
                             "NO",
-                            callback_data=f"vouch {args.command} {args.user.uid} {owner.uid} deny"
+                            callback_data=callback_codec.encode(
+                                args.command, args.user.uid, owner.uid, "deny"
+                            )
                         )
                     ]
                 ])
@@ -167,7 +177,7 @@ class VouchCallbackQuery(BaseCallbackQuery):
     """
 
     def __init__(self):
-        super().__init__("vouch", "^vouch")
+        super().__init__("vouch", "^vouch", codec=callback_codec)
 
     def run(self, update: telegram.Update) -> None:
         """
@@ -179,9 +189,10 @@ class VouchCallbackQuery(BaseCallbackQuery):
         """
 
         try:
-            cmd, debtor, creditor, confirmation = self.data.split(" ")
-            creditor = MateBotUser(int(creditor))
-            debtor = MateBotUser(int(debtor))
+            cmd = self.action
+            debtor, creditor, confirmation = self.fields
+            creditor = MateBotUser(creditor)
+            debtor = MateBotUser(debtor)
 
             sender = MateBotUser(update.callback_query.from_user)
             if sender != creditor:
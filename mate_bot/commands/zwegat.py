@@ -3,9 +3,11 @@ MateBot command executor classes for /zwegat
 """
 
 import logging
+import datetime
 
 import telegram
 
+from mate_bot.state.ledger import ledger
 from mate_bot.state.user import CommunityUser, MateBotUser
 from mate_bot.commands.base import BaseCommand
 from mate_bot.parsing.util import Namespace
@@ -23,6 +25,8 @@ class ZwegatCommand(BaseCommand):
         super().__init__(
             "zwegat",
             "Use this command to show the central funds.\n\n"
+            "When the extended reports are available, the income per consumable "
+            "of the last 30 days and the turnover of the last four weeks are shown, too. "
             "This command can only be used by internal users."
         )
 
@@ -41,6 +45,34 @@ class ZwegatCommand(BaseCommand):
 
         total = CommunityUser().balance / 100
         if total >= 0:
-            update.effective_message.reply_text(f"Peter errechnet ein massives Vermögen von {total:.2f}€")
+            msg = f"Peter errechnet ein massives Vermögen von {total:.2f}€"
         else:
-            update.effective_message.reply_text(f"Peter errechnet Gesamtschulden von {-total:.2f}€")
+            msg = f"Peter errechnet Gesamtschulden von {-total:.2f}€"
+
+        if ledger.available:
+            msg += self._get_report()
+        update.effective_message.reply_text(msg)
+
+    @staticmethod
+    def _get_report() -> str:
+        """
+        Create the report about the income per consumable and the weekly turnover
+
+        :return: text of the report, prefixed by an empty line
+        :rtype: str
+        """
+
+        ledger.refresh()
+        now = datetime.datetime.now()
+
+        income = ledger.income_by_consumable(now - datetime.timedelta(days=30))
+        report = "\n\nIncome of the last 30 days:"
+        for name, (count, amount) in income.items():
+            report += f"\n{name}: {amount / 100:.2f}€ ({count} transactions)"
+        if len(income) == 0:
+            report += "\nnothing"
+
+        report += "\n\nTurnover per week:"
+        for start, count, amount in ledger.turnover(datetime.timedelta(weeks=1), now - datetime.timedelta(weeks=4)):
+            report += f"\nsince {start:%Y-%m-%d}: {amount / 100:.2f}€ ({count} transactions)"
+        return report
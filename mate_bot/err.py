@@ -8,10 +8,11 @@ import json as _json
 import traceback as _traceback
 import urllib.request as _request
 
-from telegram import Update as _Update, TelegramError
+from telegram import Update as _Update
 from telegram.ext import CallbackContext as _CallbackContext
 
 from mate_bot.config import config as _config
+from mate_bot.outbound import outbound_queue as _outbound_queue, PRIORITY_NOTIFICATION as _PRIORITY
 
 
 _logger = _logging.getLogger("error")
@@ -86,14 +87,26 @@ def log_error(update: _Update, context: _CallbackContext) -> None:
                       "it will be sent to the developers")
 
     def send_to(env, receiver, text, parse_mode, extra_text = None) -> None:
-        try:
-            msg = env.bot.send_message(
-                receiver, text, parse_mode = parse_mode
-            )
+        def reply(msg):
             if extra_text is not None:
-                msg.reply_text(extra_text, parse_mode=parse_mode, quote=True)
-        except TelegramError:
-            _logger.exception(f"Error while sending logs to {receiver}:")
+                _outbound_queue.submit(
+                    receiver,
+                    msg.reply_text,
+                    extra_text,
+                    parse_mode=parse_mode,
+                    quote=True,
+                    priority=_PRIORITY
+                )
+
+        _outbound_queue.submit(
+            receiver,
+            env.bot.send_message,
+            receiver,
+            text,
+            parse_mode=parse_mode,
+            priority=_PRIORITY,
+            callback=reply
+        )
 
     for dev in _config["chats"]["notification"]:
         send_to(
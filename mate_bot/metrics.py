@@ -0,0 +1,541 @@
+"""
+MateBot process metrics and an optional HTTP endpoint in the Prometheus text format
+"""
+
+import time
+import typing
+import logging
+import threading
+import http.server
+
+import telegram
+import telegram.utils.request
+
+from mate_bot.tracing import tracer
+
+
+logger = logging.getLogger("metrics")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: typing.Sequence[str], values: typing.Sequence[typing.Any]) -> str:
+    """
+    Format the labels of a sample, escaping the label values
+
+    :param names: names of the labels
+    :type names: typing.Sequence[str]
+    :param values: values of the labels in the same order
+    :type values: typing.Sequence[typing.Any]
+    :return: formatted labels including the braces (or an empty string without labels)
+    :rtype: str
+    """
+
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    """
+    Base class for a named metric with a fixed set of label names
+
+    The values of all label combinations are stored in a dictionary
+    keyed by the tuple of label values. Updating a value only needs
+    a dictionary access while holding the metric's lock, which is
+    cheap enough to keep the metrics enabled all the time.
+
+    :param name: name of the metric (should start with ``matebot_``)
+    :type name: str
+    :param description: short description used as ``HELP`` line
+    :type description: str
+    :param labels: names of the labels of the metric
+    :type labels: typing.Sequence[str]
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: typing.Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: typing.Dict[tuple, typing.Any] = {}
+
+    def _key(self, labels: typing.Sequence[typing.Any]) -> tuple:
+        """
+        Check the number of label values and convert them into a key
+
+        :param labels: values of the labels
+        :type labels: typing.Sequence[typing.Any]
+        :return: tuple of the label values
+        :rtype: tuple
+        :raises ValueError: when the number of label values is wrong
+        """
+
+        if len(labels) != len(self.labels):
+            raise ValueError(f"Metric {self.name} expects labels {self.labels}, got {labels}")
+        return tuple(labels)
+
+    def samples(self) -> typing.Iterator[str]:
+        """
+        Get the lines of all samples of the metric in the text format
+
+        :return: iterator over the lines (without the ``HELP`` and ``TYPE`` lines)
+        :rtype: typing.Iterator[str]
+        """
+
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values, key=lambda item: tuple(map(str, item[0]))):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+    def expose(self) -> str:
+        """
+        Get the metric in the text format including the ``HELP`` and ``TYPE`` lines
+
+        :return: text block describing the metric
+        :rtype: str
+        """
+
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    Metric whose values only increase (e.g. the number of handled updates)
+    """
+
+    kind = "counter"
+
+    def inc(self, *labels: typing.Any, amount: float = 1) -> None:
+        """
+        Increase the value of the counter for the given label values
+
+        :param labels: values of the labels
+        :param amount: non-negative amount to add
+        :type amount: float
+        :return: None
+        """
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, *labels: typing.Any) -> float:
+        """
+        Get the current value of the counter for the given label values
+
+        :param labels: values of the labels
+        :return: current value
+        :rtype: float
+        """
+
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """
+    Metric whose values may go up and down (e.g. the length of a queue)
+
+    Instead of setting the value, a function may be given that
+    produces the current value whenever the metrics are collected.
+
+    :param name: name of the metric
+    :type name: str
+    :param description: short description used as ``HELP`` line
+    :type description: str
+    :param labels: names of the labels of the metric
+    :type labels: typing.Sequence[str]
+    :param function: optional function returning the current value (only without labels)
+    :type function: typing.Optional[typing.Callable[[], float]]
+    """
+
+    kind = "gauge"
+
+    def __init__(
+            self,
+            name: str,
+            description: str,
+            labels: typing.Sequence[str] = (),
+            function: typing.Optional[typing.Callable[[], float]] = None
+    ):
+        super().__init__(name, description, labels)
+        if function is not None and self.labels:
+            raise ValueError("Gauges using a function can't have labels")
+        self.function = function
+
+    def set(self, value: float, *labels: typing.Any) -> None:
+        """
+        Set the value of the gauge for the given label values
+
+        :param value: new value
+        :type value: float
+        :param labels: values of the labels
+        :return: None
+        """
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels: typing.Any, amount: float = 1) -> None:
+        """
+        Increase (or decrease using a negative amount) the value of the gauge
+
+        :param labels: values of the labels
+        :param amount: amount to add
+        :type amount: float
+        :return: None
+        """
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: typing.Any, amount: float = 1) -> None:
+        """
+        Decrease the value of the gauge
+
+        :param labels: values of the labels
+        :param amount: amount to subtract
+        :type amount: float
+        :return: None
+        """
+
+        self.inc(*labels, amount=-amount)
+
+    def samples(self) -> typing.Iterator[str]:
+        if self.function is None:
+            yield from super().samples()
+            return
+        try:
+            yield f"{self.name} {self.function()}"
+        except Exception:
+            logger.exception(f"Collecting the gauge {self.name} failed")
+
+
+class Histogram(Metric):
+    """
+    Metric counting observed values (e.g. durations in seconds) in cumulative buckets
+
+    :param name: name of the metric
+    :type name: str
+    :param description: short description used as ``HELP`` line
+    :type description: str
+    :param labels: names of the labels of the metric
+    :type labels: typing.Sequence[str]
+    :param buckets: sorted upper bounds of the buckets (without ``+Inf``)
+    :type buckets: typing.Sequence[float]
+    """
+
+    kind = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            description: str,
+            labels: typing.Sequence[str] = (),
+            buckets: typing.Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: typing.Any) -> None:
+        """
+        Count an observed value for the given label values
+
+        :param value: observed value
+        :type value: float
+        :param labels: values of the labels
+        :return: None
+        """
+
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = [[0] * len(self.buckets), 0, 0.0]
+                self._values[key] = entry
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += 1
+            entry[2] += value
+
+    def time(self, *labels: typing.Any) -> "_Timer":
+        """
+        Get a context manager that observes the duration of its block in seconds
+
+        :param labels: values of the labels
+        :return: context manager
+        """
+
+        return _Timer(self, labels)
+
+    def samples(self) -> typing.Iterator[str]:
+        with self._lock:
+            values = [(labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self._values.items()]
+
+        names = self.labels + ("le",)
+        for labels, (counts, total, value_sum) in sorted(values, key=lambda item: tuple(map(str, item[0]))):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {total}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {value_sum}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {total}"
+
+
+class _Timer:
+    """
+    Context manager observing the duration of its block in a histogram
+    """
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self._histogram = histogram
+        self._labels = labels
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._histogram.observe(time.perf_counter() - self._start, *self._labels)
+
+
+class MetricsRegistry:
+    """
+    Collection of all metrics of the process
+
+    Besides metrics, functions producing complete text blocks may be
+    registered as collectors. They are called when the metrics are
+    exposed, which allows to read values from other objects lazily.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: typing.Dict[str, Metric] = {}
+        self._collectors: typing.List[typing.Callable[[], typing.Iterable[str]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add a metric to the registry
+
+        :param metric: any metric with a unique name
+        :type metric: Metric
+        :return: the same metric
+        :rtype: Metric
+        :raises ValueError: when another metric with the same name has been registered
+        """
+
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} has already been registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: typing.Callable[[], typing.Iterable[str]]) -> None:
+        """
+        Add a function that produces lines in the text format when the metrics are exposed
+
+        :param collector: function returning the lines (including ``HELP`` and ``TYPE`` lines)
+        :type collector: typing.Callable[[], typing.Iterable[str]]
+        :return: None
+        """
+
+        with self._lock:
+            self._collectors.append(collector)
+
+    def expose(self) -> str:
+        """
+        Get all metrics in the Prometheus text format
+
+        :return: complete text that can be served to a collector
+        :rtype: str
+        """
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        blocks = [metric.expose() for metric in metrics]
+        for collector in collectors:
+            try:
+                blocks.append("\n".join(collector()))
+            except Exception:
+                logger.exception(f"Metrics collector {collector} failed")
+        return "\n".join(filter(None, blocks)) + "\n"
+
+
+registry = MetricsRegistry()
+
+updates = registry.register(Counter(
+    "matebot_updates_total",
+    "Number of updates handled per executor",
+    ("kind", "executor")
+))
+update_errors = registry.register(Counter(
+    "matebot_update_errors_total",
+    "Number of updates per executor that raised an exception",
+    ("kind", "executor")
+))
+update_duration = registry.register(Histogram(
+    "matebot_update_duration_seconds",
+    "Time needed by the executors to handle an update",
+    ("kind", "executor")
+))
+database_queries = registry.register(Counter(
+    "matebot_database_queries_total",
+    "Number of executed database queries per statement type",
+    ("statement",)
+))
+database_duration = registry.register(Histogram(
+    "matebot_database_query_duration_seconds",
+    "Time needed to execute a database query and fetch its results",
+    ("statement",)
+))
+database_connections = registry.register(Counter(
+    "matebot_database_connections_total",
+    "Number of opened database connections"
+))
+telegram_requests = registry.register(Counter(
+    "matebot_telegram_requests_total",
+    "Number of requests to the Telegram Bot API per method",
+    ("method",)
+))
+telegram_errors = registry.register(Counter(
+    "matebot_telegram_errors_total",
+    "Number of failed requests to the Telegram Bot API per method and error",
+    ("method", "error")
+))
+telegram_duration = registry.register(Histogram(
+    "matebot_telegram_request_duration_seconds",
+    "Time needed for a request to the Telegram Bot API",
+    ("method",)
+))
+async_tasks = registry.register(Gauge(
+    "matebot_async_tasks",
+    "Number of tasks currently running in the thread pool of the dispatcher"
+))
+
+
+def statement_type(query: str) -> str:
+    """
+    Get the type of an SQL statement (e.g. ``SELECT``) to be used as label value
+
+    :param query: SQL query string
+    :type query: str
+    :return: first keyword of the query in upper case
+    :rtype: str
+    """
+
+    return query.lstrip().split(" ", 1)[0].upper()
+
+
+def throttle_collector(throttle: typing.Any) -> typing.Callable[[], typing.Iterator[str]]:
+    """
+    Create a collector exposing the allowed and rejected updates of a throttle
+
+    :param throttle: throttle providing a ``metrics`` method
+        (see :meth:`mate_bot.throttle.Throttle.metrics`)
+    :return: collector that can be added to the :class:`MetricsRegistry`
+    :rtype: typing.Callable[[], typing.Iterator[str]]
+    """
+
+    def collect() -> typing.Iterator[str]:
+        name = "matebot_throttle_updates_total"
+        yield f"# HELP {name} Number of updates per executor allowed or rejected by the throttle"
+        yield f"# TYPE {name} counter"
+        for executor, values in sorted(throttle.metrics().items()):
+            for result, value in sorted(values.items()):
+                yield f"{name}{_format_labels(('executor', 'result'), (executor, result))} {value}"
+
+    return collect
+
+
+class InstrumentedRequest(telegram.utils.request.Request):
+    """
+    Request object of the Telegram Bot that measures all requests to the Bot API
+
+    The method name is the last part of the requested URL. Pass an instance
+    of this class to the :class:`telegram.Bot` used by the Updater.
+    """
+
+    def post(self, url: str, data: typing.Optional[dict], timeout: typing.Optional[float] = None):
+        method = url.rsplit("/", 1)[-1]
+        telegram_requests.inc(method)
+        start = time.perf_counter()
+        try:
+            with tracer.span("telegram", method=method):
+                return super().post(url, data, timeout)
+        except telegram.TelegramError as exc:
+            telegram_errors.inc(method, type(exc).__name__)
+            raise
+        finally:
+            telegram_duration.observe(time.perf_counter() - start, method)
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Request handler that serves the metrics at the path ``/metrics``
+    """
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def do_GET(self) -> None:
+        if self.path != "/metrics":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = registry.expose().encode("UTF-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(http.server.ThreadingHTTPServer):
+    """
+    Local HTTP server that serves the metrics to a collector like Prometheus
+
+    The metrics don't contain any secrets, but the server
+    should still only listen on a local or internal address.
+
+    :param listen: address the server should listen on
+    :type listen: str
+    :param port: port the server should listen on (use ``0`` for an arbitrary free port)
+    :type port: int
+    """
+
+    daemon_threads = True
+
+    def __init__(self, listen: str, port: int):
+        super().__init__((listen, port), MetricsRequestHandler)
+
+    def start(self) -> threading.Thread:
+        """
+        Serve requests in a new background thread
+
+        :return: thread running the server
+        :rtype: threading.Thread
+        """
+
+        thread = threading.Thread(target=self.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        logger.info(f"Serving metrics on {self.server_address[0]}:{self.server_address[1]}")
+        return thread
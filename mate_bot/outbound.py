@@ -0,0 +1,427 @@
+"""
+MateBot outbound message queue with priorities and rate limiting
+"""
+
+import time
+import heapq
+import typing
+import logging
+import itertools
+import threading
+import collections
+
+import telegram
+
+from mate_bot.config import config
+from mate_bot.tracing import tracer
+
+
+logger = logging.getLogger("outbound")
+
+PRIORITY_USER = 0
+PRIORITY_NOTIFICATION = 1
+PRIORITY_LOG = 2
+
+NOT_MODIFIED_MESSAGE = "Message is not modified"
+
+
+class OutboundRequest:
+    """
+    Container for a single pending call to the Telegram Bot API
+
+    :param chat: Telegram Chat ID the request is addressed to (used for rate limiting)
+    :type chat: int
+    :param func: callable that performs the request, e.g. ``bot.send_message``
+    :type func: typing.Callable
+    :param args: positional arguments for the callable
+    :type args: tuple
+    :param kwargs: keyword arguments for the callable
+    :type kwargs: dict
+    :param priority: priority of the request (lower values are sent earlier)
+    :type priority: int
+    :param key: optional key to coalesce multiple requests (only the newest one will be sent)
+    :type key: typing.Optional[typing.Hashable]
+    :param callback: optional callable that receives the result of a successful request
+    :type callback: typing.Optional[typing.Callable[[typing.Any], None]]
+
+    The current span of the submitting thread is stored as well, so
+    that the request can be traced as part of the submitter's trace.
+    """
+
+    def __init__(
+            self,
+            chat: int,
+            func: typing.Callable,
+            args: tuple,
+            kwargs: dict,
+            priority: int,
+            key: typing.Optional[typing.Hashable] = None,
+            callback: typing.Optional[typing.Callable[[typing.Any], None]] = None
+    ):
+        self.chat = chat
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.key = key
+        self.callback = callback
+        self.attempts = 0
+        self.not_before = 0.0
+        self.cancelled = False
+        self.span = tracer.current()
+
+    def __repr__(self) -> str:
+        return f"OutboundRequest({getattr(self.func, '__name__', self.func)} to {self.chat})"
+
+    @property
+    def idempotent(self) -> bool:
+        """
+        Get the flag whether the request may be sent twice without visible effect (i.e. edits)
+        """
+
+        return getattr(self.func, "__name__", "").startswith("edit_")
+
+
+class OutboundQueue:
+    """
+    Central queue for outgoing Telegram requests that don't need to block the caller
+
+    Requests are sent by a single worker thread ordered by their priority
+    and by the order they were submitted in. The worker respects a global
+    limit of ``burst_limit`` requests per ``time_limit`` seconds as well as
+    a minimal interval between two requests to the same chat (group chats
+    have negative IDs and usually stricter limits than private chats).
+    A request to a chat that has to wait doesn't block other chats.
+
+    Flood control errors (``RetryAfter``) delay all further requests to
+    the affected chat by the time Telegram asks for. Network errors are
+    retried with an exponential backoff up to ``retries`` times. Timeouts
+    are only retried for edits, since a timed out request might have been
+    delivered anyway and sending a message twice would duplicate it.
+    Other errors are logged and the request is dropped.
+
+    As long as the queue isn't started (e.g. in scripts), every submitted
+    request is sent directly in the calling thread instead.
+
+    :param burst_limit: maximal number of requests in the given time frame
+    :type burst_limit: int
+    :param time_limit: length of the time frame in seconds
+    :type time_limit: float
+    :param group_interval: minimal time between two requests to the same group chat in seconds
+    :type group_interval: float
+    :param private_interval: minimal time between two requests to the same private chat in seconds
+    :type private_interval: float
+    :param retries: maximal number of retries after network errors or flood control
+    :type retries: int
+    """
+
+    def __init__(
+            self,
+            burst_limit: int = 30,
+            time_limit: float = 1.0,
+            group_interval: float = 3.0,
+            private_interval: float = 1.0,
+            retries: int = 3
+    ):
+        self._burst_limit = burst_limit
+        self._time_limit = time_limit
+        self._group_interval = group_interval
+        self._private_interval = private_interval
+        self._retries = retries
+
+        self._heap: typing.List[typing.Tuple[int, int, OutboundRequest]] = []
+        self._counter = itertools.count()
+        self._keys: typing.Dict[typing.Hashable, OutboundRequest] = {}
+        self._chats: typing.Dict[int, float] = {}
+        self._sent: typing.Deque[float] = collections.deque()
+        self._condition = threading.Condition()
+        self._thread: typing.Optional[threading.Thread] = None
+        self._running = False
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    @property
+    def running(self) -> bool:
+        """
+        Get the flag whether the worker thread is currently processing requests
+        """
+
+        return self._running
+
+    def start(self) -> None:
+        """
+        Start the worker thread that sends the queued requests
+
+        :return: None
+        """
+
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._work, name="OutboundQueue", daemon=True)
+            self._thread.start()
+        logger.debug("Started the outbound queue")
+
+    def stop(self, timeout: typing.Optional[float] = 30.0) -> None:
+        """
+        Stop the worker thread after all pending requests have been sent
+
+        :param timeout: maximal time in seconds to wait for the remaining requests
+        :type timeout: typing.Optional[float]
+        :return: None
+        """
+
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify_all()
+
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Outbound queue did not finish in time, {len(self)} request(s) are lost")
+        else:
+            logger.debug("Stopped the outbound queue")
+        self._thread = None
+
+    def submit(
+            self,
+            chat: int,
+            func: typing.Callable,
+            *args,
+            priority: int = PRIORITY_LOG,
+            key: typing.Optional[typing.Hashable] = None,
+            callback: typing.Optional[typing.Callable[[typing.Any], None]] = None,
+            **kwargs
+    ) -> None:
+        """
+        Add a request to the queue without waiting for it to be sent
+
+        Note that the chat ID is only used for rate limiting and must be
+        passed to the callable explicitly (as part of ``args`` or ``kwargs``).
+        When a key is given, a still pending request with the same key will be
+        dropped in favor of the new one (e.g. for consecutive message edits).
+
+        :param chat: Telegram Chat ID the request is addressed to
+        :type chat: int
+        :param func: callable that performs the request, e.g. ``bot.send_message``
+        :type func: typing.Callable
+        :param args: positional arguments for the callable
+        :param priority: priority of the request (one of the ``PRIORITY_*`` constants)
+        :type priority: int
+        :param key: optional key to coalesce multiple requests
+        :type key: typing.Optional[typing.Hashable]
+        :param callback: optional callable that receives the result of the request
+        :type callback: typing.Optional[typing.Callable[[typing.Any], None]]
+        :param kwargs: keyword arguments for the callable
+        :return: None
+        """
+
+        request = OutboundRequest(chat, func, args, kwargs, priority, key, callback)
+
+        if not self._running:
+            self._send(request, False)
+            return
+
+        with self._condition:
+            if key is not None:
+                previous = self._keys.get(key)
+                if previous is not None:
+                    previous.cancelled = True
+                self._keys[key] = request
+            heapq.heappush(self._heap, (priority, next(self._counter), request))
+            self._condition.notify()
+
+    def _get_interval(self, chat: int) -> float:
+        """
+        Get the minimal time between two requests to the chat
+
+        :param chat: Telegram Chat ID
+        :type chat: int
+        :return: interval in seconds
+        :rtype: float
+        """
+
+        if chat < 0:
+            return self._group_interval
+        return self._private_interval
+
+    def _pop_ready(self, now: float) -> typing.Tuple[typing.Optional[OutboundRequest], typing.Optional[float]]:
+        """
+        Remove and return the most important request that may be sent right now
+
+        This method must be called while holding the lock of the condition.
+
+        :param now: current value of the monotonic clock
+        :type now: float
+        :return: the request (or None) and the time to wait for the next request (or None)
+        """
+
+        skipped = []
+        result = None
+        wait = None
+
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            request = entry[2]
+            if request.cancelled:
+                continue
+
+            ready = max(request.not_before, self._chats.get(request.chat, 0.0))
+            if ready <= now:
+                result = request
+                break
+
+            skipped.append(entry)
+            if wait is None or ready - now < wait:
+                wait = ready - now
+
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+
+        if result is not None and result.key is not None and self._keys.get(result.key) is result:
+            del self._keys[result.key]
+        return result, wait
+
+    def _throttle(self) -> float:
+        """
+        Determine how long the worker has to wait to respect the global rate limit
+
+        This method must be called while holding the lock of the condition.
+
+        :return: time in seconds to wait (zero if the request may be sent now)
+        :rtype: float
+        """
+
+        now = time.monotonic()
+        while self._sent and self._sent[0] <= now - self._time_limit:
+            self._sent.popleft()
+        if len(self._sent) < self._burst_limit:
+            return 0.0
+        return self._sent[0] + self._time_limit - now
+
+    def _work(self) -> None:
+        """
+        Send all queued requests until the queue gets stopped and is empty
+
+        :return: None
+        """
+
+        while True:
+            with self._condition:
+                while True:
+                    if not self._running and not self._heap:
+                        return
+
+                    delay = self._throttle()
+                    if delay > 0:
+                        self._condition.wait(delay)
+                        continue
+
+                    now = time.monotonic()
+                    request, wait = self._pop_ready(now)
+                    if request is not None:
+                        self._sent.append(now)
+                        self._chats[request.chat] = now + self._get_interval(request.chat)
+                        break
+
+                    self._condition.wait(wait)
+
+            try:
+                self._send(request, True)
+            except Exception:
+                logger.exception(f"Unexpected error while sending {request}:")
+
+    def _send(self, request: OutboundRequest, retry: bool) -> None:
+        """
+        Perform the request and handle its errors
+
+        :param request: request that should be sent
+        :type request: OutboundRequest
+        :param retry: switch whether failed requests should be queued again
+        :type retry: bool
+        :return: None
+        """
+
+        try:
+            method = getattr(request.func, "__name__", "request")
+            with tracer.resume(request.span, "outbound", method=method, attempt=request.attempts):
+                result = request.func(*request.args, **request.kwargs)
+
+        except telegram.error.RetryAfter as exc:
+            logger.warning(f"Flood control for chat {request.chat}, retrying in {exc.retry_after}s")
+            self._reschedule(request, retry, exc.retry_after, True)
+
+        except telegram.error.BadRequest as exc:
+            if NOT_MODIFIED_MESSAGE in str(exc):
+                logger.debug(f"Ignoring unmodified message for {request}")
+            else:
+                logger.exception(f"Dropping {request} due to a bad request:")
+
+        except telegram.error.TimedOut as exc:
+            if request.idempotent:
+                logger.warning(f"Timeout for {request}: {exc}")
+                self._reschedule(request, retry, 2 ** request.attempts, False)
+            else:
+                logger.error(f"Dropping {request} after a timeout, it might have been delivered already")
+
+        except telegram.error.NetworkError as exc:
+            logger.warning(f"Network error for {request}: {exc}")
+            self._reschedule(request, retry, 2 ** request.attempts, False)
+
+        except telegram.error.TelegramError:
+            logger.exception(f"Dropping {request} due to an error:")
+
+        except Exception:
+            logger.exception(f"Dropping {request} due to an unexpected error:")
+
+        else:
+            if request.callback is not None:
+                try:
+                    request.callback(result)
+                except Exception:
+                    logger.exception(f"Callback of {request} failed:")
+
+    def _reschedule(self, request: OutboundRequest, retry: bool, delay: float, whole_chat: bool) -> None:
+        """
+        Queue a failed request again after the given delay
+
+        :param request: request that failed
+        :type request: OutboundRequest
+        :param retry: switch whether the request may be queued again at all
+        :type retry: bool
+        :param delay: time in seconds to wait before sending the request again
+        :type delay: float
+        :param whole_chat: switch whether all other requests to the chat should be delayed as well
+        :type whole_chat: bool
+        :return: None
+        """
+
+        request.attempts += 1
+        if not retry or request.attempts > self._retries:
+            logger.error(f"Giving up on {request} after {request.attempts} attempt(s)")
+            return
+
+        with self._condition:
+            request.not_before = time.monotonic() + delay
+            if whole_chat:
+                self._chats[request.chat] = request.not_before
+            if request.key is not None:
+                if request.key in self._keys:
+                    logger.debug(f"Dropping {request}, since it has been superseded")
+                    return
+                self._keys[request.key] = request
+            heapq.heappush(self._heap, (request.priority, next(self._counter), request))
+            self._condition.notify()
+
+
+outbound_queue = OutboundQueue(
+    config["outbound"]["burst-limit"],
+    config["outbound"]["time-limit"],
+    config["outbound"]["group-interval"],
+    config["outbound"]["private-interval"],
+    config["outbound"]["retries"]
+)
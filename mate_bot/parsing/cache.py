@@ -0,0 +1,156 @@
+"""
+MateBot parser's cache for the results of type converters
+"""
+
+import time
+import typing
+import functools
+import threading
+import collections
+
+
+class ConverterCache:
+    """
+    Cache of the results of type converters used by parser actions
+
+    Every entry belongs to a named converter and is stored with the time
+    it expires (or ``None`` for entries that never expire). Expired entries
+    are removed when they are accessed. Exceptions raised by a converter
+    are never cached, so that invalid arguments are checked again.
+
+    The cache is bounded by the total number of entries. When the
+    limit is exceeded, the least recently used entry is evicted.
+
+    :param size: maximum number of cached results
+    :type size: int
+    """
+
+    def __init__(self, size: int = 1024):
+        if not isinstance(size, int):
+            raise TypeError(f"Expected int as size, not {type(size)}")
+        if size <= 0:
+            raise ValueError("The size of the cache must be positive")
+
+        self._size = size
+        self._lock = threading.Lock()
+        self._entries: typing.OrderedDict[
+            typing.Tuple[str, typing.Hashable],
+            typing.Tuple[typing.Any, typing.Optional[float]]
+        ] = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def fetch(
+            self,
+            converter: str,
+            key: typing.Hashable,
+            factory: typing.Callable[[], typing.Any],
+            ttl: typing.Optional[float] = None
+    ) -> typing.Any:
+        """
+        Get the cached result of a converter or create and store it using the factory
+
+        The factory is called without holding the lock of the cache,
+        so that slow converters don't block other threads.
+
+        :param converter: name of the converter
+        :type converter: str
+        :param key: key of the converted argument
+        :type key: typing.Hashable
+        :param factory: callable creating the result if no valid cached entry exists
+        :type factory: typing.Callable[[], typing.Any]
+        :param ttl: number of seconds the result stays valid (``None`` to never expire)
+        :type ttl: typing.Optional[float]
+        :return: cached or created result
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((converter, key))
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end((converter, key))
+                    return value
+                del self._entries[(converter, key)]
+
+        value = factory()
+
+        with self._lock:
+            self._entries[(converter, key)] = (value, None if ttl is None else now + ttl)
+            self._entries.move_to_end((converter, key))
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def invalidate(self, converter: str, key: typing.Optional[typing.Hashable] = None) -> None:
+        """
+        Remove the cached results of one converter
+
+        :param converter: name of the converter
+        :type converter: str
+        :param key: key of the single result to remove (all results of the converter if ``None``)
+        :type key: typing.Optional[typing.Hashable]
+        :return: None
+        """
+
+        with self._lock:
+            if key is not None:
+                self._entries.pop((converter, key), None)
+                return
+            for entry in [k for k in self._entries if k[0] == converter]:
+                del self._entries[entry]
+
+    def clear(self) -> None:
+        """
+        Remove all cached results
+
+        :return: None
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+
+converter_cache = ConverterCache()
+
+
+def cached_converter(
+        ttl: typing.Optional[float] = None,
+        key: typing.Callable[[typing.Any], typing.Hashable] = str,
+        name: typing.Optional[str] = None,
+        cache: ConverterCache = converter_cache
+) -> typing.Callable[[typing.Callable], typing.Callable]:
+    """
+    Decorator to cache the results of a type converter for parser actions
+
+    The decorated function can be used as ``type`` of any
+    :class:`mate_bot.parsing.actions.Action`. The key function gets the
+    argument of the converter and must return the key of its result.
+    Arguments leading to the same key must lead to the same result.
+
+    :param ttl: number of seconds a result stays valid (``None`` to never expire)
+    :type ttl: typing.Optional[float]
+    :param key: function to get the cache key from the converter's argument
+    :type key: typing.Callable[[typing.Any], typing.Hashable]
+    :param name: name of the converter in the cache (defaults to the function's name)
+    :type name: typing.Optional[str]
+    :param cache: cache storing the results
+    :type cache: ConverterCache
+    :return: decorator for a converter function
+    """
+
+    def decorator(func: typing.Callable) -> typing.Callable:
+        converter = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(arg: typing.Any) -> typing.Any:
+            return cache.fetch(converter, key(arg), lambda: func(arg), ttl)
+
+        wrapper.cache_name = converter
+        return wrapper
+
+    return decorator
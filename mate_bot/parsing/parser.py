@@ -11,6 +11,7 @@ from mate_bot.parsing.util import EntityString, Namespace, Representable
 from mate_bot.parsing.usage import CommandUsage
 from mate_bot.parsing.actions import Action
 from mate_bot.parsing.formatting import plural_s
+from mate_bot.tracing import tracer
 
 
 class CommandParser(Representable):
@@ -26,6 +27,8 @@ class CommandParser(Representable):
         # Add initial default usage
         self._name = name
         self._usages = [CommandUsage()]
+        self._matchers = None
+        self._signature = None
 
     @property
     def usages(self) -> typing.List[CommandUsage]:
@@ -60,6 +63,7 @@ class CommandParser(Representable):
         self._usages.append(CommandUsage())
         return self._usages[-1]
 
+    @tracer.wrap("parse")
     def parse(self, msg: telegram.Message) -> Namespace:
         """
         Parse a telegram message into a namespace.
@@ -82,135 +86,58 @@ class CommandParser(Representable):
         # Parse
         return self._parse(arg_strings)
 
+    def _compile(self) -> typing.List["UsageMatcher"]:
+        """
+        Get the matchers of all usages, compiling them when the usages changed
+
+        The usages and their actions are usually added once in the constructor
+        of a command, so the matchers are compiled during the first parsing.
+        They are compiled again when a usage or an action has been added later.
+
+        :return: list of matchers in the order of the usages
+        :rtype: List[UsageMatcher]
+        """
+
+        signature = tuple(len(usage.actions) for usage in self._usages)
+        if self._matchers is None or self._signature != signature:
+            self._matchers = [UsageMatcher(usage) for usage in self._usages]
+            self._signature = signature
+        return self._matchers
+
     def _parse(self, arg_strings: typing.List[str]) -> Namespace:
         """
         Internal function for parsing from a list of strings.
 
+        The results of the type converters are shared between all usages,
+        so that every converter is called at most once for every argument
+        string (e.g. :func:`mate_bot.parsing.types.user` queries the database).
+        The error message is only built when no usage applies.
+
         :param arg_strings: a list of strings to parse
         :type arg_strings: List[str]
         :return: parsed arguments
         :rtype: Namespace
+        :raises ParsingError: when no usage applies to the argument strings
         """
 
+        conversions = {}
         errors = []
-        for usage in self._usages:
-            if usage.min_arguments > len(arg_strings):
-                errors.append(ParsingError(
-                    f"requires at least {usage.min_arguments} argument{plural_s(usage.min_arguments)}."
-                ))
-                continue
-            elif usage.max_arguments < len(arg_strings):
-                errors.append(ParsingError(
-                    f"allows at most {usage.max_arguments} argument{plural_s(usage.max_arguments)}."
-                ))
-                continue
-            else:
-                # Try the remaining ones
-                try:
-                    return self._parse_usage(usage, arg_strings)
-                except ParsingError as err:
-                    errors.append(err)
-                continue
+        for matcher in self._compile():
+            result = matcher.match(arg_strings, conversions)
+            if isinstance(result, Namespace):
+                return result
+            errors.append(result)
 
         # If you enter here, then all usages broke
         # Combine their error messages into one
+        if len(self._usages):
+            msg = ""
         else:
-            if len(self._usages):
-                msg = ""
-            else:
-                msg = "No usage applies:"
-
-            for usage, error in zip(self._usages, errors):
-                msg += f"\n`/{self._name} {usage}` {error}"
-            raise ParsingError(msg)
-
-    def _parse_usage(self, usage: CommandUsage, arg_strings: typing.List[str]) -> Namespace:
-        """
-        Try to parse the arguments with a usage
-
-        :param usage: the usage to parse the arguments with
-        :type usage: CommandUsage
-        :param arg_strings: argument strings to parse
-        :type arg_strings: List[str]
-        :return: parsed arguments
-        :rtype: Namespace
-        """
-
-        # Shortcut out if there are no actions
-        if len(usage.actions) == 0:
-            return Namespace()
-
-        # Initialize namespace and populate it with the defaults
-        namespace = Namespace()
-        for action in usage.actions:
-            setattr(namespace, action.dest, action.default)
-
-        def consume_action(local_action: Action, strings: typing.List[str]):
-            """
-            Use an action to consume as many argument strings as possible
-            """
-
-            values = []
-            error = None
-
-            while len(strings) > 0:
-                string = strings.pop(0)
-
-                try:
-                    # Try converting the argument string
-                    value = local_action.type(string)
-
-                    # Check choices
-                    if action.choices is not None and value not in action.choices:
-                        raise ValueError(f"{value} is not an available choice, choose from "
-                                         + ", ".join(map(lambda x: f"`{x}`", action.choices)))
-
-                    # Add converted to list
-                    values.append(value)
-
-                    # Action can take more -> next string
-                    if len(values) < local_action.max_args:
-                        continue
-                    else:
-                        break
-
-                except ValueError as err:
-                    # Save error for later
-                    error = err
-
-                    # Put back unprocessed string
-                    strings.insert(0, string)
-
-                    break
-
-            # Action isn't satisfied -> error
-            if local_action.min_args > len(values):
-                if error is not None:
-                    raise ParsingError(str(error))
-                else:
-                    raise ParsingError(f"Missing argument{plural_s(local_action.min_args-len(values))}")
-
-            # Action is satisfied -> finish with action
-            else:
-                # Process action
-                if action.nargs is None:
-                    local_action(namespace, values[0])
-                elif action.nargs == "?":
-                    if len(values) > 0:
-                        local_action(namespace, values[0])
-                else:
-                    local_action(namespace, values)
-
-        # Copy arg_strings to have a local list to mutate
-        left_strings = list(arg_strings)
-
-        for action in usage.actions:
-            consume_action(action, left_strings)
+            msg = "No usage applies:"
 
-        if len(left_strings) > 0:
-            raise ParsingError(f"Unrecognized argument{plural_s(left_strings)}: {', '.join(left_strings)}")
-
-        return namespace
+        for usage, error in zip(self._usages, errors):
+            msg += f"\n`/{self._name} {usage}` {error()}"
+        raise ParsingError(msg)
 
     @staticmethod
     def _split(msg: telegram.Message) -> typing.Iterator[EntityString]:
@@ -241,3 +168,128 @@ class CommandParser(Representable):
         # Return left over text which might be after the last entity
         if msg.text[last_entity:]:
             yield from map(EntityString, filter(bool, msg.text[last_entity:].split()))
+
+
+class UsageMatcher:
+    """
+    Compiled form of a :class:`CommandUsage` that matches argument strings
+
+    The bounds of the number of arguments and the defaults of the actions
+    are computed once. Argument strings are consumed by their index instead
+    of modifying a list of strings. The converted values are stored in a
+    dictionary keyed by the index of the argument string and the type
+    converter, which should be shared by all matchers used for one message.
+
+    Instead of an exception, :meth:`match` returns a callable that
+    produces the error message, so that error messages are only
+    formatted when they are really shown to the user.
+
+    :param usage: the usage to compile
+    :type usage: CommandUsage
+    """
+
+    def __init__(self, usage: CommandUsage):
+        self.usage = usage
+        self.actions = list(usage.actions)
+        self.min_arguments = usage.min_arguments
+        self.max_arguments = usage.max_arguments
+        self.defaults = {action.dest: action.default for action in self.actions}
+
+    @staticmethod
+    def _convert(
+            action: Action,
+            index: int,
+            string: str,
+            conversions: dict
+    ) -> typing.Tuple[typing.Any, typing.Optional[ValueError]]:
+        """
+        Convert an argument string with the type of an action, reusing earlier results
+
+        :param action: action whose type converter should be used
+        :type action: Action
+        :param index: index of the argument string
+        :type index: int
+        :param string: the argument string
+        :type string: str
+        :param conversions: results of previous conversions for the same argument strings
+        :type conversions: dict
+        :return: tuple of the converted value and the error raised by the converter
+        :rtype: Tuple[Any, Optional[ValueError]]
+        """
+
+        key = (index, action.type)
+        if key not in conversions:
+            try:
+                conversions[key] = (action.type(string), None)
+            except ValueError as err:
+                conversions[key] = (None, err)
+        return conversions[key]
+
+    def match(
+            self,
+            arg_strings: typing.List[str],
+            conversions: dict
+    ) -> typing.Union[Namespace, typing.Callable[[], str]]:
+        """
+        Try to parse the argument strings with the usage
+
+        :param arg_strings: argument strings to parse
+        :type arg_strings: List[str]
+        :param conversions: results of previous conversions for the same argument strings
+        :type conversions: dict
+        :return: parsed arguments or a callable producing the error message
+        :rtype: Union[Namespace, Callable[[], str]]
+        """
+
+        count = len(arg_strings)
+        if self.min_arguments > count:
+            return lambda: f"requires at least {self.min_arguments} argument{plural_s(self.min_arguments)}."
+        if self.max_arguments < count:
+            return lambda: f"allows at most {self.max_arguments} argument{plural_s(self.max_arguments)}."
+
+        # Shortcut out if there are no actions
+        if not self.actions:
+            return Namespace()
+
+        namespace = Namespace(**self.defaults)
+        index = 0
+
+        for action in self.actions:
+            values = []
+            error = None
+
+            while index < count and len(values) < action.max_args:
+                value, error = self._convert(action, index, arg_strings[index], conversions)
+                if error is None and action.choices is not None and value not in action.choices:
+                    error = ValueError(f"{value} is not an available choice, choose from "
+                                       + ", ".join(map(lambda x: f"`{x}`", action.choices)))
+                if error is not None:
+                    break
+
+                values.append(value)
+                index += 1
+
+            # Action isn't satisfied -> error
+            if action.min_args > len(values):
+                if error is not None:
+                    return lambda e=error: str(e)
+                missing = action.min_args - len(values)
+                return lambda: f"Missing argument{plural_s(missing)}"
+
+            # Action is satisfied -> finish with action
+            try:
+                if action.nargs is None:
+                    action(namespace, values[0])
+                elif action.nargs == "?":
+                    if len(values) > 0:
+                        action(namespace, values[0])
+                else:
+                    action(namespace, values)
+            except ParsingError as err:
+                return lambda e=err: str(e)
+
+        if index < count:
+            left_strings = arg_strings[index:]
+            return lambda: f"Unrecognized argument{plural_s(left_strings)}: {', '.join(left_strings)}"
+
+        return namespace
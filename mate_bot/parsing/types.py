@@ -6,10 +6,11 @@ See :class:`mate_bot.parsing.actions.Action`'s type parameter
 import re
 
 from mate_bot import registry
-from mate_bot.state.user import MateBotUser
+from mate_bot.state.user import MateBotUser, add_update_hook
 from mate_bot.state.finders import find_user_by_username
 from mate_bot.commands.base import BaseCommand
 from mate_bot.config import config
+from mate_bot.parsing.cache import cached_converter, converter_cache
 from mate_bot.parsing.util import EntityString
 
 
@@ -70,10 +71,37 @@ def natural(arg: str) -> int:
     return result
 
 
+@cached_converter(ttl=300, key=lambda username: username.lower())
+def _mention(username: str) -> int:
+    """
+    Find the internal ID of the user with the given username
+
+    The results are cached for some minutes and the cache is cleared
+    whenever a user's username changes or a new user is registered.
+
+    :param username: username of the mentioned user (with or without the leading @)
+    :type username: str
+    :return: internal user ID
+    :rtype: int
+    :raises ValueError: when username is ambiguous or unknown
+    """
+
+    usr = find_user_by_username(username)
+    if usr is None:
+        raise ValueError("Ambiguous username. Please send /start to the bot privately.")
+    return usr.uid
+
+
+add_update_hook(lambda uid, column: converter_cache.invalidate(_mention.cache_name))
+
+
 def user(arg: EntityString) -> MateBotUser:
     """
     Convert the string into a MateBot user as defined in the ``state`` package
 
+    Usernames of mentions are resolved from a cache, but the user's
+    record itself is always read from the database to be up-to-date.
+
     :param arg: string to be parsed
     :type arg: EntityString
     :return: fully functional MateBot user
@@ -85,10 +113,7 @@ def user(arg: EntityString) -> MateBotUser:
         raise ValueError('No user mentioned. Try with "@".')
 
     elif arg.entity.type == "mention":
-        usr = find_user_by_username(arg)
-        if usr is None:
-            raise ValueError("Ambiguous username. Please send /start to the bot privately.")
-        return usr
+        return MateBotUser(_mention(str(arg)))
 
     elif arg.entity.type == "text_mention":
         return MateBotUser(arg.entity.user)
@@ -97,6 +122,7 @@ def user(arg: EntityString) -> MateBotUser:
         raise ValueError('No user mentioned. Try with "@".')
 
 
+@cached_converter(key=lambda arg: (arg.lower(), registry.commands.version))
 def command(arg: str) -> BaseCommand:
     """
     Convert the string into a command with this name
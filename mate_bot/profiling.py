@@ -0,0 +1,189 @@
+"""
+MateBot on-demand profiling of the executors for a limited number of updates or seconds
+"""
+
+import os
+import time
+import pstats
+import typing
+import logging
+import cProfile
+import functools
+import threading
+
+
+logger = logging.getLogger("profiling")
+
+
+class Profiler:
+    """
+    Profiler of the executors that is only active for a limited time
+
+    A profiling session is started using :meth:`start` and ends after the given
+    number of updates has been handled or the given number of seconds has passed,
+    whatever happens first (or when :meth:`stop` is called). During the session,
+    every update handled by an executor decorated with :func:`profile_update`
+    is profiled using ``cProfile``. The statistics are aggregated per executor
+    class. At the end of the session, one ``pstats`` dump per executor is written
+    to the directory of the session. The dumps can be inspected using the module
+    :mod:`pstats` or converted to flame graphs by tools like ``flameprof``.
+
+    While no session is active, the decorated executors only check the
+    attribute :attr:`active`, so the profiler doesn't slow down the bot.
+    """
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._stats: typing.Dict[str, pstats.Stats] = {}
+        self._remaining: typing.Optional[int] = None
+        self._directory = "."
+        self._started = 0.0
+        self._timer: typing.Optional[threading.Timer] = None
+        self.last_dumps: typing.List[str] = []
+
+    def start(
+            self,
+            updates: typing.Optional[int] = None,
+            seconds: typing.Optional[float] = None,
+            directory: str = "."
+    ) -> bool:
+        """
+        Start a new profiling session
+
+        :param updates: number of updates to profile (unlimited if None)
+        :type updates: typing.Optional[int]
+        :param seconds: number of seconds to profile (unlimited if None)
+        :type seconds: typing.Optional[float]
+        :param directory: directory where the dumps will be written
+        :type directory: str
+        :return: whether the session has been started (False if another session is active)
+        :rtype: bool
+        :raises ValueError: when neither the number of updates nor seconds are given
+        """
+
+        if updates is None and seconds is None:
+            raise ValueError("A profiling session needs a limit of updates or seconds")
+
+        with self._lock:
+            if self.active:
+                return False
+            self._stats = {}
+            self._remaining = updates
+            self._directory = directory
+            self._started = time.time()
+            if seconds is not None:
+                self._timer = threading.Timer(seconds, self.stop)
+                self._timer.daemon = True
+                self._timer.start()
+            self.active = True
+
+        logger.info(f"Started profiling for {updates} updates or {seconds} seconds")
+        return True
+
+    def stop(self) -> typing.List[str]:
+        """
+        Stop the current profiling session and write the dumps
+
+        :return: list of paths of the written dumps (empty if no session was active)
+        :rtype: typing.List[str]
+        """
+
+        with self._lock:
+            if not self.active:
+                return []
+            self.active = False
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            stats = self._stats
+            self._stats = {}
+            directory = self._directory
+            started = self._started
+
+        os.makedirs(directory, exist_ok=True)
+        prefix = time.strftime("profile-%Y%m%d-%H%M%S", time.localtime(started))
+        paths = []
+        for executor, executor_stats in sorted(stats.items()):
+            path = os.path.join(directory, f"{prefix}-{executor}.pstats")
+            executor_stats.dump_stats(path)
+            paths.append(path)
+
+        self.last_dumps = paths
+        logger.info(f"Stopped profiling, wrote {len(paths)} dumps to {directory}")
+        return paths
+
+    def run(self, executor: str, func: typing.Callable, *args, **kwargs) -> typing.Any:
+        """
+        Call the function while profiling it as part of the executor's statistics
+
+        :param executor: name of the executor used to aggregate the statistics
+        :type executor: str
+        :param func: function handling the update
+        :type func: typing.Callable
+        :param args: positional arguments of the function
+        :param kwargs: keyword arguments of the function
+        :return: return value of the function
+        """
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler is already active in this thread
+            return func(*args, **kwargs)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._record(executor, profile)
+
+    def _record(self, executor: str, profile: cProfile.Profile) -> None:
+        """
+        Add the profile of one update to the statistics of the executor
+
+        :param executor: name of the executor
+        :type executor: str
+        :param profile: disabled profile of the update
+        :type profile: cProfile.Profile
+        :return: None
+        """
+
+        with self._lock:
+            if not self.active:
+                return
+            if executor in self._stats:
+                self._stats[executor].add(profile)
+            else:
+                self._stats[executor] = pstats.Stats(profile)
+
+            if self._remaining is None:
+                return
+            self._remaining -= 1
+            finished = self._remaining <= 0
+
+        if finished:
+            self.stop()
+
+
+profiler = Profiler()
+
+
+def profile_update(func: typing.Callable) -> typing.Callable:
+    """
+    Decorator for the ``__call__`` method of executors to profile them on demand
+
+    :param func: ``__call__`` method of an executor class
+    :type func: typing.Callable
+    :return: decorated method
+    :rtype: typing.Callable
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, update, context):
+        if not profiler.active:
+            return func(self, update, context)
+        return profiler.run(type(self).__name__, func, self, update, context)
+
+    return wrapper
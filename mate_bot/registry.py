@@ -36,10 +36,56 @@ different module's attributes and describes their use:
     incoming updates, too. The handler class is
     :class:`FilteredChosenInlineResultHandler`. The type of
     all stored values is ``BaseInlineResult`` or a subclass.
+
+All pools are instances of :class:`Registry`, which counts the
+modifications of the pool. Data derived from the executors
+(e.g. the help messages) can therefore be computed once and
+only needs to be computed again when the version changed.
 """
 
 
-commands: dict = {}
-callback_queries: dict = {}
-inline_queries: dict = {}
-inline_results: dict = {}
+class Registry(dict):
+    """
+    Dictionary of executors with a version that increases on every modification
+
+    Note that the version also increases when a lazy placeholder
+    is replaced by the real executor using the same key.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def __setitem__(self, key, value) -> None:
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        self.version += 1
+
+    def clear(self) -> None:
+        super().clear()
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self.version += 1
+
+
+commands: Registry = Registry()
+callback_queries: Registry = Registry()
+inline_queries: Registry = Registry()
+inline_results: Registry = Registry()
@@ -0,0 +1,256 @@
+"""
+MateBot archival of old transactions with balance checkpoints
+
+Transactions of closed periods are moved from the ``transactions`` table
+into the ``transactions_archive`` table in small batches, so that the bot
+may keep running. For every user, the sum of all archived amounts is
+carried forward in the ``balance_checkpoints`` table, which allows queries
+about recent transactions to ignore the archive completely.
+"""
+
+import time
+import typing
+import logging
+import datetime
+
+import telegram.ext
+
+from mate_bot.config import config
+from mate_bot.state.dbhelper import BackendHelper, pymysql
+
+
+logger = logging.getLogger("state")
+
+
+def get_cutoff(months: int, now: typing.Optional[datetime.date] = None) -> datetime.date:
+    """
+    Get the first day of the oldest month that should not be archived
+
+    Only complete months are archived, so the current month and the
+    ``months`` previous months will stay in the transactions table.
+
+    :param months: number of complete months which should not be archived
+    :type months: int
+    :param now: optional current day (defaults to today)
+    :type now: typing.Optional[datetime.date]
+    :return: first day of the month, all earlier transactions may be archived
+    :rtype: datetime.date
+    :raises ValueError: when the number of months is negative
+    """
+
+    if months < 0:
+        raise ValueError("The number of months must not be negative")
+    if now is None:
+        now = datetime.date.today()
+
+    index = now.year * 12 + now.month - 1 - months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def get_checkpoint(uid: int) -> typing.Tuple[int, int]:
+    """
+    Get the sum of the archived amounts of a user and the ID of the latest archived transaction
+
+    :param uid: internal user ID
+    :type uid: int
+    :return: tuple of the archived balance and the transaction ID (both zero without checkpoint)
+    :rtype: typing.Tuple[int, int]
+    """
+
+    rows, values = BackendHelper._execute(
+        "SELECT balance, transactions_id FROM balance_checkpoints WHERE users_id=%s",
+        (uid,)
+    )
+    if rows == 0:
+        return 0, 0
+    return values[0]["balance"], values[0]["transactions_id"]
+
+
+def _get_references() -> typing.List[typing.Tuple[str, str]]:
+    """
+    Get all foreign keys that reference the transactions table
+
+    :return: list of tuples of the table name and the constraint name
+    :rtype: typing.List[typing.Tuple[str, str]]
+    """
+
+    _, values = BackendHelper._execute(
+        "SELECT DISTINCT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME = 'transactions'"
+    )
+    return [(v["TABLE_NAME"], v["CONSTRAINT_NAME"]) for v in values]
+
+
+def _check_references() -> None:
+    """
+    Make sure that no other table references the transactions table
+
+    Moving a transaction would delete or break the rows referencing it otherwise.
+
+    :return: None
+    :raises RuntimeError: when a foreign key references the transactions table
+    """
+
+    references = _get_references()
+    if references:
+        raise RuntimeError(
+            "Transactions can't be archived while they are referenced by "
+            + ", ".join(f"{table}.{constraint}" for table, constraint in references)
+            + " (upgrade the database using setup_database.py)"
+        )
+
+
+def drop_references() -> int:
+    """
+    Drop all foreign keys that reference the transactions table
+
+    Older databases store consumption records with a foreign key to
+    their transaction, which prevents the archival of transactions.
+    The consumption records keep the ID of their transaction, which
+    may be found in either transactions table afterwards.
+
+    :return: number of dropped foreign keys
+    :rtype: int
+    """
+
+    references = _get_references()
+    for table, constraint in references:
+        BackendHelper._execute(f"ALTER TABLE `{table}` DROP FOREIGN KEY `{constraint}`")
+        logger.info(f"Dropped foreign key {table}.{constraint} referencing the transactions")
+    return len(references)
+
+
+def _sum_checkpoints(
+        rows: typing.Iterable[typing.Tuple[int, int, int, int, typing.Any, typing.Any]]
+) -> typing.Dict[int, typing.Tuple[int, int]]:
+    """
+    Sum up the changes of the balance checkpoints caused by archiving the given transactions
+
+    :param rows: transactions ordered by ID as tuples of ID, sender, receiver, amount, reason and timestamp
+    :type rows: typing.Iterable[typing.Tuple[int, int, int, int, typing.Any, typing.Any]]
+    :return: dictionary of tuples of the balance change and the latest transaction ID by user ID
+    :rtype: typing.Dict[int, typing.Tuple[int, int]]
+    """
+
+    checkpoints = {}
+    for transaction_id, sender, receiver, amount, _, _ in rows:
+        for uid, delta in ((sender, -amount), (receiver, amount)):
+            balance, _ = checkpoints.get(uid, (0, 0))
+            checkpoints[uid] = (balance + delta, transaction_id)
+    return checkpoints
+
+
+def archive_transactions(before: datetime.date, batch_size: int = 1000, pause: float = 0.0) -> int:
+    """
+    Move all transactions registered before the given day into the archive
+
+    Every batch is moved in its own database transaction, which also updates
+    the balance checkpoints of the affected users. Therefore, the archive
+    and the checkpoints are always consistent, even if the archival is
+    interrupted. Only the rows of the current batch are locked. The
+    latest transaction is never archived, since the server may reset the
+    auto increment value to the highest remaining ID after a restart.
+
+    :param before: first day that should not be archived
+    :type before: datetime.date
+    :param batch_size: number of transactions moved per database transaction
+    :type batch_size: int
+    :param pause: number of seconds to sleep between two batches
+    :type pause: float
+    :return: number of archived transactions
+    :rtype: int
+    :raises RuntimeError: when a foreign key references the transactions table
+    """
+
+    _check_references()
+
+    latest = BackendHelper._execute("SELECT MAX(id) AS latest FROM transactions")[1][0]["latest"]
+    if latest is None:
+        return 0
+
+    archived = 0
+    while True:
+        connection = pymysql.connect(**BackendHelper.db_config)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, sender, receiver, amount, reason, registered FROM transactions "
+                    "WHERE registered < %s AND id < %s ORDER BY id LIMIT %s FOR UPDATE",
+                    (before, latest, batch_size)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                checkpoints = _sum_checkpoints(rows)
+
+                cursor.executemany(
+                    "INSERT INTO transactions_archive (id, sender, receiver, amount, reason, registered) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)",
+                    rows
+                )
+                cursor.executemany(
+                    "INSERT INTO balance_checkpoints (users_id, balance, transactions_id) VALUES (%s, %s, %s) "
+                    "ON DUPLICATE KEY UPDATE balance = balance + VALUES(balance), "
+                    "transactions_id = GREATEST(transactions_id, VALUES(transactions_id))",
+                    [(uid, balance, transaction_id) for uid, (balance, transaction_id) in checkpoints.items()]
+                )
+                cursor.execute(
+                    f"DELETE FROM transactions WHERE id IN ({', '.join(['%s'] * len(rows))})",
+                    [row[0] for row in rows]
+                )
+            connection.commit()
+
+        finally:
+            connection.close()
+
+        archived += len(rows)
+        logger.debug(f"Archived {archived} transactions so far")
+        if pause > 0:
+            time.sleep(pause)
+
+    if archived > 0:
+        logger.info(f"Archived {archived} transactions registered before {before}")
+    return archived
+
+
+def run_archival(context: typing.Optional[telegram.ext.CallbackContext] = None) -> None:
+    """
+    Archive the transactions of all closed periods as configured
+
+    This function is suitable as callback for the job queue.
+
+    :param context: optional callback context of the job queue (unused)
+    :type context: typing.Optional[telegram.ext.CallbackContext]
+    :return: None
+    """
+
+    settings = config["archive"]
+    try:
+        archive_transactions(
+            get_cutoff(settings["keep-months"]),
+            settings["batch-size"],
+            settings["pause"]
+        )
+    except RuntimeError as exc:
+        logger.error(str(exc))
+
+
+def schedule_archival(job_queue: telegram.ext.JobQueue) -> typing.Optional[telegram.ext.Job]:
+    """
+    Register the repeating archival of old transactions in the job queue
+
+    The archival is disabled when the configured interval is zero.
+
+    :param job_queue: job queue of the running Updater
+    :type job_queue: telegram.ext.JobQueue
+    :return: the newly scheduled job or None
+    :rtype: typing.Optional[telegram.ext.Job]
+    """
+
+    interval = config["archive"]["interval"]
+    if interval <= 0:
+        logger.info("Archival of old transactions is disabled")
+        return None
+
+    return job_queue.run_repeating(run_archival, interval, first=interval)
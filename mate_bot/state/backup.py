@@ -0,0 +1,234 @@
+"""
+MateBot streaming backup and restore of the database
+"""
+
+import os
+import gzip
+import json
+import typing
+import logging
+import datetime
+
+from mate_bot.state.dbhelper import BackendHelper, DatabaseSchema, DATABASE_SCHEMA, pymysql
+
+
+logger = logging.getLogger("state")
+
+FORMAT = "matebot-backup"
+VERSION = 1
+BATCH_SIZE = 1000
+
+
+def _connect() -> pymysql.connections.Connection:
+    """
+    Open a new database connection using the configuration of the :class:`BackendHelper`
+
+    :return: open connection without autocommit
+    :rtype: pymysql.connections.Connection
+    """
+
+    return pymysql.connect(**BackendHelper.db_config)
+
+
+def _encode(value: typing.Any) -> typing.Any:
+    """
+    Convert a value of a column into a JSON serializable value
+
+    :param value: value as returned by the database module
+    :return: JSON serializable value
+    """
+
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return str(value)
+    return value
+
+
+def read_archive(
+        f: typing.TextIO,
+        schema: DatabaseSchema = DATABASE_SCHEMA,
+        batch_size: int = BATCH_SIZE
+) -> typing.Iterator[typing.Tuple[str, typing.List[str], typing.List[list]]]:
+    """
+    Read the rows of a backup archive in batches
+
+    An archive consists of JSON lines: the header, then for every table an
+    object with the table's name and columns followed by one array per row.
+    Only tables and columns defined in the schema are accepted, since
+    their names are used in queries without any further escaping.
+
+    :param f: decompressed archive opened in text mode
+    :type f: typing.TextIO
+    :param schema: database schema the archive must match
+    :type schema: DatabaseSchema
+    :param batch_size: maximum number of rows per batch
+    :type batch_size: int
+    :return: iterator over tuples of the table name, its columns and a batch of rows
+        (every table is yielded at least once, possibly with an empty batch)
+    :raises ValueError: when the archive is not a valid backup for the schema
+    """
+
+    header = json.loads(f.readline() or "null")
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise ValueError("The file is not a MateBot backup archive")
+    if header.get("version") != VERSION:
+        raise ValueError(f"Unsupported backup archive version {header.get('version')}")
+
+    table = None
+    columns = None
+    batch = []
+    for line in f:
+        entry = json.loads(line)
+        if isinstance(entry, list):
+            if table is None or len(entry) != len(columns):
+                raise ValueError("Invalid row in the backup archive")
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield table, columns, batch
+                batch = []
+            continue
+
+        if table is not None:
+            yield table, columns, batch
+            batch = []
+        table = entry["table"]
+        columns = entry["columns"]
+        if table not in schema or not all(c in schema[table] for c in columns):
+            raise ValueError(f"Table {table} with columns {columns} doesn't match the schema")
+
+    if table is not None:
+        yield table, columns, batch
+
+
+def dump(path: str, schema: DatabaseSchema = DATABASE_SCHEMA, batch_size: int = BATCH_SIZE) -> typing.Dict[str, int]:
+    """
+    Write a consistent snapshot of all tables of the schema into a compressed archive
+
+    All tables are read within one transaction using a consistent snapshot,
+    which doesn't lock the tables for other connections. The rows are fetched
+    using a server-side cursor in batches, so the memory usage doesn't depend
+    on the size of the database. The archive is written to a temporary file
+    first and only replaces ``path`` after it has been completed.
+
+    :param path: path of the gzip-compressed archive
+    :type path: str
+    :param schema: database schema whose tables should be dumped
+    :type schema: DatabaseSchema
+    :param batch_size: number of rows fetched from the server at once
+    :type batch_size: int
+    :return: number of rows per table
+    :rtype: typing.Dict[str, int]
+    """
+
+    counts = {}
+    temporary = f"{path}.tmp"
+    connection = _connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+
+        with gzip.open(temporary, "wt", encoding="UTF-8") as f:
+            tables = schema.dependency_order()
+            f.write(json.dumps({
+                "format": FORMAT,
+                "version": VERSION,
+                "created": datetime.datetime.now().isoformat(),
+                "tables": tables
+            }) + "\n")
+
+            for table in tables:
+                columns = list(schema[table].keys())
+                f.write(json.dumps({"table": table, "columns": columns}) + "\n")
+                counts[table] = 0
+
+                cursor = connection.cursor(pymysql.cursors.SSCursor)
+                try:
+                    cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        for row in rows:
+                            f.write(json.dumps([_encode(v) for v in row]) + "\n")
+                        counts[table] += len(rows)
+                finally:
+                    cursor.close()
+                logger.debug(f"Dumped {counts[table]} rows of table {table}")
+
+        connection.rollback()
+        os.replace(temporary, path)
+
+    finally:
+        connection.close()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+    logger.info(f"Created backup {path} with {sum(counts.values())} rows")
+    return counts
+
+
+def restore(
+        path: str,
+        replace: bool = False,
+        schema: DatabaseSchema = DATABASE_SCHEMA,
+        batch_size: int = BATCH_SIZE
+) -> typing.Dict[str, int]:
+    """
+    Load all tables of a compressed archive created by :func:`dump` into the database
+
+    The tables must already exist (e.g. created by
+    :meth:`mate_bot.state.dbhelper.BackendHelper.rebuild_database`).
+    The rows are inserted in batches in the order of the archive, which
+    puts referenced tables first. Foreign key checks are disabled while
+    loading, so that the order of rows within a table doesn't matter. All
+    rows are inserted in one transaction, so a failed restore changes nothing.
+
+    :param path: path of the gzip-compressed archive
+    :type path: str
+    :param replace: switch whether existing rows in the tables of the archive should be deleted
+    :type replace: bool
+    :param schema: database schema the archive must match
+    :type schema: DatabaseSchema
+    :param batch_size: number of rows inserted at once
+    :type batch_size: int
+    :return: number of restored rows per table
+    :rtype: typing.Dict[str, int]
+    :raises ValueError: when the archive is invalid or a table is not empty and ``replace`` is not set
+    """
+
+    counts = {}
+    connection = _connect()
+    try:
+        with connection.cursor() as cursor, gzip.open(path, "rt", encoding="UTF-8") as f:
+            cursor.execute("SET FOREIGN_KEY_CHECKS=0")
+            cursor.execute("SET UNIQUE_CHECKS=0")
+
+            for table, columns, rows in read_archive(f, schema, batch_size):
+                if table not in counts:
+                    counts[table] = 0
+                    if cursor.execute(f"SELECT 1 FROM {table} LIMIT 1"):
+                        if not replace:
+                            raise ValueError(f"The table {table} is not empty")
+                        cursor.execute(f"DELETE FROM {table}")
+
+                if rows:
+                    cursor.executemany(
+                        f"INSERT INTO {table} ({', '.join(columns)}) "
+                        f"VALUES ({', '.join(['%s'] * len(columns))})",
+                        rows
+                    )
+                    counts[table] += len(rows)
+
+            cursor.execute("SET UNIQUE_CHECKS=1")
+            cursor.execute("SET FOREIGN_KEY_CHECKS=1")
+        connection.commit()
+
+    except BaseException:
+        connection.rollback()
+        raise
+
+    finally:
+        connection.close()
+
+    logger.info(f"Restored backup {path} with {sum(counts.values())} rows")
+    return counts
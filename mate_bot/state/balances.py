@@ -0,0 +1,154 @@
+"""
+MateBot daily balance series of the users
+"""
+
+import typing
+import logging
+import datetime
+
+from mate_bot.state.dbhelper import BackendHelper, pymysql
+
+
+logger = logging.getLogger("state")
+
+
+def record_balances(connection: pymysql.connections.Connection, *uids: int) -> None:
+    """
+    Store the current balances of the given users as their balances of today
+
+    This function must be called after the balances have been updated but
+    before the database transaction is committed, so that the series always
+    contains the balance at the end of the day without any extra transaction.
+
+    :param connection: open database connection used to update the balances
+    :type connection: pymysql.connections.Connection
+    :param uids: internal IDs of the users whose balances changed
+    :type uids: int
+    :return: None
+    """
+
+    if len(uids) == 0:
+        return
+
+    BackendHelper._execute_no_commit(
+        "INSERT INTO balances_daily (users_id, day, balance) "
+        f"SELECT id, CURDATE(), balance FROM users WHERE id IN ({', '.join(['%s'] * len(uids))}) "
+        "ON DUPLICATE KEY UPDATE balance = VALUES(balance)",
+        uids,
+        connection=connection
+    )
+
+
+def fill_series(
+        start: datetime.date,
+        days: int,
+        rows: typing.List[typing.Dict[str, typing.Union[datetime.date, int]]]
+) -> typing.List[typing.Optional[int]]:
+    """
+    Convert the stored balances of a user into one value per day
+
+    The balance of a day without entry is the balance of the previous
+    stored day. Days before the first stored day are unknown (None).
+
+    :param start: first day of the series
+    :type start: datetime.date
+    :param days: number of days in the series
+    :type days: int
+    :param rows: stored balances with the keys ``day`` and ``balance`` ordered
+        by day, optionally starting with the latest entry before ``start``
+    :type rows: typing.List[typing.Dict[str, typing.Union[datetime.date, int]]]
+    :return: list of the balances at the end of each day
+    :rtype: typing.List[typing.Optional[int]]
+    """
+
+    series = []
+    current = None
+    index = 0
+    for offset in range(days):
+        day = start + datetime.timedelta(days=offset)
+        while index < len(rows) and rows[index]["day"] <= day:
+            current = rows[index]["balance"]
+            index += 1
+        series.append(current)
+    return series
+
+
+def get_series(uid: int, days: int) -> typing.Tuple[datetime.date, typing.List[typing.Optional[int]]]:
+    """
+    Get the daily balances of a user for the latest days including today
+
+    Only the stored entries of the requested days and the latest entry
+    before them are read, independent from the number of transactions.
+
+    :param uid: internal user ID
+    :type uid: int
+    :param days: number of days in the series
+    :type days: int
+    :return: tuple of the first day and the list of balances at the end of each day
+    :rtype: typing.Tuple[datetime.date, typing.List[typing.Optional[int]]]
+    :raises ValueError: when the number of days is not positive
+    """
+
+    if days <= 0:
+        raise ValueError("The number of days must be positive")
+
+    today = BackendHelper._execute("SELECT CURDATE() AS today")[1][0]["today"]
+    start = today - datetime.timedelta(days=days - 1)
+
+    rows = BackendHelper._execute(
+        "(SELECT day, balance FROM balances_daily WHERE users_id=%s AND day < %s ORDER BY day DESC LIMIT 1) "
+        "UNION ALL (SELECT day, balance FROM balances_daily WHERE users_id=%s AND day >= %s) "
+        "ORDER BY day",
+        (uid, start, uid, start)
+    )[1]
+
+    return start, fill_series(start, days, list(rows))
+
+
+def rebuild_balances() -> int:
+    """
+    Recompute the daily balances of all users from the transactions
+
+    The series is computed backwards from the current balances, so
+    that balances which have been set manually are respected. This
+    is only necessary for databases with transactions that have been
+    stored before the series existed or without updating it.
+
+    :return: number of stored daily balances
+    :rtype: int
+    """
+
+    _, users = BackendHelper._execute("SELECT id, balance FROM users")
+    balances = {u["id"]: u["balance"] for u in users}
+
+    _, changes = BackendHelper._execute(
+        "SELECT uid, day, SUM(delta) AS delta FROM ("
+        "SELECT sender AS uid, DATE(registered) AS day, -amount AS delta FROM transactions "
+        "UNION ALL SELECT receiver, DATE(registered), amount FROM transactions "
+        "UNION ALL SELECT sender, DATE(registered), -amount FROM transactions_archive "
+        "UNION ALL SELECT receiver, DATE(registered), amount FROM transactions_archive"
+        ") AS changes GROUP BY uid, day ORDER BY uid, day DESC"
+    )
+
+    rows = []
+    for change in changes:
+        uid = change["uid"]
+        rows.append((uid, change["day"], balances[uid]))
+        balances[uid] -= int(change["delta"])
+
+    connection = None
+    try:
+        connection = BackendHelper._execute_no_commit("DELETE FROM balances_daily")[2]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO balances_daily (users_id, day, balance) VALUES (%s, %s, %s)",
+                rows
+            )
+        connection.commit()
+
+    finally:
+        if connection:
+            connection.close()
+
+    logger.info(f"Stored {len(rows)} daily balances")
+    return len(rows)
@@ -0,0 +1,226 @@
+"""
+MateBot consumption records and their pre-aggregated daily and weekly rollups
+"""
+
+import re
+import typing
+import logging
+import datetime
+
+from mate_bot.state.dbhelper import BackendHelper, pymysql
+
+
+logger = logging.getLogger("state")
+
+PERIODS = {
+    "day": ("consumptions_daily", "day", "CURDATE() - INTERVAL %s DAY"),
+    "week": ("consumptions_weekly", "week", "CURDATE() - INTERVAL WEEKDAY(CURDATE()) DAY - INTERVAL %s WEEK")
+}
+
+REASON_PATTERN = re.compile(r"consume: (?:(\d+)x )?(\S+)")
+
+
+def parse_reason(reason: typing.Optional[str]) -> typing.Optional[typing.Tuple[str, int]]:
+    """
+    Get the consumable and the quantity from the reason of a consumption transaction
+
+    Both the current format (e.g. ``consume: 2x drink``) and the
+    format of migrated transactions (e.g. ``consume: drink``) are accepted.
+
+    :param reason: reason of a transaction
+    :type reason: typing.Optional[str]
+    :return: tuple of the consumable's name and the quantity or None if it's no consumption
+    :rtype: typing.Optional[typing.Tuple[str, int]]
+    """
+
+    if reason is None:
+        return None
+    match = REASON_PATTERN.fullmatch(reason)
+    if match is None:
+        return None
+    return match.group(2), int(match.group(1) or 1)
+
+
+def record_consumption(
+        connection: pymysql.connections.Connection,
+        consumable: str,
+        quantity: int,
+        amount: int,
+        transaction_id: typing.Optional[int] = None
+) -> None:
+    """
+    Store the consumption of a committed transaction and update the rollups
+
+    This function must be called before the database transaction that inserted
+    the money transaction is committed, so that the consumption record, the
+    rollups and the transaction itself are stored atomically.
+
+    :param connection: open database connection used to insert the transaction
+    :type connection: pymysql.connections.Connection
+    :param consumable: name of the consumable (e.g. ``drink``)
+    :type consumable: str
+    :param quantity: number of consumed goods
+    :type quantity: int
+    :param amount: total price of the consumed goods in Cent
+    :type amount: int
+    :param transaction_id: ID of the transaction (or None to use the last inserted ID of the connection)
+    :type transaction_id: typing.Optional[int]
+    :return: None
+    """
+
+    if transaction_id is None:
+        BackendHelper._execute_no_commit(
+            "INSERT INTO consumptions (transactions_id, consumable, quantity, amount) "
+            "VALUES (LAST_INSERT_ID(), %s, %s, %s)",
+            (consumable, quantity, amount),
+            connection=connection
+        )
+    else:
+        BackendHelper._execute_no_commit(
+            "INSERT INTO consumptions (transactions_id, consumable, quantity, amount) "
+            "VALUES (%s, %s, %s, %s)",
+            (transaction_id, consumable, quantity, amount),
+            connection=connection
+        )
+
+    BackendHelper._execute_no_commit(
+        "INSERT INTO consumptions_daily (day, consumable, quantity, amount) "
+        "VALUES (CURDATE(), %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity), amount = amount + VALUES(amount)",
+        (consumable, quantity, amount),
+        connection=connection
+    )
+    BackendHelper._execute_no_commit(
+        "INSERT INTO consumptions_weekly (week, consumable, quantity, amount) "
+        "VALUES (CURDATE() - INTERVAL WEEKDAY(CURDATE()) DAY, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity), amount = amount + VALUES(amount)",
+        (consumable, quantity, amount),
+        connection=connection
+    )
+
+
+def get_rollups(
+        period: str,
+        count: typing.Optional[int] = None
+) -> typing.List[typing.Dict[str, typing.Union[datetime.date, str, int]]]:
+    """
+    Get the consumptions per consumable of the latest days or weeks from the rollup tables
+
+    Only the small rollup tables are read, so this query
+    doesn't depend on the number of stored transactions.
+
+    :param period: either ``day`` or ``week``
+    :type period: str
+    :param count: number of latest periods including the current one (all periods if None)
+    :type count: typing.Optional[int]
+    :return: list of dicts with the keys ``period``, ``consumable``, ``quantity`` and ``amount``
+        ordered by period and consumable
+    :rtype: typing.List[typing.Dict[str, typing.Union[datetime.date, str, int]]]
+    :raises ValueError: when the period is unknown or the count is not positive
+    """
+
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}")
+    table, column, start = PERIODS[period]
+
+    if count is None:
+        return BackendHelper._execute(
+            f"SELECT {column} AS period, consumable, quantity, amount FROM {table} "
+            f"ORDER BY {column}, consumable"
+        )[1]
+
+    if count <= 0:
+        raise ValueError("The number of periods must be positive")
+    return BackendHelper._execute(
+        f"SELECT {column} AS period, consumable, quantity, amount FROM {table} "
+        f"WHERE {column} >= {start} ORDER BY {column}, consumable",
+        (count - 1,)
+    )[1]
+
+
+def rebuild_rollups() -> None:
+    """
+    Recompute both rollup tables from the consumption records
+
+    This is only necessary after consumptions have been added or removed
+    manually, e.g. by :func:`backfill_consumptions`. The rollups are
+    replaced within one database transaction.
+
+    :return: None
+    """
+
+    connection = None
+    try:
+        connection = BackendHelper._execute_no_commit("DELETE FROM consumptions_daily")[2]
+        BackendHelper._execute_no_commit("DELETE FROM consumptions_weekly", connection=connection)
+        BackendHelper._execute_no_commit(
+            "INSERT INTO consumptions_daily (day, consumable, quantity, amount) "
+            "SELECT DATE(registered), consumable, SUM(quantity), SUM(amount) "
+            "FROM consumptions GROUP BY DATE(registered), consumable",
+            connection=connection
+        )
+        BackendHelper._execute_no_commit(
+            "INSERT INTO consumptions_weekly (week, consumable, quantity, amount) "
+            "SELECT DATE(registered) - INTERVAL WEEKDAY(registered) DAY, consumable, SUM(quantity), SUM(amount) "
+            "FROM consumptions GROUP BY DATE(registered) - INTERVAL WEEKDAY(registered) DAY, consumable",
+            connection=connection
+        )
+        connection.commit()
+
+    finally:
+        if connection:
+            connection.close()
+
+
+def backfill_consumptions(batch_size: int = 1000) -> int:
+    """
+    Create the consumption records of older transactions by parsing their reasons
+
+    Both the current and the archived transactions are handled. Only
+    transactions without consumption record are handled, so it's safe to
+    call this function multiple times. Call :func:`rebuild_rollups` afterwards.
+
+    :param batch_size: number of transactions handled per database transaction
+    :type batch_size: int
+    :return: number of created consumption records
+    :rtype: int
+    """
+
+    created = 0
+    last = 0
+    while True:
+        _, values = BackendHelper._execute(
+            "SELECT history.id, history.amount, history.reason, history.registered FROM ("
+            "SELECT id, amount, reason, registered FROM transactions_archive WHERE id > %s "
+            "UNION ALL SELECT id, amount, reason, registered FROM transactions WHERE id > %s"
+            ") AS history LEFT JOIN consumptions ON consumptions.transactions_id = history.id "
+            "WHERE consumptions.id IS NULL AND history.reason LIKE 'consume: %%' "
+            "ORDER BY history.id LIMIT %s",
+            (last, last, batch_size)
+        )
+        if not values:
+            break
+        last = values[-1]["id"]
+
+        rows = []
+        for v in values:
+            parsed = parse_reason(v["reason"])
+            if parsed is not None:
+                rows.append((v["id"], parsed[0], parsed[1], v["amount"], v["registered"]))
+
+        if rows:
+            connection = pymysql.connect(**BackendHelper.db_config)
+            try:
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        "INSERT INTO consumptions (transactions_id, consumable, quantity, amount, registered) "
+                        "VALUES (%s, %s, %s, %s, %s)",
+                        rows
+                    )
+                connection.commit()
+            finally:
+                connection.close()
+            created += len(rows)
+
+    logger.info(f"Created {created} consumption records of older transactions")
+    return created
@@ -19,6 +19,9 @@ except ImportError:
     pymysql.install_as_MySQLdb()
     MySQLdb = None
 
+from mate_bot import metrics
+from mate_bot.tracing import tracer
+
 
 COLUMN_TYPES = typing.Union[int, bool, str, datetime.datetime, None]
 QUERY_RESULT_TYPE = typing.List[typing.Dict[str, COLUMN_TYPES]]
@@ -145,6 +148,40 @@ class ReferenceSchema:
         return string
 
 
+class UniqueSchema:
+    """
+    Unique constraint description spanning one or more columns of a table
+
+    Single columns may just use ``"UNIQUE"`` in their extras. This class
+    is needed when the combination of multiple columns must be unique.
+
+    This class functions as a simple container and formatter of the supplied
+    values during initialization. Therefore, only ``__repr__`` and ``__str__``
+    are defined. While the former is used only for stylistic purposes, the
+    later can be used to construct full SQL queries. Look for the method
+    :meth:`TableSchema._to_string` on how to use it, because this method calls
+    ``str()`` on all unique constraints (type :class:`UniqueSchema`) attached to the table.
+
+    :param columns: names of the columns whose combined values must be unique
+    :type columns: str
+    """
+
+    def __init__(self, *columns: str):
+        if len(columns) == 0:
+            raise ValueError("Expected at least one column name")
+        for column in columns:
+            if not isinstance(column, str):
+                raise TypeError(f"Expected str as column name, not {type(column)}")
+
+        self.columns: typing.Tuple[str, ...] = columns
+
+    def __repr__(self) -> str:
+        return f"UniqueSchema({', '.join(self.columns)})"
+
+    def __str__(self) -> str:
+        return f"UNIQUE KEY ({', '.join(self.columns)})"
+
+
 class TableSchema(_CollectionSchema):
     """
     Table schema description based on dictionaries to allow easy design validation
@@ -156,12 +193,14 @@ class TableSchema(_CollectionSchema):
     this class overwrites the following other methods:
 
     * ``__init__`` takes a name (``str``), a dictionary of pairs of ``str`` and
-      :class:`ColumnSchema` and a list of references (type :class:`ReferenceSchema`).
+      :class:`ColumnSchema`, a list of references (type :class:`ReferenceSchema`)
+      and a list of unique constraints (type :class:`UniqueSchema`).
 
     * ``__contains__`` uses improved checks to validate if a certain column
       name (type ``str`` and key of the underlying dictionary), a certain
-      :class:`ColumnSchema` object (values in the underlying dictionary) or
-      a certain :class:`ReferenceSchema` object is part of the table.
+      :class:`ColumnSchema` object (values in the underlying dictionary),
+      a certain :class:`ReferenceSchema` object or a certain
+      :class:`UniqueSchema` object is part of the table.
 
     * ``__setitem__`` checks if the supplied key is of type ``str``
       and the supplied value is a :class:`ColumnSchema` object. Other
@@ -175,13 +214,16 @@ class TableSchema(_CollectionSchema):
     :type columns: typing.Dict[str, ColumnSchema],
     :param refs: list of references to columns in other tables
     :type refs: typing.Optional[typing.List[ReferenceSchema]]
+    :param uniques: list of unique constraints spanning multiple columns
+    :type uniques: typing.Optional[typing.List[UniqueSchema]]
     """
 
     def __init__(
             self,
             name: str,
             columns: typing.Dict[str, ColumnSchema],
-            refs: typing.Optional[typing.List[ReferenceSchema]] = None
+            refs: typing.Optional[typing.List[ReferenceSchema]] = None,
+            uniques: typing.Optional[typing.List[UniqueSchema]] = None
     ):
         if not isinstance(name, str):
             raise TypeError(f"Expected str as name, not {type(name)}")
@@ -190,6 +232,9 @@ class TableSchema(_CollectionSchema):
         if refs is not None:
             if not isinstance(refs, list):
                 raise TypeError(f"Expected list for references, not {type(refs)}")
+        if uniques is not None:
+            if not isinstance(uniques, list):
+                raise TypeError(f"Expected list for unique constraints, not {type(uniques)}")
 
         super().__init__(columns)
         self.name: str = name
@@ -197,12 +242,18 @@ class TableSchema(_CollectionSchema):
             self.refs: typing.Optional[typing.List[ReferenceSchema]] = []
         else:
             self.refs: typing.Optional[typing.List[ReferenceSchema]] = refs.copy()
+        if uniques is None:
+            self.uniques: typing.List[UniqueSchema] = []
+        else:
+            self.uniques: typing.List[UniqueSchema] = uniques.copy()
 
-    def __contains__(self, item: typing.Union[str, ColumnSchema, ReferenceSchema]) -> bool:
+    def __contains__(self, item: typing.Union[str, ColumnSchema, ReferenceSchema, UniqueSchema]) -> bool:
         if isinstance(item, ColumnSchema):
             return super().__contains__(item)
         if isinstance(item, ReferenceSchema):
             return item in self.refs
+        if isinstance(item, UniqueSchema):
+            return item in self.uniques
         if isinstance(item, str):
             return item in self.keys()
         return False
@@ -230,7 +281,7 @@ class TableSchema(_CollectionSchema):
         if indent == 0:
             sep, conjunction = "", ", "
         entries = conjunction.join(
-            [f"{' ' * abs(indent)}{str(k)}" for k in list(self.values()) + list(self.refs)]
+            [f"{' ' * abs(indent)}{str(k)}" for k in list(self.values()) + list(self.uniques) + list(self.refs)]
         )
         return f"CREATE TABLE {self.name} ({sep}{entries}{sep});"
 
@@ -259,6 +310,36 @@ class DatabaseSchema(_CollectionSchema):
             raise TypeError
         super().__setitem__(key, value)
 
+    def dependency_order(self) -> typing.List[str]:
+        """
+        Get the names of all tables so that referenced tables come before the tables referencing them
+
+        Tables without dependencies between each other keep the order of the schema.
+
+        :return: list of table names
+        :rtype: typing.List[str]
+        :raises ValueError: when the references contain a cycle
+        """
+
+        order = []
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Cyclic reference involving table {name}")
+            visiting.add(name)
+            for ref in self[name].refs:
+                if ref.ref_table != name and ref.ref_table in self:
+                    visit(ref.ref_table)
+            visiting.remove(name)
+            order.append(name)
+
+        for table in self:
+            visit(table)
+        return order
+
 
 DATABASE_SCHEMA = DatabaseSchema({
     "users": TableSchema(
@@ -336,6 +417,10 @@ DATABASE_SCHEMA = DatabaseSchema({
             "created": ColumnSchema(
                 "created", "TIMESTAMP", False,
                 "DEFAULT CURRENT_TIMESTAMP"
+            ),
+            "changed": ColumnSchema(
+                "changed", "TIMESTAMP", False,
+                "DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
             )
         },
         [
@@ -371,6 +456,9 @@ DATABASE_SCHEMA = DatabaseSchema({
         },
         [
             ReferenceSchema("collectives_id", "collectives", "id", True)
+        ],
+        [
+            UniqueSchema("collectives_id", "chat_id")
         ]
     ),
     "externals": TableSchema(
@@ -394,6 +482,117 @@ DATABASE_SCHEMA = DatabaseSchema({
             ReferenceSchema("internal", "users", "id", True),
             ReferenceSchema("external", "users", "id", True)
         ]
+    ),
+    "consumptions": TableSchema(
+        "consumptions",
+        {
+            "id": ColumnSchema(
+                "id", "INT", False,
+                "PRIMARY KEY AUTO_INCREMENT"
+            ),
+            "transactions_id": ColumnSchema(
+                "transactions_id", "INT", False,
+                "UNIQUE"
+            ),
+            "consumable": ColumnSchema("consumable", "VARCHAR(255)", False),
+            "quantity": ColumnSchema("quantity", "SMALLINT", False),
+            "amount": ColumnSchema("amount", "MEDIUMINT", False),
+            "registered": ColumnSchema(
+                "registered", "TIMESTAMP", False,
+                "DEFAULT CURRENT_TIMESTAMP"
+            )
+        }
+    ),
+    "consumptions_daily": TableSchema(
+        "consumptions_daily",
+        {
+            "id": ColumnSchema(
+                "id", "INT", False,
+                "PRIMARY KEY AUTO_INCREMENT"
+            ),
+            "day": ColumnSchema("day", "DATE", False),
+            "consumable": ColumnSchema("consumable", "VARCHAR(255)", False),
+            "quantity": ColumnSchema("quantity", "INT", False),
+            "amount": ColumnSchema("amount", "INT", False)
+        },
+        [],
+        [
+            UniqueSchema("day", "consumable")
+        ]
+    ),
+    "consumptions_weekly": TableSchema(
+        "consumptions_weekly",
+        {
+            "id": ColumnSchema(
+                "id", "INT", False,
+                "PRIMARY KEY AUTO_INCREMENT"
+            ),
+            "week": ColumnSchema("week", "DATE", False),
+            "consumable": ColumnSchema("consumable", "VARCHAR(255)", False),
+            "quantity": ColumnSchema("quantity", "INT", False),
+            "amount": ColumnSchema("amount", "INT", False)
+        },
+        [],
+        [
+            UniqueSchema("week", "consumable")
+        ]
+    ),
+    "balances_daily": TableSchema(
+        "balances_daily",
+        {
+            "id": ColumnSchema(
+                "id", "INT", False,
+                "PRIMARY KEY AUTO_INCREMENT"
+            ),
+            "users_id": ColumnSchema("users_id", "INT", False),
+            "day": ColumnSchema("day", "DATE", False),
+            "balance": ColumnSchema("balance", "MEDIUMINT", False)
+        },
+        [
+            ReferenceSchema("users_id", "users", "id", True)
+        ],
+        [
+            UniqueSchema("users_id", "day")
+        ]
+    ),
+    "transactions_archive": TableSchema(
+        "transactions_archive",
+        {
+            "id": ColumnSchema(
+                "id", "INT", False,
+                "PRIMARY KEY"
+            ),
+            "sender": ColumnSchema("sender", "INT", False),
+            "receiver": ColumnSchema("receiver", "INT", False),
+            "amount": ColumnSchema("amount", "MEDIUMINT", False),
+            "reason": ColumnSchema("reason", "VARCHAR(255)", True),
+            "registered": ColumnSchema(
+                "registered", "TIMESTAMP", False,
+                "DEFAULT CURRENT_TIMESTAMP"
+            )
+        },
+        [
+            ReferenceSchema("sender", "users", "id", True),
+            ReferenceSchema("receiver", "users", "id", True)
+        ]
+    ),
+    "balance_checkpoints": TableSchema(
+        "balance_checkpoints",
+        {
+            "id": ColumnSchema(
+                "id", "INT", False,
+                "PRIMARY KEY AUTO_INCREMENT"
+            ),
+            "users_id": ColumnSchema(
+                "users_id", "INT", False,
+                "UNIQUE"
+            ),
+            "balance": ColumnSchema("balance", "INT", False),
+            "transactions_id": ColumnSchema("transactions_id", "INT", False)
+        },
+        [
+            ReferenceSchema("users_id", "users", "id", True)
+        ]
     )
 })
 
@@ -504,14 +703,18 @@ class BackendHelper:
                 **BackendHelper.db_config,
                 cursorclass=pymysql.cursors.DictCursor
             )
+            metrics.database_connections.inc()
 
         elif not isinstance(connection, pymysql.connections.Connection):
             raise TypeError("Invalid connection type")
 
         if connection.open:
-            with connection.cursor() as cursor:
-                rows = cursor.execute(query, arguments)
-                result = list(cursor.fetchall())
+            statement = metrics.statement_type(query)
+            metrics.database_queries.inc(statement)
+            with metrics.database_duration.time(statement), tracer.span("query", statement=statement):
+                with connection.cursor() as cursor:
+                    rows = cursor.execute(query, arguments)
+                    result = list(cursor.fetchall())
         else:
             raise pymysql.err.OperationalError("No open connection")
         return rows, result, connection
@@ -541,6 +744,65 @@ class BackendHelper:
                 connection.close()
         return rows, result
 
+    @staticmethod
+    def check_connection() -> bool:
+        """
+        Verify that the database is reachable using the cheapest possible query
+
+        This method doesn't touch any table, so its costs don't depend
+        on the amount of stored data. It's intended to be used as health
+        or connectivity check (e.g. during the startup of the bot).
+
+        :return: whether the database answered the probe query correctly
+        :rtype: bool
+        :raises pymysql.err.OperationalError: when the database connection could not be established
+        """
+
+        rows, result = BackendHelper._execute("SELECT 1 AS probe")
+        return rows == 1 and result[0]["probe"] == 1
+
+    @staticmethod
+    def add_unique_keys(table: TableSchema) -> typing.List[typing.Tuple[UniqueSchema, int]]:
+        """
+        Add the unique constraints of the table schema that are missing in the existing table
+
+        Existing tables of older databases may contain rows that violate a
+        new unique constraint. Those duplicates are deleted before the
+        constraint is added, keeping only the row with the highest ID
+        (which is the newest row) of every combination of values.
+
+        :param table: schema of a table that already exists in the database
+        :type table: TableSchema
+        :return: list of tuples of the added constraint and the number of deleted duplicates
+        :rtype: typing.List[typing.Tuple[UniqueSchema, int]]
+        """
+
+        _, values = BackendHelper._execute(
+            "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0 "
+            "ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+            (table.name,)
+        )
+        indexes = {}
+        for v in values:
+            indexes.setdefault(v["INDEX_NAME"], []).append(v["COLUMN_NAME"])
+        existing = {tuple(columns) for columns in indexes.values()}
+
+        added = []
+        for unique in table.uniques:
+            if unique.columns in existing:
+                continue
+
+            condition = " AND ".join(f"older.{c} = newer.{c}" for c in unique.columns)
+            deleted, _ = BackendHelper._execute(
+                f"DELETE older FROM {table.name} AS older INNER JOIN {table.name} AS newer "
+                f"ON {condition} AND older.id < newer.id"
+            )
+            BackendHelper._execute(f"ALTER TABLE {table.name} ADD {unique}")
+            added.append((unique, deleted))
+
+        return added
+
     @staticmethod
     def _check_identifier(identifier: int) -> bool:
         """
@@ -1125,6 +1387,9 @@ class BackendHelper:
         """
         Extract all data stored in the current database, sorted by table
 
+        Note that all rows are loaded into memory. Use the module
+        :mod:`mate_bot.state.backup` to create snapshots of large databases.
+
         :param ignore_schema: switch whether the schema of the database should be ignored
         :type ignore_schema: bool
         :return: all data stored in the database
@@ -1149,5 +1414,5 @@ class BackendHelper:
                             "conflict with the database schema definition?"
                         )
             else:
-                result[t] = BackendHelper._execute(f"SELECT * FROM {t}")
+                result[t] = BackendHelper._execute(f"SELECT * FROM {t}")[1]
         return result
@@ -0,0 +1,316 @@
+"""
+MateBot columnar ledger of all transactions for vectorized analytics
+
+The optional package ``numpy`` is required to compute any statistics.
+Without it, :attr:`Ledger.available` is ``False`` and the reporting
+commands fall back to their plain output. The ledger can also be
+used for ad hoc queries from an interactive Python shell:
+
+    >>> from mate_bot.state.ledger import ledger
+    >>> ledger.refresh()
+    >>> ledger.income_by_consumable()
+
+The transactions, including the archived ones, are loaded once using
+a streaming cursor and only newer transactions are appended afterwards,
+since transactions are never changed after they have been committed.
+Call :meth:`Ledger.reset` after the database has been restored from a
+backup.
+"""
+
+import math
+import array
+import typing
+import logging
+import datetime
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from mate_bot.state.dbhelper import BackendHelper, pymysql
+
+
+logger = logging.getLogger("state")
+
+BATCH_SIZE = 10000
+SETTLE_SECONDS = 10
+
+_TIME_TYPE = typing.Optional[datetime.datetime]
+
+
+class Ledger:
+    """
+    Columnar copy of the transactions table
+
+    Every column is stored in a compact array: sender, receiver, amount,
+    timestamp (seconds since the epoch) and the index of the consumable
+    (or ``-1`` for transactions without consumption record). The arrays
+    are converted into ``numpy`` arrays when they are used, so that all
+    statistics are computed in a few vectorized passes.
+
+    Transactions registered during the last :data:`SETTLE_SECONDS` are
+    not loaded yet, so that a transaction with a lower ID which has not been
+    committed at the time of loading can't be skipped permanently.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def available(self) -> bool:
+        """
+        Get the flag whether the package ``numpy`` is available to compute statistics
+        """
+
+        return numpy is not None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def reset(self) -> None:
+        """
+        Drop all loaded transactions, so that the next refresh loads the complete table
+
+        :return: None
+        """
+
+        self._last_id = 0
+        self._ids = array.array("q")
+        self._senders = array.array("i")
+        self._receivers = array.array("i")
+        self._amounts = array.array("q")
+        self._timestamps = array.array("q")
+        self._consumables = array.array("i")
+        self._names = []
+        self._codes = {}
+        self._columns = None
+
+    def refresh(self, batch_size: int = BATCH_SIZE) -> int:
+        """
+        Load the transactions that have been added since the last refresh
+
+        :param batch_size: number of rows fetched from the streaming cursor at once
+        :type batch_size: int
+        :return: number of newly loaded transactions
+        :rtype: int
+        """
+
+        with self._lock:
+            loaded = 0
+            connection = pymysql.connect(**BackendHelper.db_config)
+            try:
+                cursor = connection.cursor(pymysql.cursors.SSCursor)
+                try:
+                    cursor.execute(
+                        "SELECT history.id, sender, receiver, history.amount, "
+                        "UNIX_TIMESTAMP(history.registered), consumptions.consumable FROM ("
+                        "SELECT id, sender, receiver, amount, registered FROM transactions_archive WHERE id > %s "
+                        "UNION ALL SELECT id, sender, receiver, amount, registered FROM transactions WHERE id > %s"
+                        ") AS history LEFT JOIN consumptions ON consumptions.transactions_id = history.id "
+                        "WHERE history.registered < NOW() - INTERVAL %s SECOND ORDER BY history.id",
+                        (self._last_id, self._last_id, SETTLE_SECONDS)
+                    )
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        self._append(rows)
+                        loaded += len(rows)
+                finally:
+                    cursor.close()
+            finally:
+                connection.close()
+
+            if loaded > 0:
+                self._last_id = self._ids[-1]
+                self._columns = None
+                logger.debug(f"Loaded {loaded} transactions into the ledger")
+            return loaded
+
+    def _append(self, rows: typing.Sequence[typing.Tuple]) -> None:
+        """
+        Append the rows of the transactions query to the columns
+
+        :param rows: tuples of ID, sender, receiver, amount, timestamp and consumable
+        :type rows: typing.Sequence[typing.Tuple]
+        :return: None
+        """
+
+        for transaction_id, sender, receiver, amount, timestamp, consumable in rows:
+            self._ids.append(transaction_id)
+            self._senders.append(sender)
+            self._receivers.append(receiver)
+            self._amounts.append(amount)
+            self._timestamps.append(int(timestamp))
+            if consumable is None:
+                self._consumables.append(-1)
+            else:
+                if consumable not in self._codes:
+                    self._codes[consumable] = len(self._names)
+                    self._names.append(consumable)
+                self._consumables.append(self._codes[consumable])
+
+    def _get_columns(self, since: _TIME_TYPE, until: _TIME_TYPE) -> typing.Dict[str, "numpy.ndarray"]:
+        """
+        Get the columns of all transactions in the given time window as ``numpy`` arrays
+
+        :param since: optional start of the time window (inclusive)
+        :type since: typing.Optional[datetime.datetime]
+        :param until: optional end of the time window (exclusive)
+        :type until: typing.Optional[datetime.datetime]
+        :return: dictionary of the column arrays
+        :rtype: typing.Dict[str, numpy.ndarray]
+        :raises RuntimeError: when the package ``numpy`` is not installed
+        """
+
+        if numpy is None:
+            raise RuntimeError("The ledger analytics require the package 'numpy'")
+
+        with self._lock:
+            if self._columns is None:
+                self._columns = {
+                    "senders": numpy.array(self._senders, dtype=numpy.int32),
+                    "receivers": numpy.array(self._receivers, dtype=numpy.int32),
+                    "amounts": numpy.array(self._amounts, dtype=numpy.int64),
+                    "timestamps": numpy.array(self._timestamps, dtype=numpy.int64),
+                    "consumables": numpy.array(self._consumables, dtype=numpy.int32)
+                }
+            columns = self._columns
+
+        if since is None and until is None:
+            return columns
+
+        mask = numpy.ones(len(columns["timestamps"]), dtype=bool)
+        if since is not None:
+            mask &= columns["timestamps"] >= since.timestamp()
+        if until is not None:
+            mask &= columns["timestamps"] < until.timestamp()
+        return {k: v[mask] for k, v in columns.items()}
+
+    def net_flows(self, since: _TIME_TYPE = None, until: _TIME_TYPE = None) -> typing.Dict[int, int]:
+        """
+        Get the received minus the sent money of all users in the given time window
+
+        :param since: optional start of the time window (inclusive)
+        :type since: typing.Optional[datetime.datetime]
+        :param until: optional end of the time window (exclusive)
+        :type until: typing.Optional[datetime.datetime]
+        :return: dictionary of the net flows of all users with transactions by their internal IDs
+        :rtype: typing.Dict[int, int]
+        :raises RuntimeError: when the package ``numpy`` is not installed
+        """
+
+        columns = self._get_columns(since, until)
+        if len(columns["amounts"]) == 0:
+            return {}
+
+        size = int(max(columns["senders"].max(), columns["receivers"].max())) + 1
+        incoming = numpy.bincount(columns["receivers"], weights=columns["amounts"], minlength=size)
+        outgoing = numpy.bincount(columns["senders"], weights=columns["amounts"], minlength=size)
+        active = numpy.bincount(columns["receivers"], minlength=size) + numpy.bincount(columns["senders"], minlength=size)
+
+        uids = numpy.flatnonzero(active)
+        flows = (incoming - outgoing)[uids]
+        return dict(zip(uids.tolist(), flows.astype(numpy.int64).tolist()))
+
+    def income_by_consumable(
+            self,
+            since: _TIME_TYPE = None,
+            until: _TIME_TYPE = None
+    ) -> typing.Dict[str, typing.Tuple[int, int]]:
+        """
+        Get the number of consumptions and the earned money per consumable in the given time window
+
+        :param since: optional start of the time window (inclusive)
+        :type since: typing.Optional[datetime.datetime]
+        :param until: optional end of the time window (exclusive)
+        :type until: typing.Optional[datetime.datetime]
+        :return: dictionary of tuples of the number of transactions and the sum of
+            their amounts by the names of the consumables, ordered by the amount
+        :rtype: typing.Dict[str, typing.Tuple[int, int]]
+        :raises RuntimeError: when the package ``numpy`` is not installed
+        """
+
+        columns = self._get_columns(since, until)
+        mask = columns["consumables"] >= 0
+        codes = columns["consumables"][mask]
+        counts = numpy.bincount(codes, minlength=len(self._names))
+        amounts = numpy.bincount(codes, weights=columns["amounts"][mask], minlength=len(self._names))
+
+        result = [
+            (self._names[code], (int(counts[code]), int(amounts[code])))
+            for code in numpy.argsort(-amounts, kind="stable").tolist()
+            if counts[code] > 0
+        ]
+        return dict(result)
+
+    def top_debtors(
+            self,
+            since: _TIME_TYPE = None,
+            until: _TIME_TYPE = None,
+            count: int = 5,
+            exclude: typing.Iterable[int] = ()
+    ) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Get the users who spent the most money more than they received in the given time window
+
+        :param since: optional start of the time window (inclusive)
+        :type since: typing.Optional[datetime.datetime]
+        :param until: optional end of the time window (exclusive)
+        :type until: typing.Optional[datetime.datetime]
+        :param count: maximum number of users
+        :type count: int
+        :param exclude: internal IDs of users that should be ignored (e.g. the community user)
+        :type exclude: typing.Iterable[int]
+        :return: list of tuples of internal user ID and the (negative) net flow, lowest first
+        :rtype: typing.List[typing.Tuple[int, int]]
+        :raises RuntimeError: when the package ``numpy`` is not installed
+        """
+
+        flows = self.net_flows(since, until)
+        for uid in exclude:
+            flows.pop(uid, None)
+        debtors = sorted((flow, uid) for uid, flow in flows.items() if flow < 0)
+        return [(uid, flow) for flow, uid in debtors[:count]]
+
+    def turnover(
+            self,
+            width: datetime.timedelta,
+            since: datetime.datetime,
+            until: _TIME_TYPE = None
+    ) -> typing.List[typing.Tuple[datetime.datetime, int, int]]:
+        """
+        Get a histogram of the number and the amounts of the transactions in the given time window
+
+        :param width: width of every bin of the histogram
+        :type width: datetime.timedelta
+        :param since: start of the time window and the first bin (inclusive)
+        :type since: datetime.datetime
+        :param until: optional end of the time window (exclusive, defaults to now)
+        :type until: typing.Optional[datetime.datetime]
+        :return: list of tuples of the start of the bin, the number of
+            transactions and the sum of their amounts for every bin
+        :rtype: typing.List[typing.Tuple[datetime.datetime, int, int]]
+        :raises RuntimeError: when the package ``numpy`` is not installed
+        :raises ValueError: when the width is not positive
+        """
+
+        if width.total_seconds() <= 0:
+            raise ValueError("The width of the bins must be positive")
+        if until is None:
+            until = datetime.datetime.now(since.tzinfo)
+
+        columns = self._get_columns(since, until)
+        size = max(math.ceil((until - since) / width), 1)
+        bins = (columns["timestamps"] - since.timestamp()) // width.total_seconds()
+        bins = bins.astype(numpy.int64)
+        counts = numpy.bincount(bins, minlength=size)
+        amounts = numpy.bincount(bins, weights=columns["amounts"], minlength=size)
+
+        return [(since + i * width, int(counts[i]), int(amounts[i])) for i in range(size)]
+
+
+ledger = Ledger()
@@ -5,17 +5,24 @@ MateBot money transaction (sending/receiving) helper library
 import os
 import csv
 import time
+import array
 import typing
 import logging
+import datetime
 import tempfile
+import threading
 
-import pytz as _tz
 import tzlocal as _local_tz
 import telegram
+import telegram.ext
 
 from mate_bot.config import config
+from mate_bot.outbound import outbound_queue, PRIORITY_LOG
 from mate_bot.state import user
-from mate_bot.state.dbhelper import BackendHelper
+from mate_bot.state.archive import get_checkpoint
+from mate_bot.state.balances import record_balances
+from mate_bot.state.consumptions import record_consumption
+from mate_bot.state.dbhelper import BackendHelper, pymysql
 
 
 logger = logging.getLogger("state")
@@ -152,6 +159,22 @@ class Transaction(BackendHelper):
 
         pass
 
+    def store(self, connection: pymysql.connections.Connection) -> None:
+        """
+        Store additional data about the transaction before it's committed
+
+        This method is not implemented in this class and provides a
+        hook that might be implemented in a subclass. It will be
+        called with the open connection after the transaction has been
+        inserted, so that all data is committed in the same database transaction.
+
+        :param connection: open database connection that inserted the transaction
+        :type connection: pymysql.connections.Connection
+        :return: None
+        """
+
+        pass
+
     def commit(self) -> None:
         """
         Fulfill the transaction and store it in the database persistently
@@ -200,6 +223,8 @@ class Transaction(BackendHelper):
                     (self._dst.balance + self.amount, self._dst.uid),
                     connection=connection
                 )
+                record_balances(connection, self._src.uid, self._dst.uid)
+                self.store(connection)
 
                 connection.commit()
 
@@ -214,6 +239,150 @@ class Transaction(BackendHelper):
             self.log_message()
 
 
+class TransactionDigest:
+    """
+    Buffer for transaction log messages that are sent as aggregated digests
+
+    Chats configured for digests don't receive one message per transaction.
+    Instead, the short summaries of all transactions are collected and sent
+    as one message when the configured interval has passed since the first
+    buffered entry or when the configured number of entries has been reached.
+    Use :meth:`flush_due` as repeating job and :meth:`flush` on shutdown to
+    make sure that no buffered entry gets lost.
+    """
+
+    MAX_MESSAGE_LENGTH = 4096
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bot: typing.Optional[telegram.Bot] = None
+        self._entries: typing.Dict[int, typing.List[str]] = {}
+        self._started: typing.Dict[int, float] = {}
+        self._intervals: typing.Dict[int, float] = {}
+
+    def add(self, bot: telegram.Bot, chat: int, entry: str, interval: float, size: int) -> None:
+        """
+        Add an entry to the digest of the chat and send the digest when it's full
+
+        :param bot: Telegram Bot object used to send the digest later
+        :type bot: telegram.Bot
+        :param chat: Telegram Chat ID that receives the digest
+        :type chat: int
+        :param entry: short Markdown-formatted summary of a single transaction
+        :type entry: str
+        :param interval: maximal time in seconds an entry is buffered
+        :type interval: float
+        :param size: maximal number of buffered entries for the chat
+        :type size: int
+        :return: None
+        """
+
+        with self._lock:
+            self._bot = bot
+            self._intervals[chat] = interval
+            self._started.setdefault(chat, time.monotonic())
+            self._entries.setdefault(chat, []).append(entry)
+            full = len(self._entries[chat]) >= size
+
+        if full:
+            self.flush(chat)
+
+    def flush(self, chat: typing.Optional[int] = None) -> None:
+        """
+        Send the buffered digest of the given chat (or of all chats) immediately
+
+        :param chat: Telegram Chat ID whose digest should be sent (all chats if None)
+        :type chat: typing.Optional[int]
+        :return: None
+        """
+
+        with self._lock:
+            if chat is None:
+                chats = list(self._entries.keys())
+            else:
+                chats = [chat]
+            pending = {c: self._entries.pop(c) for c in chats if c in self._entries}
+            for c in pending:
+                self._started.pop(c, None)
+            bot = self._bot
+
+        for c, entries in pending.items():
+            for text in self._split(entries):
+                outbound_queue.submit(
+                    c,
+                    bot.send_message,
+                    c,
+                    text,
+                    parse_mode="Markdown",
+                    disable_notification=True,
+                    priority=PRIORITY_LOG
+                )
+
+    def flush_due(self, context: typing.Optional[telegram.ext.CallbackContext] = None) -> None:
+        """
+        Send the digests of all chats whose interval has passed
+
+        This method may be used as callback of a repeating job.
+
+        :param context: unused callback context of the job queue
+        :type context: typing.Optional[telegram.ext.CallbackContext]
+        :return: None
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            due = [c for c, started in self._started.items() if now - started >= self._intervals[c]]
+        for chat in due:
+            self.flush(chat)
+
+    def schedule(self, job_queue: telegram.ext.JobQueue) -> typing.Optional[telegram.ext.Job]:
+        """
+        Register the repeating check for due digests in the job queue
+
+        The job runs as often as the shortest configured digest interval.
+        No job will be scheduled when no chat is configured for digests.
+
+        :param job_queue: job queue of the running Updater
+        :type job_queue: telegram.ext.JobQueue
+        :return: the newly scheduled job or None
+        :rtype: typing.Optional[telegram.ext.Job]
+        """
+
+        chats = config["chats"]["transactions"]
+        if isinstance(chats, (int, dict)):
+            chats = [chats]
+        intervals = [c["interval"] for c in chats if isinstance(c, dict)]
+        if not intervals:
+            return None
+
+        return job_queue.run_repeating(self.flush_due, min(intervals), first=min(intervals))
+
+    @classmethod
+    def _split(cls, entries: typing.List[str]) -> typing.List[str]:
+        """
+        Combine the entries to as few messages as possible within Telegram's length limit
+
+        :param entries: list of buffered entries
+        :type entries: typing.List[str]
+        :return: list of message texts
+        :rtype: typing.List[str]
+        """
+
+        messages = []
+        current = f"*Transaction digest* ({len(entries)} transaction{'s' if len(entries) != 1 else ''})\n"
+        for entry in entries:
+            if len(current) + len(entry) + 1 > cls.MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = entry
+            else:
+                current += f"\n{entry}"
+        messages.append(current)
+        return messages
+
+
+transaction_digest = TransactionDigest()
+
+
 class LoggedTransaction(Transaction):
     """
     Money transactions between two users with enabled logging hooks
@@ -267,6 +436,8 @@ class LoggedTransaction(Transaction):
 
         A Markdown-formatted message will be send to all chat IDs
         configured to receive transaction log messages in the config file.
+        Chats configured for digests receive a short summary as part of
+        the next digest message instead (see :class:`TransactionDigest`).
 
         :return: None
         """
@@ -274,22 +445,209 @@ class LoggedTransaction(Transaction):
         logger.debug(f"Transaction from {self.src} to {self.dst} fulfilled.")
 
         if self._bot is not None:
-            if not isinstance(self._bot, telegram.Bot):
-                raise TypeError(f"Expected telegram.Bot, but got {type(self._bot)}")
-            transaction_logging = config["chats"]["transactions"]
-            if isinstance(config["chats"]["transactions"], int):
-                transaction_logging = [config["chats"]["transactions"]]
-            for chat in transaction_logging:
-                self._bot.send_message(
-                    chat,
-                    "*Incoming transaction*\n\n"
-                    f"Sender: {self.src}\n"
-                    f"Receiver: {self.dst}\n"
-                    f"Amount: {self.amount / 100:.2f}€\n"
-                    f"Reason: `{self.reason}`",
-                    parse_mode="Markdown",
-                    disable_notification=True
-                )
+            send_transaction_log(self._bot, str(self.src), str(self.dst), self.amount, self.reason)
+
+
+class ConsumeTransaction(LoggedTransaction):
+    """
+    Logged transaction for consumed goods that also stores a structured consumption record
+
+    :param src: user who consumes something
+    :type src: user.BaseBotUser
+    :param dst: receiver of the money (usually the community user)
+    :type dst: user.BaseBotUser
+    :param amount: money measured in Cent (must always be positive!)
+    :type amount: int
+    :param consumable: name of the consumable (e.g. ``drink``)
+    :type consumable: str
+    :param quantity: number of consumed goods
+    :type quantity: int
+    :param bot: optional Telegram Bot object that will be used to send log messages
+    :type bot: typing.Optional[telegram.Bot]
+    :raises ValueError: when amount is not positive or sender=receiver
+    :raises TypeError: when src or dst are no BaseBotUser objects or subclassed thereof
+    """
+
+    def __init__(
+            self,
+            src: user.BaseBotUser,
+            dst: user.BaseBotUser,
+            amount: int,
+            consumable: str,
+            quantity: int,
+            bot: typing.Optional[telegram.Bot] = None
+    ):
+        super().__init__(src, dst, amount, f"consume: {quantity}x {consumable}", bot)
+        self.consumable = consumable
+        self.quantity = quantity
+
+    def store(self, connection: pymysql.connections.Connection) -> None:
+        """
+        Store the consumption record and update the rollups
+
+        :param connection: open database connection that inserted the transaction
+        :type connection: pymysql.connections.Connection
+        :return: None
+        """
+
+        record_consumption(connection, self.consumable, self.quantity, self.amount, self._id)
+
+
+def send_transaction_log(
+        bot: telegram.Bot,
+        src: str,
+        dst: str,
+        amount: int,
+        reason: typing.Optional[str]
+) -> None:
+    """
+    Send the log message about a fulfilled transaction to all configured chats
+
+    A Markdown-formatted message will be send to all chat IDs
+    configured to receive transaction log messages in the config file.
+    Chats configured for digests receive a short summary as part of
+    the next digest message instead (see :class:`TransactionDigest`).
+
+    :param bot: Telegram Bot object that will be used to send log messages
+    :type bot: telegram.Bot
+    :param src: display name of the sender
+    :type src: str
+    :param dst: display name of the receiver
+    :type dst: str
+    :param amount: money measured in Cent
+    :type amount: int
+    :param reason: optional description of / reason for the transaction
+    :type reason: typing.Optional[str]
+    :return: None
+    :raises TypeError: when the bot is no ``telegram.Bot`` object
+    """
+
+    if not isinstance(bot, telegram.Bot):
+        raise TypeError(f"Expected telegram.Bot, but got {type(bot)}")
+
+    transaction_logging = config["chats"]["transactions"]
+    if isinstance(transaction_logging, (int, dict)):
+        transaction_logging = [transaction_logging]
+    for chat in transaction_logging:
+        if isinstance(chat, dict):
+            transaction_digest.add(
+                bot,
+                chat["chat"],
+                f"{src} → {dst}: {amount / 100:.2f}€ `{reason}`",
+                chat["interval"],
+                chat["size"]
+            )
+            continue
+
+        outbound_queue.submit(
+            chat,
+            bot.send_message,
+            chat,
+            "*Incoming transaction*\n\n"
+            f"Sender: {src}\n"
+            f"Receiver: {dst}\n"
+            f"Amount: {amount / 100:.2f}€\n"
+            f"Reason: `{reason}`",
+            parse_mode="Markdown",
+            disable_notification=True,
+            priority=PRIORITY_LOG
+        )
+
+
+def fast_consume(
+        sender: telegram.User,
+        amount: int,
+        reason: str,
+        bot: typing.Optional[telegram.Bot] = None,
+        consumption: typing.Optional[typing.Tuple[str, int]] = None
+) -> typing.Optional[int]:
+    """
+    Transfer money from a user to the community using a single database transaction
+
+    This is a shortcut for the most frequent kind of transaction. It
+    replaces the construction of a :class:`mate_bot.state.user.MateBotUser`
+    and a :class:`mate_bot.state.user.CommunityUser`, the permission check
+    and the commit of a :class:`LoggedTransaction` within the executor's
+    ``run`` method, which together need about a dozen queries using separate
+    database connections. Note that it doesn't avoid the lookup and the
+    membership verification of the sender done by
+    :meth:`mate_bot.commands.base.BaseCommand.__call__` before. Instead,
+    the sender and the community user are read and locked by one query
+    that also includes the sender's creditor. The transaction is inserted
+    and both balances are updated relatively by two more statements using
+    the same connection before the database transaction is committed.
+    The daily balances of both users are stored using this connection, too.
+
+    The shortcut is only taken for the plain case. None is returned without
+    touching any balance when the sender is unknown, the sender's name or
+    username changed, the sender is an external user without creditor or
+    the community user is not unique. The caller should use the regular
+    way in this case, since it registers users, updates their names and
+    replies with the appropriate error messages.
+
+    :param sender: Telegram user who consumes something
+    :type sender: telegram.User
+    :param amount: money measured in Cent (must always be positive!)
+    :type amount: int
+    :param reason: description of / reason for the transaction
+    :type reason: str
+    :param bot: optional Telegram Bot object that will be used to send log messages
+    :type bot: typing.Optional[telegram.Bot]
+    :param consumption: optional tuple of the consumable's name and the quantity to be recorded
+    :type consumption: typing.Optional[typing.Tuple[str, int]]
+    :return: new balance of the sender or None if the regular way should be used
+    :rtype: typing.Optional[int]
+    :raises ValueError: when the amount is not positive
+    """
+
+    if amount <= 0:
+        raise ValueError("Not a positive amount!")
+
+    connection = None
+    try:
+        rows, values, connection = BackendHelper._execute_no_commit(
+            "SELECT users.id, users.tid, users.name, users.username, users.balance, "
+            "externals.id IS NOT NULL AS external, externals.internal AS creditor "
+            "FROM users LEFT JOIN externals ON externals.external = users.id "
+            "WHERE users.tid = %s OR users.tid IS NULL FOR UPDATE",
+            (sender.id,)
+        )
+
+        senders = [v for v in values if v["tid"] == sender.id]
+        communities = [v for v in values if v["tid"] is None]
+        if len(senders) != 1 or len(communities) != 1 or communities[0]["external"]:
+            return
+        src, dst = senders[0], communities[0]
+        if src["name"] != sender.full_name or src["username"] != sender.username:
+            return
+        if src["external"] and src["creditor"] is None:
+            return
+
+        logger.info(f"Transferring {amount} from {src['name']} to {dst['name']} for '{reason}' (fast path) ...")
+
+        BackendHelper._execute_no_commit(
+            "INSERT INTO transactions (sender, receiver, amount, reason) VALUES (%s, %s, %s, %s)",
+            (src["id"], dst["id"], amount, reason),
+            connection=connection
+        )
+        if consumption is not None:
+            record_consumption(connection, consumption[0], consumption[1], amount)
+        BackendHelper._execute_no_commit(
+            "UPDATE users SET balance = balance + CASE WHEN id=%s THEN %s ELSE %s END WHERE id IN (%s, %s)",
+            (src["id"], -amount, amount, src["id"], dst["id"]),
+            connection=connection
+        )
+        record_balances(connection, src["id"], dst["id"])
+        connection.commit()
+
+    finally:
+        if connection:
+            connection.close()
+
+    if bot is not None:
+        send_transaction_log(bot, user.display_name(src["name"], src["username"]), dst["name"], amount, reason)
+
+    return src["balance"] - amount
 
 
 class TransactionLog(BackendHelper):
@@ -307,14 +665,34 @@ class TransactionLog(BackendHelper):
     :type uid: typing.Union[int, user.BaseBotUser]
     :param limit: restrict the number of fetched entries
     :type limit: typing.Optional[int]
+    :param archived: switch whether archived transactions should be included
+    :type archived: bool
+
+    Archived transactions (see :mod:`mate_bot.state.archive`) are read only
+    when the full history is requested or the recent transactions don't
+    reach the limit. Without archived transactions, the balance checkpoint
+    of the user is used as start balance for the validation.
+
+    The history is stored in parallel arrays instead of one dict per
+    transaction: the transaction IDs, the IDs of the other users, the
+    signed amounts (negative when the user is the sender) and the
+    timestamps as the number of seconds of the naive database time since
+    1970-01-01. Equal reasons share the same string object.
     """
 
     _uid: int
     _limit: typing.Optional[int]
+    _archived: bool
     _valid: bool
-    _log: list
+    _ids: array.array
+    _partners: array.array
+    _amounts: array.array
+    _timestamps: array.array
+    _reasons: typing.List[typing.Optional[str]]
     _names: dict
 
+    _EPOCH = datetime.datetime(1970, 1, 1)
+
     DEFAULT_NULL_REASON_REPLACE = "<no description>"
 
     @staticmethod
@@ -377,7 +755,8 @@ class TransactionLog(BackendHelper):
     def __init__(
             self,
             uid: typing.Union[int, user.BaseBotUser],
-            limit: typing.Optional[int] = None
+            limit: typing.Optional[int] = None,
+            archived: bool = True
     ):
 
         if isinstance(uid, int):
@@ -392,32 +771,139 @@ class TransactionLog(BackendHelper):
                 raise TypeError(f"Expected int, not {type(limit)}")
 
         self._limit = limit
+        self._archived = archived
         self._names = {}
 
-        extension = ""
-        params = (self._uid, self._uid)
-        if self._limit is not None:
-            extension = " ORDER BY registered DESC LIMIT %s"
-            params = (self._uid, self._uid, self._limit)
-
-        rows, self._log = self._execute(
-            "SELECT * FROM transactions WHERE sender=%s OR receiver=%s" + extension,
-            params
-        )
+        self._load()
 
         self._valid = True
-        if rows == 0 and user.BaseBotUser.get_tid_from_uid(self._uid) is None:
+        if len(self._ids) == 0 and user.BaseBotUser.get_tid_from_uid(self._uid) is None:
             self._valid = False
-        if len(self._log) == 0:
-            self._log = []
-
-        if self._limit is not None:
-            self._log.reverse()
 
         validity_check = self.validate()
         if validity_check is not None:
             self._valid = self._valid and validity_check
 
+    def _load(self, batch_size: int = 1000) -> None:
+        """
+        Fetch the transactions of the user into the arrays using a streaming cursor
+
+        Both tables are read from the same snapshot, so that transactions
+        which are archived at the same time are neither missed nor duplicated.
+
+        :param batch_size: number of rows fetched from the cursor at once
+        :type batch_size: int
+        :return: None
+        """
+
+        self._ids = array.array("q")
+        self._partners = array.array("q")
+        self._amounts = array.array("q")
+        self._timestamps = array.array("q")
+        self._reasons = []
+        reasons = {}
+
+        connection = pymysql.connect(**self.db_config)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+
+            if self._limit is None:
+                if self._archived:
+                    self._fetch(connection, "transactions_archive", None, reasons, batch_size)
+                self._fetch(connection, "transactions", None, reasons, batch_size)
+
+            else:
+                self._fetch(connection, "transactions", self._limit, reasons, batch_size)
+                if self._archived and len(self._ids) < self._limit:
+                    self._fetch(connection, "transactions_archive", self._limit - len(self._ids), reasons, batch_size)
+
+                self._ids.reverse()
+                self._partners.reverse()
+                self._amounts.reverse()
+                self._timestamps.reverse()
+                self._reasons.reverse()
+
+        finally:
+            connection.close()
+
+    def _fetch(
+            self,
+            connection: pymysql.connections.Connection,
+            table: str,
+            limit: typing.Optional[int],
+            reasons: typing.Dict[typing.Optional[str], typing.Optional[str]],
+            batch_size: int
+    ) -> None:
+        """
+        Append the transactions of the user stored in the given table to the arrays
+
+        :param connection: open database connection
+        :type connection: pymysql.connections.Connection
+        :param table: either ``transactions`` or ``transactions_archive``
+        :type table: str
+        :param limit: optional number of the latest transactions that should be fetched (newest first)
+        :type limit: typing.Optional[int]
+        :param reasons: dictionary of the reasons seen so far to share equal strings
+        :type reasons: typing.Dict[typing.Optional[str], typing.Optional[str]]
+        :param batch_size: number of rows fetched from the cursor at once
+        :type batch_size: int
+        :return: None
+        """
+
+        extension = ""
+        params = (self._uid, self._uid)
+        if limit is not None:
+            extension = " ORDER BY registered DESC LIMIT %s"
+            params = (self._uid, self._uid, limit)
+
+        cursor = connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(
+                "SELECT id, sender, receiver, amount, reason, "
+                "TIMESTAMPDIFF(SECOND, '1970-01-01', registered) "
+                f"FROM {table} WHERE sender=%s OR receiver=%s" + extension,
+                params
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for transaction_id, sender, receiver, amount, reason, timestamp in rows:
+                    self._ids.append(transaction_id)
+                    if sender == self._uid:
+                        self._partners.append(receiver)
+                        self._amounts.append(-amount)
+                    else:
+                        self._partners.append(sender)
+                        self._amounts.append(amount)
+                    self._timestamps.append(timestamp)
+                    self._reasons.append(reasons.setdefault(reason, reason))
+        finally:
+            cursor.close()
+
+    def _entries(self) -> typing.Iterator[typing.Tuple[int, int, int, int, typing.Optional[str]]]:
+        """
+        Iterate over the stored transactions without creating intermediate records
+
+        :return: iterator over tuples of ID, partner, signed amount, timestamp and reason
+        :rtype: typing.Iterator[typing.Tuple[int, int, int, int, typing.Optional[str]]]
+        """
+
+        return zip(self._ids, self._partners, self._amounts, self._timestamps, self._reasons)
+
+    def _get_datetime(self, timestamp: int) -> datetime.datetime:
+        """
+        Convert a stored timestamp into the naive datetime as returned by the database
+
+        :param timestamp: seconds of the naive database time since 1970-01-01
+        :type timestamp: int
+        :return: naive datetime object
+        :rtype: datetime.datetime
+        """
+
+        return self._EPOCH + datetime.timedelta(seconds=timestamp)
+
     def get_name(self, uid: int) -> typing.Optional[str]:
         """
         Convert a user ID of a user in the database to a name (or something else)
@@ -453,29 +939,26 @@ class TransactionLog(BackendHelper):
         """
 
         logs = []
-        for entry in self._log:
-            amount = entry["amount"] / 100
-            reason = entry["reason"]
-            if entry["reason"] is None:
+        tz = _local_tz.get_localzone()
+        incoming = self.get_direction(True)
+        outgoing = self.get_direction(False)
+        for _, partner, amount, timestamp, reason in self._entries():
+            if reason is None:
                 reason = self.DEFAULT_NULL_REASON_REPLACE
+            direction = incoming if amount > 0 else outgoing
 
-            if entry["receiver"] == self._uid:
-                direction = self.get_direction(True)
-                partner = self.get_name(entry["sender"])
-            elif entry["sender"] == self._uid:
-                direction = self.get_direction(False)
-                partner = self.get_name(entry["receiver"])
-                amount = -amount
-            else:
-                raise RuntimeError
-
-            tz = _local_tz.get_localzone()
             if localized:
-                ts = tz.localize(entry["registered"])
+                ts = tz.localize(self._get_datetime(timestamp))
             else:
-                ts = _tz.utc.localize(entry["registered"]).astimezone(tz)
+                ts = datetime.datetime.fromtimestamp(timestamp, tz)
 
-            logs.append(self.format_entry(amount, direction, partner, reason, self.format_time(ts.timetuple())))
+            logs.append(self.format_entry(
+                amount / 100,
+                direction,
+                self.get_name(partner),
+                reason,
+                self.format_time(ts.timetuple())
+            ))
 
         return logs
 
@@ -506,11 +989,17 @@ class TransactionLog(BackendHelper):
         :return: list
         """
 
-        result = []
-        for entry in self._log:
-            result.append(entry.copy())
-            result[-1]["registered"] = int(result[-1]["registered"].timestamp())
-        return result
+        return [
+            {
+                "id": transaction_id,
+                "sender": self._uid if amount < 0 else partner,
+                "receiver": partner if amount < 0 else self._uid,
+                "amount": abs(amount),
+                "reason": reason,
+                "registered": int(self._get_datetime(timestamp).timestamp())
+            }
+            for transaction_id, partner, amount, timestamp, reason in self._entries()
+        ]
 
     def to_csv(self, strict: bool = False) -> typing.Optional[str]:
         """
@@ -523,23 +1012,24 @@ class TransactionLog(BackendHelper):
         :rtype: typing.Optional[str]
         """
 
-        logs = [{
-            "id": entry["id"],
-            "sender": self.get_name(entry["sender"]),
-            "receiver": self.get_name(entry["receiver"]),
-            "amount": entry["amount"],
-            "cumulative": -entry["amount"] if entry["sender"] == self.uid else entry["amount"],
-            "reason": entry["reason"],
-            "registered": entry["registered"].isoformat()
-        } for entry in self._log]
-
-        if strict and len(logs) == 0:
+        if strict and len(self._ids) == 0:
             return
 
         with tempfile.TemporaryFile(mode="w+") as file:
-            writer = csv.DictWriter(file, fieldnames=logs[0].keys(), quoting=csv.QUOTE_ALL)
-            writer.writeheader()
-            writer.writerows(logs)
+            writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+            writer.writerow(["id", "sender", "receiver", "amount", "cumulative", "reason", "registered"])
+            own_name = self.get_name(self._uid)
+            for transaction_id, partner, amount, timestamp, reason in self._entries():
+                partner_name = self.get_name(partner)
+                writer.writerow([
+                    transaction_id,
+                    own_name if amount < 0 else partner_name,
+                    partner_name if amount < 0 else own_name,
+                    abs(amount),
+                    amount,
+                    reason,
+                    self._get_datetime(timestamp).isoformat()
+                ])
             file.seek(0)
             content = file.read()
 
@@ -551,6 +1041,8 @@ class TransactionLog(BackendHelper):
 
         This method is only useful for full history checks and therefore
         returns None not all data was fetched from the database by setting a limit.
+        When archived transactions are excluded, the balance checkpoint
+        of the user is added to the start balance.
 
         :param start: balance of the user when it was first created (should be zero)
         :type start: int
@@ -561,17 +1053,11 @@ class TransactionLog(BackendHelper):
         if self._limit is not None:
             return None
 
-        current = user.MateBotUser(self._uid).balance
-
-        for entry in self._log:
-            if entry["receiver"] == self._uid:
-                start += entry["amount"]
-            elif entry["sender"] == self._uid:
-                start -= entry["amount"]
-            else:
-                raise RuntimeError
+        if not self._archived:
+            start += get_checkpoint(self._uid)[0]
 
-        return start == current
+        current = user.MateBotUser(self._uid).balance
+        return start + sum(self._amounts) == current
 
     @property
     def uid(self) -> int:
@@ -593,6 +1079,19 @@ class TransactionLog(BackendHelper):
     def history(self) -> typing.List[typing.Dict[str, typing.Any]]:
         """
         Get the raw data of the user's transaction history
+
+        The records are created on every access, since the
+        history is stored in a more compact form internally.
         """
 
-        return self._log
+        return [
+            {
+                "id": transaction_id,
+                "sender": self._uid if amount < 0 else partner,
+                "receiver": partner if amount < 0 else self._uid,
+                "amount": abs(amount),
+                "reason": reason,
+                "registered": self._get_datetime(timestamp)
+            }
+            for transaction_id, partner, amount, timestamp, reason in self._entries()
+        ]
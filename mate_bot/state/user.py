@@ -17,6 +17,62 @@ from mate_bot.state.dbhelper import BackendHelper, EXECUTE_TYPE as _EXECUTE_TYPE
 
 logger = logging.getLogger("state")
 
+_update_hooks: typing.List[typing.Callable[[int, str], None]] = []
+
+IDENTITY_COLUMNS = ("name", "username")
+
+
+def add_update_hook(hook: typing.Callable[[int, str], None]) -> None:
+    """
+    Register a callable that will be notified when a user's name or username changes
+
+    The hook is called with the internal user ID and the name of the
+    changed column. Registering new users is reported as change of the
+    username, since a new username may change the result of lookups.
+    This allows other packages to invalidate their caches of user data.
+
+    :param hook: callable accepting the user ID and the column name
+    :type hook: typing.Callable[[int, str], None]
+    :return: None
+    """
+
+    _update_hooks.append(hook)
+
+
+def _notify_update_hooks(uid: int, column: str) -> None:
+    """
+    Call all registered update hooks, logging but not raising their errors
+
+    :param uid: internal ID of the changed user
+    :type uid: int
+    :param column: name of the changed column
+    :type column: str
+    :return: None
+    """
+
+    for hook in _update_hooks:
+        try:
+            hook(uid, column)
+        except Exception:
+            logger.exception(f"Update hook {hook} failed for user {uid}")
+
+
+def display_name(name: str, username: typing.Optional[str]) -> str:
+    """
+    Format the name of a user as used in messages and logs
+
+    :param name: full name of the user
+    :type name: str
+    :param username: optional Telegram username of the user
+    :type username: typing.Optional[str]
+    :return: name followed by the username in parentheses, if available
+    :rtype: str
+    """
+
+    if username is None:
+        return name
+    return f"{name} ({username})"
+
 
 class BaseBotUser(BackendHelper):
     """
@@ -163,6 +219,8 @@ class BaseBotUser(BackendHelper):
         rows, result = self.get_value("users", None, self._id)
 
         self._accessed = _tz.utc.localize(result[0]["accessed"])
+        if column in IDENTITY_COLUMNS:
+            _notify_update_hooks(self._id, column)
         return result[0][column]
 
     def _update_local(self, record: typing.Dict[str, typing.Any]) -> None:
@@ -458,6 +516,7 @@ class MateBotUser(BaseBotUser):
         if rows == 1 and len(values) == 1:
             self._update_local(values[0])
             if not existing:
+                _notify_update_hooks(self._id, "username")
                 self.external = True
             self._external = self.check_external()
 
@@ -465,10 +524,7 @@ class MateBotUser(BaseBotUser):
         return f"MateBotUser(uid={self.uid}, tid={self.tid})"
 
     def __str__(self) -> str:
-        result = self.name
-        if self.username is not None:
-            result += f" ({self.username})"
-        return result
+        return display_name(self.name, self.username)
 
     @property
     def debtors(self) -> typing.Optional[typing.List[int]]:
@@ -0,0 +1,208 @@
+"""
+MateBot throttling of incoming updates using per-user and per-chat token buckets
+"""
+
+import time
+import typing
+import logging
+import threading
+import collections
+
+from mate_bot.config import config
+
+
+logger = logging.getLogger("throttle")
+
+
+class TokenBucket:
+    """
+    Token bucket that allows bursts up to its capacity and refills at a constant rate
+
+    :param rate: number of tokens added per second
+    :type rate: float
+    :param capacity: maximum number of tokens (which is the allowed burst)
+    :type capacity: float
+    :param now: point in time (monotonic clock) the bucket is created
+    :type now: float
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> bool:
+        """
+        Remove one token from the bucket if possible
+
+        :param now: current point in time (monotonic clock)
+        :type now: float
+        :return: whether a token was available
+        :rtype: bool
+        """
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class Throttle:
+    """
+    Limit the number of updates every user and every chat may send to the executors
+
+    Every executor name (e.g. ``drink`` or ``communism``) may have its own
+    limits. Executors without their own limits share the default buckets
+    of the user and of the chat. An update is allowed when both the user's
+    and the chat's bucket hold a token. Note that the token of the user
+    is spent even if the chat's bucket is empty, so that a user can't
+    keep retrying to be the first one in a busy chat.
+
+    Rejected updates should be dropped before doing any database work.
+    Use :meth:`notify` to find out whether the user should be told
+    about the rejection, which happens at most once per ``notify-interval``.
+
+    The number of stored buckets is bounded by ``size``. When this
+    limit is exceeded, the least recently used buckets are dropped,
+    which resets their limits (so the size should be large enough).
+
+    :param settings: the ``throttle`` section of the configuration
+    :type settings: dict
+    :param size: maximum number of stored buckets
+    :type size: int
+    """
+
+    def __init__(self, settings: dict, size: int = 4096):
+        self.enabled = settings["enabled"]
+        self.notify_interval = settings["notify-interval"]
+        self._defaults = settings
+        self._overrides = settings["executors"]
+        self._size = size
+        self._lock = threading.Lock()
+        self._buckets: typing.OrderedDict[tuple, TokenBucket] = collections.OrderedDict()
+        self._notified: typing.OrderedDict[int, float] = collections.OrderedDict()
+        self._allowed: typing.Counter[str] = collections.Counter()
+        self._rejected: typing.Counter[str] = collections.Counter()
+
+    def _setting(self, name: str, key: str) -> float:
+        """
+        Get a limit of the executor, falling back to the defaults
+
+        :param name: name of the executor
+        :type name: str
+        :param key: name of the limit in the configuration
+        :type key: str
+        :return: configured limit
+        :rtype: float
+        """
+
+        return self._overrides.get(name, {}).get(key, self._defaults[key])
+
+    def _take(self, kind: str, name: str, identifier: int, now: float) -> bool:
+        """
+        Take a token from the bucket of the user or chat (internal use only, needs the lock!)
+
+        :param kind: either ``user`` or ``chat``
+        :type kind: str
+        :param name: name of the executor
+        :type name: str
+        :param identifier: Telegram ID of the user or chat
+        :type identifier: int
+        :param now: current point in time (monotonic clock)
+        :type now: float
+        :return: whether a token was available
+        :rtype: bool
+        """
+
+        scope = name if name in self._overrides else None
+        key = (kind, scope, identifier)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(
+                self._setting(name, f"{kind}-rate"),
+                self._setting(name, f"{kind}-burst"),
+                now
+            )
+            self._buckets[key] = bucket
+            while len(self._buckets) > self._size:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+    def allow(self, name: str, user: typing.Optional[int], chat: typing.Optional[int]) -> bool:
+        """
+        Check whether an update of the user in the chat may be handled by the executor
+
+        :param name: name of the executor
+        :type name: str
+        :param user: Telegram ID of the user who sent the update (if any)
+        :type user: typing.Optional[int]
+        :param chat: Telegram ID of the chat the update belongs to (if any)
+        :type chat: typing.Optional[int]
+        :return: whether the update should be handled
+        :rtype: bool
+        """
+
+        if not self.enabled:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            allowed = True
+            if user is not None:
+                allowed = self._take("user", name, user, now)
+            if allowed and chat is not None and chat != user:
+                allowed = self._take("chat", name, chat, now)
+
+            if allowed:
+                self._allowed[name] += 1
+            else:
+                self._rejected[name] += 1
+
+        if not allowed:
+            logger.debug(f"Throttled update for {name} by user {user} in chat {chat}")
+        return allowed
+
+    def notify(self, user: int) -> bool:
+        """
+        Check whether the user should be told about a rejected update
+
+        :param user: Telegram ID of the user whose update has been rejected
+        :type user: int
+        :return: whether the user should receive a notification
+        :rtype: bool
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            last = self._notified.get(user)
+            if last is not None and now - last < self.notify_interval:
+                return False
+            self._notified[user] = now
+            self._notified.move_to_end(user)
+            while len(self._notified) > self._size:
+                self._notified.popitem(last=False)
+            return True
+
+    def metrics(self) -> typing.Dict[str, typing.Dict[str, int]]:
+        """
+        Get the number of allowed and rejected updates per executor
+
+        :return: dict of executor names and dicts with the keys ``allowed`` and ``rejected``
+        :rtype: typing.Dict[str, typing.Dict[str, int]]
+        """
+
+        with self._lock:
+            return {
+                name: {"allowed": self._allowed[name], "rejected": self._rejected[name]}
+                for name in set(self._allowed) | set(self._rejected)
+            }
+
+
+throttle = Throttle(config["throttle"])
@@ -0,0 +1,444 @@
+"""
+MateBot lightweight tracing of updates with spans exported in the OTLP JSON format
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import typing
+import logging
+import functools
+import collections
+import threading
+import urllib.request
+
+
+logger = logging.getLogger("tracing")
+
+
+class Span:
+    """
+    Single timed operation within the trace of an update
+
+    Spans are created by the :class:`Tracer` and should not be created manually.
+
+    :param name: name of the operation (e.g. ``parse`` or ``query``)
+    :type name: str
+    :param trace_id: hexadecimal ID of the trace (32 characters)
+    :type trace_id: str
+    :param parent_id: hexadecimal ID of the parent span or None for the root span
+    :type parent_id: typing.Optional[str]
+    :param attributes: additional attributes of the span
+    :type attributes: dict
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start", "end", "error", "children")
+
+    def __init__(self, name: str, trace_id: str, parent_id: typing.Optional[str], attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+        self.children: typing.List["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        """
+        Get the duration of the finished span in seconds
+        """
+
+        return (self.end - self.start) / 1e9
+
+    def set(self, key: str, value: typing.Any) -> None:
+        """
+        Set an attribute of the span
+
+        :param key: name of the attribute
+        :type key: str
+        :param value: value of the attribute (should be a str, int, float or bool)
+        :return: None
+        """
+
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        """
+        Convert the finished span into its OTLP JSON representation
+
+        :return: dictionary as used in the ``spans`` list of OTLP's ``ScopeSpans``
+        :rtype: dict
+        """
+
+        def value(obj: typing.Any) -> dict:
+            if isinstance(obj, bool):
+                return {"boolValue": obj}
+            if isinstance(obj, int):
+                return {"intValue": str(obj)}
+            if isinstance(obj, float):
+                return {"doubleValue": obj}
+            return {"stringValue": str(obj)}
+
+        result = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1 if self.parent_id is None else 3,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [{"key": k, "value": value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 1} if self.error is None else {"code": 2, "message": self.error}
+        }
+        if self.parent_id is not None:
+            result["parentSpanId"] = self.parent_id
+        return result
+
+
+class _NoSpan:
+    """
+    Context manager used instead of a span when nothing is traced
+    """
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _ActiveSpan:
+    """
+    Context manager making a span the current span of the thread while it's active
+    """
+
+    def __init__(self, tracer: "Tracer", span: Span, root: bool):
+        self._tracer = tracer
+        self._span = span
+        self._root = root
+        self._previous = None
+
+    def __enter__(self) -> Span:
+        self._previous = getattr(self._tracer._local, "span", None)
+        self._tracer._local.span = self._span
+        return self._span
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._span.end = time.time_ns()
+        if exc_val is not None:
+            self._span.error = f"{exc_type.__name__}: {exc_val}"
+        self._tracer._local.span = self._previous
+        if self._root:
+            self._tracer._finish(self._span)
+
+
+class Tracer:
+    """
+    Tracer creating one trace per update with child spans for the slow operations
+
+    A trace is started by :meth:`trace` (usually in the ``__call__`` method of
+    the executors). Within the same thread, :meth:`span` adds child spans to
+    the current span. Outside of a trace, and while the tracer is disabled,
+    both methods return a shared no-op context manager, so tracing costs
+    practically nothing when it's not used.
+
+    All spans of a trace are kept in memory until the root span has finished.
+    Then the sampling decision is made: a trace is exported when its root span
+    took at least ``slow-threshold`` seconds or with a probability of
+    ``sample-rate``. This ensures that the slowest updates are always exported.
+    Exported traces are written by a background thread in batches, either
+    to a file (one OTLP JSON document per line, which can be read by the file
+    receiver of the OpenTelemetry collector) or to an OTLP/HTTP endpoint.
+
+    Work that is handed over to another thread (e.g. the outbound queue)
+    continues the trace using :meth:`current` and :meth:`resume`. Those spans
+    are exported on their own, since the trace they belong to has usually
+    finished before. They are exported when their trace has been exported
+    recently or when they are sampled themselves.
+
+    The tracer is disabled until it has been configured using :meth:`configure`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.settings = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._exported: typing.Deque[str] = collections.deque(maxlen=1024)
+        self._queue: queue.Queue = queue.Queue(maxsize=1024)
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def configure(self, settings: dict) -> None:
+        """
+        Configure the tracer using the ``tracing`` section of the configuration
+
+        :param settings: dict with the tracing settings
+        :type settings: dict
+        :return: None
+        :raises ValueError: when the exporter is unknown
+        """
+
+        if settings["exporter"] not in ("file", "otlp"):
+            raise ValueError(f"Unknown trace exporter: {settings['exporter']!r}")
+        self.settings = settings
+        self.enabled = settings["enabled"]
+
+    def trace(self, name: str, **attributes: typing.Any) -> typing.Union[_ActiveSpan, _NoSpan]:
+        """
+        Start a new trace with a root span (or a child span if a trace is already active)
+
+        :param name: name of the root span
+        :type name: str
+        :param attributes: attributes of the span
+        :return: context manager returning the span (or None when not traced)
+        """
+
+        if not self.enabled:
+            return _NO_SPAN
+        parent = getattr(self._local, "span", None)
+        if parent is not None:
+            return self._child(parent, name, attributes)
+        return _ActiveSpan(self, Span(name, os.urandom(16).hex(), None, attributes), True)
+
+    def span(self, name: str, **attributes: typing.Any) -> typing.Union[_ActiveSpan, _NoSpan]:
+        """
+        Create a child span of the current span of this thread
+
+        :param name: name of the span
+        :type name: str
+        :param attributes: attributes of the span
+        :return: context manager returning the span (or None when not traced)
+        """
+
+        parent = getattr(self._local, "span", None)
+        if parent is None:
+            return _NO_SPAN
+        return self._child(parent, name, attributes)
+
+    def current(self) -> typing.Optional[Span]:
+        """
+        Get the current span of this thread to continue its trace in another thread later
+
+        :return: current span or None (outside of a trace or while the tracer is disabled)
+        :rtype: typing.Optional[Span]
+        """
+
+        if not self.enabled:
+            return None
+        return getattr(self._local, "span", None)
+
+    def resume(
+            self,
+            parent: typing.Optional[Span],
+            name: str,
+            **attributes: typing.Any
+    ) -> typing.Union[_ActiveSpan, _NoSpan]:
+        """
+        Continue the trace of a span that was captured in another thread using :meth:`current`
+
+        The new span is a child of the given span and the current span of this
+        thread while it's active. It's exported together with its own children
+        as soon as it has finished, independent of the rest of its trace.
+
+        :param parent: captured span or None
+        :type parent: typing.Optional[Span]
+        :param name: name of the span
+        :type name: str
+        :param attributes: attributes of the span
+        :return: context manager returning the span (or None when not traced)
+        """
+
+        if parent is None or not self.enabled:
+            return _NO_SPAN
+        return _ActiveSpan(self, Span(name, parent.trace_id, parent.span_id, attributes), True)
+
+    def _child(self, parent: Span, name: str, attributes: dict) -> _ActiveSpan:
+        span = Span(name, parent.trace_id, parent.span_id, attributes)
+        parent.children.append(span)
+        return _ActiveSpan(self, span, False)
+
+    def wrap(self, name: str) -> typing.Callable[[typing.Callable], typing.Callable]:
+        """
+        Decorator to run a function in a child span of the current span
+
+        :param name: name of the span
+        :type name: str
+        :return: decorator
+        """
+
+        def decorator(func: typing.Callable) -> typing.Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def _sampled(self, root: Span) -> bool:
+        """
+        Decide whether a finished trace should be exported
+
+        :param root: finished root span of the trace
+        :type root: Span
+        :return: whether the trace should be exported
+        :rtype: bool
+        """
+
+        threshold = self.settings.get("slow-threshold")
+        if threshold is not None and root.duration >= threshold:
+            return True
+        return random.random() < self.settings.get("sample-rate", 0)
+
+    def _finish(self, root: Span) -> None:
+        """
+        Hand the finished trace to the exporter if it has been sampled
+
+        A resumed span (see :meth:`resume`) is exported as well when the
+        trace it belongs to has already been exported.
+
+        :param root: finished root span of the trace or resumed span
+        :type root: Span
+        :return: None
+        """
+
+        with self._lock:
+            exported = root.parent_id is not None and root.trace_id in self._exported
+        if not exported:
+            if not self._sampled(root):
+                return
+            if root.parent_id is None:
+                with self._lock:
+                    self._exported.append(root.trace_id)
+
+        spans = []
+        pending = [root]
+        while pending:
+            span = pending.pop()
+            spans.append(span.to_otlp())
+            pending.extend(span.children)
+
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning(f"Dropped trace {root.trace_id}, the export queue is full")
+
+    def _export(self, spans: list) -> None:
+        """
+        Write or send a batch of spans using the configured exporter
+
+        :param spans: list of spans in their OTLP JSON representation
+        :type spans: list
+        :return: None
+        """
+
+        document = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "matebot"}}]},
+            "scopeSpans": [{"scope": {"name": "mate_bot"}, "spans": spans}]
+        }]})
+
+        if self.settings["exporter"] == "file":
+            with open(self.settings["file"], "a", encoding="UTF-8") as f:
+                f.write(document + "\n")
+            return
+
+        request = urllib.request.Request(
+            self.settings["endpoint"],
+            data=document.encode("UTF-8"),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=10):
+            pass
+
+    def _work(self) -> None:
+        """
+        Export sampled traces in batches until None has been received (internal use only)
+
+        :return: None
+        """
+
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.settings["flush-interval"]
+            while len(batch) < self.settings["batch-size"]:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.extend(item)
+
+            if batch:
+                try:
+                    self._export(batch)
+                except Exception:
+                    logger.exception(f"Exporting {len(batch)} spans failed")
+
+    def start(self) -> None:
+        """
+        Start the background thread exporting the traces
+
+        :return: None
+        """
+
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._work, name="tracing", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: typing.Optional[float] = 10.0) -> None:
+        """
+        Export the remaining traces and stop the background thread
+
+        :param timeout: maximum number of seconds to wait for the thread
+        :type timeout: typing.Optional[float]
+        :return: None
+        """
+
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+tracer = Tracer()
+
+
+def trace_update(kind: str) -> typing.Callable[[typing.Callable], typing.Callable]:
+    """
+    Decorator for the ``__call__`` method of executors to start a trace per update
+
+    The root span is named after the kind and the class of the executor and
+    gets the IDs of the update, the user and the chat as attributes.
+
+    :param kind: kind of the executor (e.g. ``command``)
+    :type kind: str
+    :return: decorator
+    """
+
+    def decorator(func: typing.Callable) -> typing.Callable:
+        @functools.wraps(func)
+        def wrapper(self, update, context):
+            if not tracer.enabled:
+                return func(self, update, context)
+
+            attributes = {"update.id": update.update_id}
+            if update.effective_user is not None:
+                attributes["user.id"] = update.effective_user.id
+            if update.effective_chat is not None:
+                attributes["chat.id"] = update.effective_chat.id
+            with tracer.trace(f"{kind} {type(self).__name__}", **attributes):
+                return func(self, update, context)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,207 @@
+"""
+MateBot webhook server to receive updates from Telegram without polling
+"""
+
+import ssl
+import hmac
+import json
+import typing
+import logging
+import threading
+import http.server
+
+import telegram
+import telegram.ext
+
+
+logger = logging.getLogger("webhook")
+
+
+class WebhookRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Request handler that accepts updates posted by Telegram to the secret path
+
+    Every valid update will be put into the update queue of the dispatcher.
+    When the dispatcher is not running or its queue holds too many updates,
+    the request will be rejected, so that Telegram delivers it again later.
+    """
+
+    server: "WebhookServer"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+    def _respond(self, status: int, retry_after: typing.Optional[int] = None) -> None:
+        """
+        Send an empty response with the given status code
+
+        :param status: HTTP status code
+        :type status: int
+        :param retry_after: optional value for the ``Retry-After`` header in seconds
+        :type retry_after: typing.Optional[int]
+        :return: None
+        """
+
+        self.send_response(status)
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        self._respond(405)
+
+    def do_POST(self) -> None:
+        if not hmac.compare_digest(self.path.encode("UTF-8"), self.server.path.encode("UTF-8")):
+            self._respond(404)
+            return
+
+        if "Content-Length" not in self.headers:
+            self._respond(411)
+            return
+        try:
+            length = int(self.headers["Content-Length"])
+        except ValueError:
+            self._respond(400)
+            return
+        if length <= 0 or length > self.server.max_size:
+            self._respond(413 if length > 0 else 400)
+            return
+
+        if not self.server.dispatcher.running:
+            self._respond(503, self.server.retry_after)
+            return
+        if self.server.dispatcher.update_queue.qsize() >= self.server.max_queue:
+            logger.warning("Update queue is full, rejecting incoming update")
+            self._respond(429, self.server.retry_after)
+            return
+
+        try:
+            data = json.loads(self.rfile.read(length).decode("UTF-8"))
+            update = telegram.Update.de_json(data, self.server.bot)
+        except (ValueError, TypeError, KeyError):
+            logger.exception("Received an invalid update:")
+            self._respond(400)
+            return
+
+        self.server.dispatcher.update_queue.put(update)
+        self._respond(200)
+
+
+class WebhookServer(http.server.ThreadingHTTPServer):
+    """
+    Local HTTP(S) server that feeds updates posted by Telegram into the dispatcher
+
+    The secret path is the only protection against forged updates,
+    so it should be a long random string known only to Telegram.
+    TLS is optional, because the server may run behind a reverse
+    proxy that terminates the encrypted connection instead.
+
+    :param dispatcher: dispatcher of the Updater that processes the updates
+    :type dispatcher: telegram.ext.Dispatcher
+    :param bot: Telegram Bot object used to deserialize the updates
+    :type bot: telegram.Bot
+    :param listen: address the server should listen on
+    :type listen: str
+    :param port: port the server should listen on (use ``0`` for an arbitrary free port)
+    :type port: int
+    :param path: secret URL path Telegram posts the updates to (including the leading slash)
+    :type path: str
+    :param max_queue: number of pending updates from which on new updates will be rejected
+    :type max_queue: int
+    :param cert: optional path to the TLS certificate file
+    :type cert: typing.Optional[str]
+    :param key: optional path to the private key file of the TLS certificate
+    :type key: typing.Optional[str]
+    :raises ValueError: when the path does not start with a slash
+    """
+
+    daemon_threads = True
+    max_size = 1024 * 1024
+    retry_after = 1
+
+    def __init__(
+            self,
+            dispatcher: telegram.ext.Dispatcher,
+            bot: telegram.Bot,
+            listen: str,
+            port: int,
+            path: str,
+            max_queue: int,
+            cert: typing.Optional[str] = None,
+            key: typing.Optional[str] = None
+    ):
+        if not path.startswith("/"):
+            raise ValueError("The webhook path must start with a slash")
+
+        super().__init__((listen, port), WebhookRequestHandler)
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.max_queue = max_queue
+        self.tls = cert is not None
+
+        if cert is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(cert, key)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def start(self) -> threading.Thread:
+        """
+        Serve requests in a new background thread
+
+        :return: thread running the server
+        :rtype: threading.Thread
+        """
+
+        thread = threading.Thread(target=self.serve_forever, name="webhook", daemon=True)
+        thread.start()
+        logger.info(f"Listening for updates on {self.server_address[0]}:{self.server_address[1]}")
+        return thread
+
+
+def start_webhook(updater: telegram.ext.Updater, settings: dict) -> WebhookServer:
+    """
+    Start the dispatcher and a webhook server that feeds updates into it
+
+    The server is attached to the Updater, so that it will be shut down before
+    the dispatcher when the Updater stops (e.g. in :meth:`telegram.ext.Updater.idle`).
+    Afterwards, Telegram is told to send all updates to the configured URL.
+
+    :param updater: Updater whose dispatcher should process the updates
+    :type updater: telegram.ext.Updater
+    :param settings: the ``webhook`` section of the configuration
+    :type settings: dict
+    :return: the running webhook server
+    :rtype: WebhookServer
+    """
+
+    server = WebhookServer(
+        updater.dispatcher,
+        updater.bot,
+        settings["listen"],
+        settings["port"],
+        settings["path"],
+        settings["max-queue"],
+        settings["cert"],
+        settings["key"]
+    )
+
+    updater.running = True
+    updater.httpd = server
+    updater.job_queue.start()
+    ready = threading.Event()
+    threading.Thread(target=updater.dispatcher.start, args=(ready,), name="dispatcher").start()
+    ready.wait()
+    server.start()
+
+    certificate = None
+    if settings["cert"] is not None:
+        certificate = open(settings["cert"], "rb")
+    try:
+        updater.bot.set_webhook(settings["url"], certificate=certificate)
+    finally:
+        if certificate is not None:
+            certificate.close()
+
+    return server
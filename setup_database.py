@@ -9,6 +9,15 @@ procedure. Make sure that you have the correct version
 of the program installed, so full support for MySQL
 databases is given in advance.
 
+The import of the initial balances and the transaction log is
+stored in chunks. If the migration gets interrupted, it can be
+resumed by running this script again and only migrating the old data.
+
+Databases of older versions of the MateBot can be upgraded by this
+script, too. It creates the missing tables, columns and unique keys
+and fills the new statistics tables from the existing transactions.
+The Telegram bot should be powered off during the upgrade as well.
+
 This is an interactive script.
 """
 
@@ -24,19 +33,18 @@ def main():
 
     from mate_bot.config import config
     from mate_bot.state import dbhelper
-    from mate_bot.state.transactions import Transaction
-    from mate_bot.state.user import CommunityUser, MateBotUser
+    from mate_bot.state.archive import drop_references
+    from mate_bot.state.balances import rebuild_balances
+    from mate_bot.state.consumptions import backfill_consumptions, rebuild_rollups
+    from mate_bot.state.user import CommunityUser
 
     dbhelper.BackendHelper.db_config = config["database"]
     execute = dbhelper.BackendHelper._execute
 
-    class MigratedTransaction(Transaction):
-        def fix(self, timestamp: datetime.datetime):
-            if self._committed and self._id is not None:
-                execute(
-                    "UPDATE transactions SET registered=%s WHERE id=%s",
-                    (timestamp, self._id,)
-                )
+    CHUNK_SIZE = 1000
+    CHECKPOINT_TABLE = "migration_checkpoints"
+    INITIAL_BALANCES = "initial balances"
+    TRANSACTION_LOG = "transaction log"
 
     def get_path(file_description, file_name = "", default_path = ""):
         while not os.path.exists(default_path):
@@ -79,17 +87,15 @@ def main():
             exit(1)
         return v[0]
 
-    def find(id_, s):
-        for en in s:
-            if en["id"] == id_:
-                return en
-
     def get_first_ts_and_calc(current_state, transaction_log_path):
         first = None
+        lines = 0
+        users = {u["id"]: u for u in current_state}
         with open(transaction_log_path) as fd:
-            for line in fd.readlines():
+            for line in fd:
+                lines += 1
                 entry = json.loads(line)
-                user = find(entry["user"], current_state)
+                user = users[entry["user"]]
 
                 if not entry["reason"].startswith("communism"):
                     user["calc"] += entry["diff"]
@@ -98,7 +104,7 @@ def main():
                 elif entry["timestamp"] < first:
                     first = entry["timestamp"]
 
-        return first
+        return first, lines
 
     def create_users_from_state(current_state, migration):
         print("\nCreating new records in the database...")
@@ -211,15 +217,14 @@ def main():
             execute(command)
         print("\nCompleted database table setup.\n")
 
-    def create_user_objects(current_state):
-        print("\nRetrieving internal user IDs and creating User objects...")
+    def map_user_ids(current_state):
+        print("\nRetrieving internal user IDs...")
+        _, values = execute("SELECT id, tid FROM users")
+        ids = {v["tid"]: v["id"] for v in values}
         for u in current_state:
-            s, values = execute("SELECT id FROM users WHERE tid=%s", (u["id"],))
-            if s == 1:
-                u["uid"] = values[0]["id"]
-
-            u["u"] = MateBotUser(u["uid"])
+            u["uid"] = ids[u["id"]]
             print("User {} has internal ID {} now.".format(u["name"], u["uid"]))
+        return {u["id"]: u["uid"] for u in current_state}
 
     def transform_user_record(record, balance = None):
         user = {
@@ -288,47 +293,103 @@ def main():
     def make_reason_send() -> str:
         return "send: <no description>"
 
-    def migrate_transactions(current_state, transaction_log):
-        print("\nTransferring the transactions from the log file into the database...\n")
+    def connect():
+        return dbhelper.pymysql.connect(
+            **dbhelper.BackendHelper.db_config,
+            cursorclass=dbhelper.pymysql.cursors.DictCursor
+        )
+
+    def get_checkpoints():
+        r, v = execute("SHOW TABLES LIKE %s", (CHECKPOINT_TABLE,))
+        if r == 0:
+            return None
+        _, v = execute("SELECT name, position FROM {}".format(CHECKPOINT_TABLE))
+        return {e["name"]: e["position"] for e in v}
+
+    def create_checkpoints():
+        execute(
+            "CREATE TABLE IF NOT EXISTS {} ("
+            "name VARCHAR(255) PRIMARY KEY, "
+            "position INT NOT NULL"
+            ")".format(CHECKPOINT_TABLE)
+        )
+
+    def import_rows(name, rows, start, total):
+        # The iterator yields the position of the next row to be read (stored
+        # as checkpoint) and the row itself (or None if no row was produced).
+        # Every chunk is inserted in one transaction together with its checkpoint.
+        imported = 0
+        chunk = []
+        position = start
+
+        def flush():
+            connection = connect()
+            try:
+                with connection.cursor() as cursor:
+                    if chunk:
+                        cursor.executemany(
+                            "INSERT INTO transactions (sender, receiver, amount, reason, registered) "
+                            "VALUES (%s, %s, %s, %s, %s)",
+                            chunk
+                        )
+                    cursor.execute(
+                        "REPLACE INTO {} (name, position) VALUES (%s, %s)".format(CHECKPOINT_TABLE),
+                        (name, position)
+                    )
+                connection.commit()
+            finally:
+                connection.close()
+
+        for position, row in rows:
+            if row is not None:
+                chunk.append(row)
+            if len(chunk) >= CHUNK_SIZE:
+                flush()
+                imported += len(chunk)
+                chunk = []
+                print("Imported {} transactions ({} of {} lines, {:.1f}%)...".format(
+                    imported, position, total, 100 * position / max(total, 1)
+                ))
+
+        flush()
+        imported += len(chunk)
+        print("Imported {} transactions ({} of {} lines).".format(imported, position, total))
+        return imported
+
+    def parse_transactions(uids, community_uid, transaction_log, start, failed, communisms):
         sent = None
-        failed = []
-        communisms = []
+        sent_position = None
+
+        def position(current):
+            # resume at a pending sending transaction to import it together with its receiver
+            return current if sent is None else sent_position
+
         with open(transaction_log) as fd:
-            for l in fd.readlines():
+            for number, l in enumerate(fd):
+                if number < start:
+                    continue
+
                 tr = json.loads(l)
+                timestamp = datetime.datetime.fromtimestamp(int(tr["timestamp"]))
 
                 t = None
                 if tr["reason"] in ["drink", "ice", "water", "pizza"]:
-                    t = MigratedTransaction(
-                        find(tr["user"], current_state)["u"],
-                        CommunityUser(),
-                        -tr["diff"],
-                        make_reason_consume(tr["reason"])
-                    )
+                    t = (uids[tr["user"]], community_uid, -tr["diff"], make_reason_consume(tr["reason"]))
 
                 elif "x" in tr["reason"] and any(
                         [tr["reason"].startswith(k) for k in ["drink", "ice", "water", "pizza"]]
                 ):
+                    amount = 1
                     try:
                         amount = int(tr["reason"].split("x")[1])
                     except ValueError as err:
                         print(f"Error: {err}")
-                        print("The following data set could not be imported properly:\n{tr}")
+                        print(f"The following data set could not be imported properly:\n{tr}")
 
-                    t = MigratedTransaction(
-                        find(tr["user"], current_state)["u"],
-                        CommunityUser(),
-                        -tr["diff"],
-                        make_reason_consume(tr["reason"], amount)
-                    )
+                    t = (uids[tr["user"]], community_uid, -tr["diff"], make_reason_consume(tr["reason"], amount))
 
                 elif tr["reason"].startswith("pay"):
-                    t = MigratedTransaction(
-                        CommunityUser(),
-                        find(tr["user"], current_state)["u"],
-                        tr["diff"],
-                        make_reason_pay(tr["reason"])
-                    )
+                    t = (community_uid, uids[tr["user"]], tr["diff"], make_reason_pay(tr["reason"]))
 
                 elif tr["reason"].startswith("sent"):
                     if sent is not None:
@@ -337,6 +398,7 @@ def main():
                         print(tr)
                         ask_exit()
                     sent = tr
+                    sent_position = number
 
                 elif tr["reason"].startswith("received"):
                     if sent is None:
@@ -344,25 +406,19 @@ def main():
                         print(tr)
                         ask_exit()
 
-                    if sent["user"] == tr["user"]:
+                    elif sent["user"] == tr["user"]:
                         print("Warning! Skipping transaction with same sender and receiver:")
                         print(sent)
                         print(tr)
-                        sent = None
-                        continue
 
-                    if sent["diff"] != -tr["diff"]:
-                        print("\nError! The value of the sending and receiving transactions differ!")
-                        print(sent)
-                        print(tr)
-                        ask_exit()
+                    else:
+                        if sent["diff"] != -tr["diff"]:
+                            print("\nError! The value of the sending and receiving transactions differ!")
+                            print(sent)
+                            print(tr)
+                            ask_exit()
 
-                    t = MigratedTransaction(
-                        find(sent["user"], current_state)["u"],
-                        find(tr["user"], current_state)["u"],
-                        abs(tr["diff"]),
-                        make_reason_send()
-                    )
+                        t = (uids[sent["user"]], uids[tr["user"]], abs(tr["diff"]), make_reason_send())
 
                     sent = None
 
@@ -378,9 +434,27 @@ def main():
                     )
                     ask_exit()
 
-                if t is not None:
-                    t.commit()
-                    t.fix(datetime.datetime.fromtimestamp(int(tr["timestamp"])))
+                if t is not None and t[2] <= 0:
+                    failed.append(tr)
+                    print("\nError (no positive amount, not loaded into database):", tr, sep = "\n")
+                    ask_exit()
+                    t = None
+
+                yield position(number + 1), None if t is None else t + (timestamp,)
+
+    def migrate_transactions(uids, community_uid, transaction_log, lines, start = 0):
+        print("\nTransferring the transactions from the log file into the database...\n")
+        if start > 0:
+            print("Resuming the import at line {} of {}.".format(start, lines))
+
+        failed = []
+        communisms = []
+        import_rows(
+            TRANSACTION_LOG,
+            parse_transactions(uids, community_uid, transaction_log, start, failed, communisms),
+            start,
+            lines
+        )
 
         if len(failed) > 0:
             print("\nThere were {} entries that could not be loaded in the database automatically.".format(len(failed)))
@@ -390,19 +464,40 @@ def main():
 
         print("Completed import of old transactions.")
 
-    def fix_init_balances(current_state, migration):
+    def fix_init_balances(current_state, community_uid, migration, start = 0):
         print("\nCommitting initial transactions (using reason 'data migration')...")
+        rows = []
         for user in current_state:
             if user["init"] > 0:
-                t = MigratedTransaction(CommunityUser(), user["u"], abs(user["init"]), "data migration")
-                t.commit()
-                t.fix(migration)
+                rows.append((community_uid, user["uid"], abs(user["init"]), "data migration", migration))
             elif user["init"] < 0:
-                t = MigratedTransaction(user["u"], CommunityUser(), abs(user["init"]), "data migration")
-                t.commit()
-                t.fix(migration)
+                rows.append((user["uid"], community_uid, abs(user["init"]), "data migration", migration))
+
+        if start >= len(rows) > 0:
+            print("All {} initial transactions have been committed already.".format(len(rows)))
+            return
+        if start > 0:
+            print("Resuming the initial transactions at row {} of {}.".format(start, len(rows)))
+
+        import_rows(
+            INITIAL_BALANCES,
+            ((i + 1, row) for i, row in enumerate(rows) if i >= start),
+            start,
+            len(rows)
+        )
         print("Completed initial balance fix.")
 
+    def recompute_balances(uids):
+        print("\nRecomputing the balances of {} users...".format(len(uids)))
+        execute(
+            "UPDATE users SET balance = "
+            "(SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE receiver = users.id) - "
+            "(SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE sender = users.id) "
+            "WHERE id IN ({})".format(", ".join(["%s"] * len(uids))),
+            uids
+        )
+        print("Completed balance calculation.")
+
     def reset_community_balance(balance):
         db_balance = execute("SELECT balance FROM users WHERE id=%s", (CommunityUser().uid,))[1][0]["balance"]
         print("\nThe database stores a community's balance of {} for now.".format(db_balance))
@@ -444,7 +539,7 @@ def main():
                 ask_exit()
 
         print("\nCalculating the initial balance...")
-        first_timestamp = get_first_ts_and_calc(state, log_path)
+        first_timestamp, lines = get_first_ts_and_calc(state, log_path)
 
         def show_state_overview(current_state):
             for u in current_state:
@@ -460,16 +555,87 @@ def main():
         migration = first_ts.replace(hour = 0, minute = 0, second = 0)
         print("\nFirst timestamp: '{}'\nWe use '{}' as data migration timestamp now.".format(first_ts, migration))
 
-        verify_community_user_data(community_balance, migration)
-        create_users_from_state(state, migration)
-        create_user_objects(state)
-        fix_init_balances(state, migration)
-        migrate_transactions(state, log_path)
+        checkpoints = get_checkpoints()
+        if checkpoints is not None:
+            print("\nA previous migration has been interrupted. Its progress has been stored.")
+            if not ask_yes_no("Resume the previous migration (Y) or quit (N)? "):
+                print("Remove the table '{}' to start over. Exiting.".format(CHECKPOINT_TABLE))
+                exit(1)
+        else:
+            verify_community_user_data(community_balance, migration)
+            create_users_from_state(state, migration)
+            create_checkpoints()
+            checkpoints = {}
+
+        uids = map_user_ids(state)
+        community_uid = CommunityUser().uid
+        fix_init_balances(state, community_uid, migration, checkpoints.get(INITIAL_BALANCES, 0))
+        migrate_transactions(uids, community_uid, log_path, lines, checkpoints.get(TRANSACTION_LOG, 0))
+        recompute_balances(list(uids.values()) + [community_uid])
+        print("\nCreating consumption statistics...")
+        print("Found {} consumptions.".format(backfill_consumptions()))
+        rebuild_rollups()
+        execute("DROP TABLE {}".format(CHECKPOINT_TABLE))
         reset_community_balance(community_balance)
+        print("\nCreating the daily balances...")
+        print("Stored {} daily balances.".format(rebuild_balances()))
 
         print("\nFinished data migration successfully.")
         return state, migration
 
+    def upgrade_database():
+        print("\nUpgrading the database schema...\n")
+        schema = dbhelper.DATABASE_SCHEMA
+        _, v = execute("SHOW TABLES")
+        existing = {list(e.values())[0] for e in v}
+
+        created = []
+        for name in schema.dependency_order():
+            if name not in existing:
+                command = schema[name]._to_string(4)
+                print(command)
+                execute(command)
+                created.append(name)
+
+        added = []
+        for name in schema.dependency_order():
+            if name in created:
+                continue
+            _, v = execute(
+                "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                (name,)
+            )
+            columns = {e["COLUMN_NAME"] for e in v}
+            for column in schema[name].values():
+                if column.name not in columns:
+                    command = "ALTER TABLE {} ADD COLUMN {}".format(name, column)
+                    print(command)
+                    execute(command)
+                    added.append((name, column.name))
+
+            for unique, deleted in dbhelper.BackendHelper.add_unique_keys(schema[name]):
+                print("Added {} to table {} after deleting {} duplicate rows.".format(unique, name, deleted))
+                added.append((name, str(unique)))
+
+        print("\nDropped {} foreign keys referencing the transactions.".format(drop_references()))
+
+        if ("collectives", "changed") in added:
+            print("\nUsing the creation time as latest activity of existing collectives...")
+            execute("UPDATE collectives SET changed = created")
+
+        print("\nCreating consumption statistics...")
+        consumptions = backfill_consumptions()
+        print("Found {} consumptions.".format(consumptions))
+        if consumptions > 0 or "consumptions_daily" in created or "consumptions_weekly" in created:
+            rebuild_rollups()
+
+        if "balances_daily" in created:
+            print("\nCreating the daily balances...")
+            print("Stored {} daily balances.".format(rebuild_balances()))
+
+        print("\nCreated {} tables and {} columns or keys. Finished the upgrade.".format(len(created), len(added)))
+
     def start_new():
         migrate = ask_yes_no("Do you want to migrate your old data afterwards (Y) or not (N)? ")
         setup_freshly()
@@ -494,7 +660,10 @@ def main():
 
     print("Please make sure that your configuration was correctly set up before proceeding.\n")
 
-    if ask_yes_no("Start with a fresh database (Y) or only migrate old data (N)? "):
+    if ask_yes_no("Upgrade the schema of an existing database (Y) or set it up (N)? "):
+        upgrade_database()
+
+    elif ask_yes_no("Start with a fresh database (Y) or only migrate old data (N)? "):
         start_new()
 
     else:
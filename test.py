@@ -324,7 +324,160 @@ class CollectivesTests(unittest.TestCase):
     Testing suite for the package :mod:`mate_bot.collectives`
     """
 
-    pass
+    def test_render_cache(self):
+        """
+        Verify the versioning and eviction of :class:`mate_bot.collectives.cache.RenderCache`
+        """
+
+        from mate_bot.collectives.cache import RenderCache
+
+        cache = RenderCache(2)
+        calls = []
+
+        def render(value):
+            def factory():
+                calls.append(value)
+                return value
+            return factory
+
+        self.assertEqual(cache.fetch(1, "markdown", render("a")), "a")
+        self.assertEqual(cache.fetch(1, "markdown", render("b")), "a")
+        self.assertEqual(calls, ["a"])
+
+        cache.invalidate(1)
+        self.assertEqual(cache.version(1), 1)
+        self.assertEqual(cache.fetch(1, "markdown", render("c")), "c")
+        self.assertEqual(cache.fetch(1, "markdown", render("d")), "c")
+
+        def invalidating_factory():
+            cache.invalidate(2)
+            return "e"
+
+        self.assertEqual(cache.fetch(2, "markdown", invalidating_factory), "e")
+        self.assertNotIn(2, cache)
+
+        cache.fetch(2, "markdown", render("f"))
+        cache.fetch(3, "markdown", render("g"))
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(1, cache)
+        self.assertIn(3, cache)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertRaises(ValueError, RenderCache, 0)
+
+    def test_stale_collectives(self):
+        """
+        Verify that :func:`mate_bot.collectives.expiry.get_stale_collectives` pages by idle time and ID
+        """
+
+        from unittest import mock
+        from mate_bot.state.dbhelper import BackendHelper
+        from mate_bot.collectives.expiry import get_stale_collectives
+
+        values = [{"id": 4, "communistic": 1}, {"id": 7, "communistic": 0}]
+        with mock.patch.object(BackendHelper, "_execute", return_value=(2, values)) as execute:
+            self.assertEqual(get_stale_collectives(3600, 2, 3), [(4, True), (7, False)])
+
+        query, arguments = execute.call_args[0]
+        self.assertIn("changed < CURRENT_TIMESTAMP - INTERVAL %s SECOND", query)
+        self.assertIn("id > %s", query)
+        self.assertEqual(arguments, (3600, 3, 2))
+
+    def test_expire_collective(self):
+        """
+        Verify that :func:`mate_bot.collectives.expiry.expire_collective` edits and unregisters all messages once
+        """
+
+        from mate_bot.collectives.expiry import expire_collective, EXPIRY_NOTE
+
+        class Collective:
+            def __init__(self, aborted):
+                self.aborted = aborted
+                self.edits = []
+                self.unregistered = False
+
+            def _abort(self):
+                return self.aborted
+
+            def get(self):
+                return 1
+
+            def get_messages(self):
+                return [(10, 1), (20, 2)]
+
+            def get_markdown(self, status=None):
+                return "collective" + status
+
+            def edit_message(self, chat, msg, text, keyboard, bot):
+                self.edits.append((chat, msg, text, bot))
+
+            def unregister_all_messages(self):
+                self.unregistered = True
+
+        bot = object()
+        collective = Collective(True)
+        self.assertTrue(expire_collective(collective, bot))
+        self.assertEqual(collective.edits, [
+            (10, 1, "collective" + EXPIRY_NOTE, bot),
+            (20, 2, "collective" + EXPIRY_NOTE, bot)
+        ])
+        self.assertTrue(collective.unregistered)
+
+        collective = Collective(True)
+        self.assertTrue(expire_collective(collective))
+        self.assertEqual(collective.edits, [])
+        self.assertTrue(collective.unregistered)
+
+        collective = Collective(False)
+        self.assertFalse(expire_collective(collective, bot))
+        self.assertEqual(collective.edits, [])
+        self.assertFalse(collective.unregistered)
+
+    def test_expiry_batches(self):
+        """
+        Verify that the expiry of stale collectives pages past broken collectives and stops afterwards
+        """
+
+        from unittest import mock
+        from mate_bot.config import config
+        from mate_bot.collectives import expiry
+
+        stale = [(1, True), (2, False), (3, True), (5, False), (8, True)]
+        expired = []
+
+        def get_stale_collectives(age, limit, after=0):
+            return [c for c in stale if c[0] > after][:limit]
+
+        def broken(collective_id):
+            raise RuntimeError("Broken collective")
+
+        settings = {"expiry-age": 60, "expiry-batch": 2, "expiry-delay": 5, "expiry-interval": 3600}
+        with mock.patch.object(expiry, "get_stale_collectives", side_effect=get_stale_collectives), \
+                mock.patch.object(expiry, "Communism", side_effect=broken), \
+                mock.patch.object(expiry, "Payment", side_effect=lambda i: i), \
+                mock.patch.object(expiry, "expire_collective", side_effect=lambda c, b: expired.append(c)), \
+                mock.patch.dict(config["collectives"], settings):
+
+            self.assertEqual(expiry.expire_batch(60, 2), 2)
+            self.assertEqual(expiry.expire_batch(60, 2, 2), 5)
+            self.assertIsNone(expiry.expire_batch(60, 2, 5))
+            self.assertEqual(expired, [2, 5])
+
+            context = mock.Mock()
+            context.job.context = None
+            passes = 0
+            while context.job is not None:
+                passes += 1
+                context.job_queue.run_once.reset_mock()
+                expiry.expire_stale_collectives(context)
+                if context.job_queue.run_once.called:
+                    self.assertEqual(context.job_queue.run_once.call_args[0][1], 5)
+                    context.job.context = context.job_queue.run_once.call_args[1]["context"]
+                else:
+                    context.job = None
+            self.assertEqual(passes, 3)
+            self.assertEqual(expired, [2, 5, 2, 5])
 
 
 class CommandsTests(unittest.TestCase):
@@ -332,7 +485,221 @@ class CommandsTests(unittest.TestCase):
     Testing suite for the package :mod:`mate_bot.commands`
     """
 
-    pass
+    def test_callback_codec(self):
+        """
+        Verify encoding and decoding of callback data by :class:`mate_bot.codec.CallbackCodec`
+        """
+
+        from mate_bot.codec import CallbackCodec
+
+        codec = CallbackCodec("vouch", {
+            "add": (int, int, ("accept", "deny")),
+            "remove": (int, int, ("accept", "deny"))
+        })
+
+        data = codec.encode("remove", 1234567, 42, "deny")
+        self.assertEqual(data, "vouch:1:1:qglj:16:1")
+        self.assertEqual(codec.decode(data), ("remove", (1234567, 42, "deny")))
+        self.assertEqual(codec.decode("vouch add 5 6 accept"), ("add", (5, 6, "accept")))
+        self.assertIsNone(codec.decode("vouch add 5 6 maybe"))
+        self.assertIsNone(codec.decode("vouch:2:0:5:6:0"))
+        self.assertIsNone(codec.decode("vouch:1:0:5:6:2"))
+        self.assertIsNone(codec.decode("vouch:1:0:5:6"))
+        self.assertRaises(ValueError, codec.encode, "add", 1, 2)
+        self.assertRaises(ValueError, codec.encode, "add", 1, 2, "maybe")
+        self.assertRaises(ValueError, codec.encode, "add", 10 ** 100, 2, "deny")
+        self.assertRaises(KeyError, codec.encode, "toggle", 1, 2, "deny")
+
+    def test_lazy_executors(self):
+        """
+        Verify that every :class:`mate_bot.commands.lazy.LazyExecutor` loads an executor under its own key
+        """
+
+        from mate_bot import registry
+        from mate_bot.commands.lazy import LazyExecutor
+        import mate_bot.commands
+
+        pools = (registry.commands, registry.callback_queries, registry.inline_queries, registry.inline_results)
+        for pool in pools:
+            keys = list(pool.keys())
+            self.assertGreater(len(keys), 0)
+            for key in keys:
+                executor = pool[key]
+                if isinstance(executor, LazyExecutor):
+                    self.assertIs(executor.load(), pool[key])
+                self.assertNotIsInstance(pool[key], LazyExecutor)
+            self.assertListEqual(list(pool.keys()), keys)
+
+    def test_help_catalogue(self):
+        """
+        Verify the prebuilt help texts of :class:`mate_bot.commands.help.HelpCatalogue`
+        """
+
+        from mate_bot.registry import Registry
+        from mate_bot.commands.help import HelpCatalogue, LEVEL_EXTERNAL, LEVEL_INTERNAL
+        from mate_bot.parsing.parser import CommandParser
+        from mate_bot.parsing.util import Namespace
+
+        def command(name, description):
+            parser = CommandParser(name)
+            parser.add_argument("value")
+            return Namespace(name=name, description=description, parser=parser, usage=f"/{name} <value>")
+
+        commands = Registry(help=command("help", "Get help"))
+        catalogue = HelpCatalogue(commands)
+        self.assertIn("Get help", catalogue.command("HELP"))
+        self.assertIn("/help <value>", catalogue.overview(LEVEL_INTERNAL))
+        self.assertNotIn("`foo`", catalogue.overview())
+        self.assertIn("external user", catalogue.overview(LEVEL_EXTERNAL))
+        self.assertIsNone(catalogue.command("foo"))
+
+        result = catalogue.inline_result("help", object)
+        self.assertIs(catalogue.inline_result("help", object), result)
+
+        commands["foo"] = command("foo", "Do foo")
+        self.assertEqual(catalogue.command("foo"), "*Usages:*\n`/foo <value>`\n\n*Description:*\nDo foo")
+        self.assertIn("`foo`", catalogue.overview())
+        self.assertIsNot(catalogue.inline_result("help", object), result)
+
+    def test_inline_answer_cache(self):
+        """
+        Verify caching and deduplication of inline answers by :class:`mate_bot.commands.inline.InlineAnswerCache`
+        """
+
+        import threading
+        from mate_bot.commands.inline import InlineAnswerCache
+
+        cache = InlineAnswerCache(2, 60)
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return ["answer"]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.fetch("key", slow))) for _ in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, [["answer"]] * 3)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.fetch("key", list), ["answer"])
+        self.assertRaises(ZeroDivisionError, cache.fetch, "error", lambda: 1 / 0)
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+        self.assertEqual(cache.fetch("key", list), [])
+
+        cache.enter(1, "a")
+        self.assertFalse(cache.is_superseded(1, "a"))
+        cache.enter(1, "b")
+        self.assertTrue(cache.is_superseded(1, "a"))
+        cache.leave(1, "a")
+        self.assertFalse(cache.is_superseded(1, "b"))
+        cache.leave(1, "b")
+        self.assertFalse(cache.is_superseded(1, "a"))
+
+    def test_router_handler(self):
+        """
+        Verify the routing of updates by :class:`mate_bot.commands.handler.RouterHandler`
+        """
+
+        import datetime
+        import telegram
+        from mate_bot.commands.handler import RouterHandler
+
+        callbacks = {"^communism": "communism", "^pay": "pay", "^p": "p", r"^\d+": "digits", "": "all"}
+        results = {r"^forward-\d+-\d+-\d+": "forward"}
+        router = RouterHandler({"help": "help"}, callbacks, {}, results)
+
+        class Bot:
+            username = "MateBot"
+
+        def message(text):
+            return telegram.Message(
+                1,
+                telegram.User(2, "user", False),
+                datetime.datetime.now(),
+                telegram.Chat(-3, "group"),
+                text=text,
+                entities=[telegram.MessageEntity("bot_command", 0, len(text.split()[0]))],
+                bot=Bot()
+            )
+
+        self.assertEqual(router.check_update(telegram.Update(1, message=message("/help pay"))), ("help", None, ["pay"]))
+        self.assertEqual(router.check_update(telegram.Update(1, edited_message=message("/help@MateBot")))[0], "help")
+        self.assertIsNone(router.check_update(telegram.Update(1, message=message("/help@OtherBot"))))
+        self.assertIsNone(router.check_update(telegram.Update(1, channel_post=message("/help"))))
+        self.assertIsNone(router.check_update(telegram.Update(1, edited_channel_post=message("/help"))))
+
+        def callback(data):
+            query = telegram.CallbackQuery("1", None, "chat", data=data)
+            result = router.check_update(telegram.Update(1, callback_query=query))
+            return result and result[0]
+
+        self.assertEqual(callback("communism toggle 42"), "communism")
+        self.assertEqual(callback("pay approve 4"), "pay")
+        self.assertEqual(callback("p"), "p")
+        self.assertEqual(callback("42"), "digits")
+        self.assertEqual(callback("payment"), "all")
+        self.assertEqual(callback(None), "all")
+
+        chosen = telegram.ChosenInlineResult("forward-1-2-3", None, "")
+        self.assertEqual(router.check_update(telegram.Update(1, chosen_inline_result=chosen))[0], "forward")
+        chosen = telegram.ChosenInlineResult("forward-1", None, "")
+        self.assertIsNone(router.check_update(telegram.Update(1, chosen_inline_result=chosen)))
+        self.assertIsNone(router.check_update(None))
+
+    def test_router_metrics_labels(self):
+        """
+        Verify that :class:`mate_bot.commands.handler.RouterHandler` labels the metrics per registered executor
+        """
+
+        from unittest import mock
+        import telegram
+        from mate_bot import metrics
+        from mate_bot.commands.handler import RouterHandler
+        from mate_bot.commands.lazy import LazyExecutor
+
+        class Executor:
+            def __init__(self, name=None):
+                if name is not None:
+                    self.name = name
+                self.calls = 0
+
+            def __call__(self, update, context):
+                self.calls += 1
+
+        class ForwardInlineQuery(Executor):
+            pass
+
+        commands = {}
+        drink = LazyExecutor(commands, "drink", "unused", "Executor")
+        drink._executor = Executor("drink")
+        commands["water"] = Executor("water")
+        router = RouterHandler(commands, {}, {}, {})
+
+        context = mock.Mock()
+        inline = telegram.Update(1, inline_query=telegram.InlineQuery("1", None, "42", ""))
+        with mock.patch.object(metrics.updates, "inc") as inc:
+            router.handle_update(telegram.Update(1), None, (drink, None, []), context)
+            router.handle_update(telegram.Update(1), None, (commands["water"], None, []), context)
+            router.handle_update(inline, None, (ForwardInlineQuery(), None, None), context)
+
+        self.assertEqual([c[0] for c in inc.call_args_list], [
+            ("command", "drink"),
+            ("command", "water"),
+            ("inline_query", "ForwardInlineQuery")
+        ])
+        self.assertEqual(drink.load().calls, 1)
 
 
 class ParsingTests(unittest.TestCase):
@@ -340,7 +707,600 @@ class ParsingTests(unittest.TestCase):
     Testing suite for the package :mod:`mate_bot.parsing`
     """
 
-    pass
+    def test_converter_cache(self):
+        """
+        Verify the caching of converters by :class:`mate_bot.parsing.cache.ConverterCache`
+        """
+
+        from mate_bot.parsing.cache import ConverterCache, cached_converter
+
+        cache = ConverterCache(2)
+        calls = []
+
+        @cached_converter(key=lambda arg: arg.lower(), cache=cache)
+        def upper(arg):
+            calls.append(arg)
+            if not arg.isalpha():
+                raise ValueError(arg)
+            return arg.upper()
+
+        self.assertEqual(upper("foo"), "FOO")
+        self.assertEqual(upper("FOO"), "FOO")
+        self.assertEqual(calls, ["foo"])
+        self.assertRaises(ValueError, upper, "1")
+        self.assertRaises(ValueError, upper, "1")
+        self.assertEqual(calls, ["foo", "1", "1"])
+
+        upper("bar")
+        upper("baz")
+        self.assertEqual(len(cache), 2)
+        upper("foo")
+        self.assertEqual(calls[-1], "foo")
+
+        cache.invalidate(upper.cache_name, "foo")
+        upper("foo")
+        self.assertEqual(calls.count("foo"), 3)
+        cache.invalidate(upper.cache_name)
+        self.assertEqual(len(cache), 0)
+
+        self.assertEqual(cache.fetch("expiring", 1, lambda: 1, ttl=-1), 1)
+        self.assertEqual(cache.fetch("expiring", 1, lambda: 2, ttl=-1), 2)
+        self.assertRaises(ValueError, ConverterCache, 0)
+
+    def test_parser_usages(self):
+        """
+        Verify the usages, actions and error messages of :class:`mate_bot.parsing.parser.CommandParser`
+        """
+
+        from mate_bot.err import ParsingError
+        from mate_bot.parsing.actions import JoinAction
+        from mate_bot.parsing.parser import CommandParser
+        from mate_bot.parsing.util import Namespace
+
+        calls = []
+
+        def counted(arg):
+            calls.append(arg)
+            return int(arg)
+
+        parser = CommandParser("test")
+        parser.add_argument("number", type=counted)
+        parser.add_argument("word", choices=("a", "b"))
+        usage = parser.new_usage()
+        usage.add_argument("number", type=counted)
+        usage.add_argument("text", action=JoinAction, nargs="+")
+
+        self.assertEqual(parser._parse(["1", "a"]), Namespace(number=1, word="a"))
+        calls.clear()
+        self.assertEqual(parser._parse(["2", "c", "d"]), Namespace(number=2, text="c d"))
+        self.assertEqual(calls, ["2"])
+
+        calls.clear()
+        with self.assertRaises(ParsingError) as context:
+            parser._parse(["x", "a"])
+        self.assertEqual(calls, ["x"])
+        self.assertEqual(str(context.exception).count("invalid literal"), 2)
+        self.assertRaises(ParsingError, parser._parse, [])
+
+        parser.new_usage().add_argument("rest", nargs="*")
+        self.assertEqual(parser._parse([]), Namespace(rest=[]))
+
+
+class WebhookTests(unittest.TestCase):
+    """
+    Testing suite for the module :mod:`mate_bot.webhook`
+    """
+
+    def setUp(self):
+        import queue
+        import telegram
+        from mate_bot.webhook import WebhookServer
+
+        class FakeDispatcher:
+            running = True
+            update_queue = queue.Queue()
+
+        self.dispatcher = FakeDispatcher()
+        self.server = WebhookServer(
+            self.dispatcher,
+            telegram.Bot("123456:ABCDEF"),
+            "127.0.0.1",
+            0,
+            "/secret",
+            2
+        )
+        self.server.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _post(self, path: str, data: dict) -> int:
+        import json
+        import urllib.error
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.url + path,
+            json.dumps(data).encode("UTF-8"),
+            {"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+    def test_webhook_updates(self):
+        """
+        Verify that posted updates are queued and rejected when the queue is full
+        """
+
+        update = {
+            "update_id": 42,
+            "message": {
+                "message_id": 1,
+                "date": 1600000000,
+                "chat": {"id": 1337, "type": "private"},
+                "text": "/help"
+            }
+        }
+
+        self.assertEqual(self._post("/wrong", update), 404)
+        self.assertEqual(self._post("/secret", update), 200)
+        self.assertEqual(self.dispatcher.update_queue.get_nowait().update_id, 42)
+
+        self.assertEqual(self._post("/secret", update), 200)
+        self.assertEqual(self._post("/secret", update), 200)
+        self.assertEqual(self._post("/secret", update), 429)
+        self.assertEqual(self.dispatcher.update_queue.qsize(), 2)
+
+        self.dispatcher.running = False
+        self.assertEqual(self._post("/secret", update), 503)
+
+    def test_webhook_content_length(self):
+        """
+        Verify that requests with a missing, malformed or too large content length are rejected
+        """
+
+        import http.client
+
+        def post(length: typing.Optional[str]) -> int:
+            connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1])
+            try:
+                connection.putrequest("POST", "/secret")
+                if length is not None:
+                    connection.putheader("Content-Length", length)
+                connection.endheaders()
+                return connection.getresponse().status
+            finally:
+                connection.close()
+
+        self.assertEqual(post(None), 411)
+        self.assertEqual(post("abc"), 400)
+        self.assertEqual(post("-5"), 400)
+        self.assertEqual(post("0"), 400)
+        self.assertEqual(post(str(self.server.max_size + 1)), 413)
+        self.assertEqual(self.dispatcher.update_queue.qsize(), 0)
+
+
+class OutboundTests(unittest.TestCase):
+    """
+    Testing suite for the module :mod:`mate_bot.outbound`
+    """
+
+    def setUp(self) -> None:
+        from mate_bot.outbound import OutboundQueue
+
+        self.queue = OutboundQueue(100, 1.0, 0.0, 0.0, 2)
+        self.sent = []
+
+    def _drain(self) -> None:
+        """
+        Send all queued requests in the current thread
+        """
+
+        self.queue._running = False
+        self.queue._work()
+
+    def _send(self, name: str):
+        def send_message(*args, **kwargs):
+            self.sent.append(name)
+            return name
+        return send_message
+
+    def test_priority_order(self):
+        """
+        Verify that requests are sent ordered by priority and submission
+        """
+
+        from mate_bot.outbound import PRIORITY_USER, PRIORITY_NOTIFICATION, PRIORITY_LOG
+
+        self.queue._running = True
+        self.queue.submit(1, self._send("log"), priority=PRIORITY_LOG)
+        self.queue.submit(1, self._send("notification"), priority=PRIORITY_NOTIFICATION)
+        self.queue.submit(1, self._send("user 1"), priority=PRIORITY_USER)
+        self.queue.submit(1, self._send("user 2"), priority=PRIORITY_USER)
+        self._drain()
+        self.assertEqual(self.sent, ["user 1", "user 2", "notification", "log"])
+
+    def test_key_coalescing(self):
+        """
+        Verify that a pending request is cancelled when superseded by a request with the same key
+        """
+
+        results = []
+        self.queue._running = True
+        self.queue.submit(1, self._send("old"), key="edit", callback=results.append)
+        self.queue.submit(1, self._send("new"), key="edit", callback=results.append)
+        self._drain()
+        self.assertEqual(self.sent, ["new"])
+        self.assertEqual(results, ["new"])
+        self.assertEqual(self.queue._keys, {})
+
+    def test_chat_interval(self):
+        """
+        Verify that a chat has to wait for its interval without blocking other chats
+        """
+
+        import time
+        from mate_bot.outbound import OutboundQueue
+
+        self.queue = OutboundQueue(100, 1.0, 0.2, 0.0, 2)
+        times = {}
+
+        def send(name):
+            def send_message():
+                self.sent.append(name)
+                times[name] = time.monotonic()
+            return send_message
+
+        self.queue._running = True
+        self.queue.submit(-1, send("group 1"))
+        self.queue.submit(-1, send("group 2"))
+        self.queue.submit(5, send("private"))
+        self._drain()
+        self.assertEqual(self.sent, ["group 1", "private", "group 2"])
+        self.assertGreaterEqual(times["group 2"] - times["group 1"], 0.19)
+
+    def test_retry_after(self):
+        """
+        Verify that flood control reschedules the request and delays the chat
+        """
+
+        import telegram
+
+        calls = []
+
+        def send_message():
+            calls.append(1)
+            if len(calls) == 1:
+                raise telegram.error.RetryAfter(0.1)
+
+        self.queue._running = True
+        self.queue.submit(-1, send_message)
+        self._drain()
+        self.assertEqual(len(calls), 2)
+
+    def test_errors(self):
+        """
+        Verify the handling of unmodified messages, timeouts and unexpected errors
+        """
+
+        import telegram
+
+        calls = []
+
+        def edit_message_text():
+            calls.append("edit")
+            if calls.count("edit") == 1:
+                raise telegram.error.TimedOut()
+            raise telegram.error.BadRequest("Message is not modified: specified new message content ...")
+
+        def send_message():
+            calls.append("send")
+            raise telegram.error.TimedOut()
+
+        def send_photo():
+            calls.append("photo")
+            raise TypeError("unexpected")
+
+        self.queue._running = True
+        self.queue.submit(1, send_photo)
+        self.queue.submit(1, send_message)
+        self.queue.submit(1, edit_message_text, callback=self.sent.append)
+        self.queue.submit(1, self._send("later"))
+        self._drain()
+        self.assertEqual(calls, ["photo", "send", "edit", "edit"])
+        self.assertEqual(self.sent, ["later"])
+
+    def test_stop(self):
+        """
+        Verify that stopping the worker thread sends the remaining requests first
+        """
+
+        self.queue.start()
+        for i in range(20):
+            self.queue.submit(i, self._send(i))
+        self.queue.stop(5)
+        self.assertFalse(self.queue.running)
+        self.assertEqual(sorted(self.sent), list(range(20)))
+        self.assertEqual(len(self.queue), 0)
+
+    def test_tracing(self):
+        """
+        Verify that requests sent by the worker thread continue the trace of the submitting thread
+        """
+
+        import os
+        import json
+        import time
+        import tempfile
+        import threading
+        from unittest import mock
+        from mate_bot import outbound
+        from mate_bot.tracing import Tracer
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            tracer = Tracer()
+            tracer.configure({
+                "enabled": True,
+                "sample-rate": 0,
+                "slow-threshold": 0.05,
+                "exporter": "file",
+                "file": path,
+                "endpoint": None,
+                "batch-size": 8,
+                "flush-interval": 0.1
+            })
+            tracer.start()
+            finished = threading.Event()
+
+            def send_message(*args, **kwargs):
+                finished.wait(5)
+                with tracer.span("telegram", method="sendMessage"):
+                    self.sent.append(tracer.current())
+
+            with mock.patch.object(outbound, "tracer", tracer):
+                self.queue.start()
+                with tracer.trace("command") as root:
+                    self.queue.submit(1, send_message)
+                    time.sleep(0.06)
+                with tracer.trace("fast"):
+                    self.queue.submit(2, send_message)
+                finished.set()
+                self.queue.stop(5)
+            tracer.stop()
+
+            spans = []
+            with open(path) as f:
+                for line in f:
+                    spans.extend(json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"])
+
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(sorted(s["name"] for s in spans), ["command", "outbound", "telegram"])
+        self.assertEqual({s["traceId"] for s in spans}, {root.trace_id})
+        names = {s["spanId"]: s["name"] for s in spans}
+        parents = {s["name"]: names.get(s.get("parentSpanId")) for s in spans}
+        self.assertEqual(parents, {"command": None, "outbound": "command", "telegram": "outbound"})
+        self.assertEqual(self.sent[0].span_id, [s["spanId"] for s in spans if s["name"] == "telegram"][0])
+
+
+class ThrottleTests(unittest.TestCase):
+    """
+    Testing suite for the module :mod:`mate_bot.throttle`
+    """
+
+    def test_throttle(self):
+        """
+        Verify the token buckets, notifications and metrics of :class:`mate_bot.throttle.Throttle`
+        """
+
+        from mate_bot.throttle import Throttle
+
+        throttle = Throttle({
+            "enabled": True,
+            "user-rate": 0.001,
+            "user-burst": 2,
+            "chat-rate": 0.001,
+            "chat-burst": 3,
+            "notify-interval": 60,
+            "executors": {"drink": {"user-burst": 1}}
+        })
+
+        self.assertTrue(throttle.allow("help", 1, -10))
+        self.assertTrue(throttle.allow("blame", 1, -10))
+        self.assertFalse(throttle.allow("help", 1, -10))
+        self.assertTrue(throttle.allow("drink", 1, -10))
+        self.assertFalse(throttle.allow("drink", 1, -10))
+        self.assertTrue(throttle.allow("help", 2, -10))
+        self.assertFalse(throttle.allow("help", 3, -10))
+        self.assertTrue(throttle.allow("help", 3, 3))
+
+        self.assertTrue(throttle.notify(1))
+        self.assertFalse(throttle.notify(1))
+        self.assertEqual(throttle.metrics()["help"], {"allowed": 3, "rejected": 2})
+        self.assertEqual(throttle.metrics()["drink"], {"allowed": 1, "rejected": 1})
+
+        throttle.enabled = False
+        self.assertTrue(throttle.allow("help", 1, -10))
+
+
+class MetricsTests(unittest.TestCase):
+    """
+    Testing suite for the module :mod:`mate_bot.metrics`
+    """
+
+    def test_exposition(self):
+        """
+        Verify the metric types and the text exposition format of :class:`mate_bot.metrics.MetricsRegistry`
+        """
+
+        from mate_bot.metrics import Counter, Gauge, Histogram, MetricsRegistry, statement_type
+
+        registry = MetricsRegistry()
+        counter = registry.register(Counter("test_total", "Test counter", ("name",)))
+        histogram = registry.register(Histogram("test_seconds", "Test histogram", (), (0.1, 1)))
+        registry.register(Gauge("test_length", "Test gauge", function=lambda: 3))
+        self.assertRaises(ValueError, registry.register, Counter("test_total", "Duplicate"))
+        self.assertRaises(ValueError, counter.inc)
+
+        counter.inc('a"b')
+        counter.inc('a"b', amount=2)
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        registry.add_collector(lambda: ["# TYPE test_extra counter", "test_extra 1"])
+
+        lines = registry.expose().splitlines()
+        self.assertIn("# TYPE test_total counter", lines)
+        self.assertIn('test_total{name="a\\"b"} 3', lines)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn("test_seconds_count 3", lines)
+        self.assertIn("test_seconds_sum 5.55", lines)
+        self.assertIn("test_length 3", lines)
+        self.assertIn("test_extra 1", lines)
+        self.assertEqual(statement_type("  select * FROM users"), "SELECT")
+
+
+class TracingTests(unittest.TestCase):
+    """
+    Testing suite for the module :mod:`mate_bot.tracing`
+    """
+
+    def test_file_export(self):
+        """
+        Verify the sampling of spans and the export to a file by :class:`mate_bot.tracing.Tracer`
+        """
+
+        import os
+        import json
+        import tempfile
+        from mate_bot.tracing import Tracer
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            tracer = Tracer()
+            tracer.configure({
+                "enabled": True,
+                "sample-rate": 0,
+                "slow-threshold": 0,
+                "exporter": "file",
+                "file": path,
+                "endpoint": None,
+                "batch-size": 8,
+                "flush-interval": 0.1
+            })
+            tracer.start()
+
+            with tracer.span("outside") as span:
+                self.assertIsNone(span)
+            with tracer.trace("command", user=1) as root:
+                with tracer.span("parse"):
+                    pass
+                with self.assertRaises(KeyError):
+                    with tracer.span("query", statement="SELECT"):
+                        raise KeyError("x")
+            tracer.stop()
+
+            with open(path) as f:
+                spans = json.loads(f.readline())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+
+        self.assertEqual(sorted(s["name"] for s in spans), ["command", "parse", "query"])
+        self.assertEqual({s["traceId"] for s in spans}, {root.trace_id})
+        children = [s for s in spans if s["name"] != "command"]
+        self.assertTrue(all(s["parentSpanId"] == root.span_id for s in children))
+        self.assertEqual([s["status"]["code"] for s in children if s["name"] == "query"], [2])
+
+
+class ProfilingTests(unittest.TestCase):
+    """
+    Testing suite for the module :mod:`mate_bot.profiling`
+    """
+
+    def test_profile_updates(self):
+        """
+        Verify that :class:`mate_bot.profiling.Profiler` aggregates and dumps the statistics per executor
+        """
+
+        import os
+        import pstats
+        import tempfile
+        from mate_bot.profiling import profiler, profile_update
+
+        class Executor:
+            calls = 0
+
+            @profile_update
+            def __call__(self, update, context):
+                Executor.calls += 1
+                return sum(range(update))
+
+        executor = Executor()
+        self.assertEqual(executor(10, None), 45)
+        self.assertRaises(ValueError, profiler.start)
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertTrue(profiler.start(updates=2, seconds=60, directory=directory))
+            self.assertFalse(profiler.start(updates=2, directory=directory))
+            executor(100, None)
+            executor(100, None)
+            self.assertFalse(profiler.active)
+            executor(100, None)
+
+            self.assertEqual(len(profiler.last_dumps), 1)
+            self.assertTrue(profiler.last_dumps[0].endswith("-Executor.pstats"))
+            stats = pstats.Stats(profiler.last_dumps[0])
+            self.assertGreater(stats.total_calls, 0)
+            self.assertEqual(os.listdir(directory), [os.path.basename(profiler.last_dumps[0])])
+
+        self.assertEqual(Executor.calls, 4)
+
+
+class BackupTests(unittest.TestCase):
+    """
+    Testing suite for the module :mod:`mate_bot.state.backup`
+    """
+
+    def test_read_archive(self):
+        """
+        Verify the dependency order of the tables and :func:`mate_bot.state.backup.read_archive`
+        """
+
+        import io
+        import json
+        from mate_bot.state.backup import read_archive, FORMAT, VERSION
+        from mate_bot.state.dbhelper import DATABASE_SCHEMA
+
+        order = DATABASE_SCHEMA.dependency_order()
+        self.assertEqual(sorted(order), sorted(DATABASE_SCHEMA))
+        self.assertLess(order.index("users"), order.index("transactions"))
+        self.assertLess(order.index("collectives"), order.index("collective_messages"))
+
+        lines = [
+            {"format": FORMAT, "version": VERSION},
+            {"table": "users", "columns": ["id", "name"]},
+            [1, "a"], [2, "b"], [3, "c"],
+            {"table": "externals", "columns": ["id", "internal", "external"]},
+            {"table": "transactions", "columns": ["id", "sender", "receiver", "amount"]},
+            [1, 1, 2, 42]
+        ]
+        archive = "".join(json.dumps(line) + "\n" for line in lines)
+        batches = list(read_archive(io.StringIO(archive), batch_size=2))
+        self.assertEqual(batches, [
+            ("users", ["id", "name"], [[1, "a"], [2, "b"]]),
+            ("users", ["id", "name"], [[3, "c"]]),
+            ("externals", ["id", "internal", "external"], []),
+            ("transactions", ["id", "sender", "receiver", "amount"], [[1, 1, 2, 42]])
+        ])
+
+        invalid = json.dumps(lines[0]) + "\n" + json.dumps({"table": "users", "columns": ["id; DROP"]})
+        self.assertRaises(ValueError, list, read_archive(io.StringIO(invalid)))
+        self.assertRaises(ValueError, list, read_archive(io.StringIO("{}\n")))
 
 
 class StateTests(unittest.TestCase):
@@ -373,6 +1333,433 @@ class StateTests(unittest.TestCase):
 
         pass
 
+    def test_fast_consume_fallbacks(self):
+        """
+        Verify that :func:`mate_bot.state.transactions.fast_consume` falls back without touching balances
+        """
+
+        from unittest import mock
+        import telegram
+        from mate_bot.state.dbhelper import BackendHelper
+        from mate_bot.state.transactions import fast_consume
+
+        class Connection:
+            committed = False
+            closed = False
+
+            def commit(self):
+                self.committed = True
+
+            def close(self):
+                self.closed = True
+
+        sender = telegram.User(42, "Alice", False, username="alice")
+        community = {"id": 1, "tid": None, "name": "Community", "username": None, "external": 0, "creditor": None}
+        internal = {"id": 2, "tid": 42, "name": "Alice", "username": "alice", "external": 0, "creditor": None}
+        external = dict(internal, external=1)
+
+        for values in ([community], [internal], [external, community], [dict(internal, name="Bob"), community]):
+            queries = []
+            connection = Connection()
+
+            def execute(query, arguments=None, **kwargs):
+                queries.append(query)
+                return len(values), values, connection
+
+            with mock.patch.object(BackendHelper, "_execute_no_commit", side_effect=execute):
+                self.assertIsNone(fast_consume(sender, 100, "consume: 1x drink"))
+            self.assertEqual(len(queries), 1)
+            self.assertFalse(connection.committed)
+            self.assertTrue(connection.closed)
+
+        self.assertRaises(ValueError, fast_consume, sender, 0, "consume: 0x drink")
+
+    def test_send_transaction_log(self):
+        """
+        Verify the log messages and digest entries of :func:`mate_bot.state.transactions.send_transaction_log`
+        """
+
+        from unittest import mock
+        import telegram
+        from mate_bot.config import config
+        from mate_bot.state import transactions
+
+        bot = telegram.Bot("123456:ABCDEF")
+        chats = [10, {"chat": 20, "interval": 60, "size": 5}]
+        with mock.patch.dict(config["chats"], {"transactions": chats}), \
+                mock.patch.object(transactions.outbound_queue, "submit") as submit, \
+                mock.patch.object(transactions.transaction_digest, "add") as add:
+            transactions.send_transaction_log(bot, "Alice (alice)", "Community", 150, "consume: 1x drink")
+
+        self.assertEqual(submit.call_count, 1)
+        self.assertEqual(submit.call_args[0][:3], (10, bot.send_message, 10))
+        self.assertIn("Sender: Alice (alice)\nReceiver: Community\nAmount: 1.50€", submit.call_args[0][3])
+        add.assert_called_once_with(bot, 20, "Alice (alice) → Community: 1.50€ `consume: 1x drink`", 60, 5)
+        self.assertRaises(TypeError, transactions.send_transaction_log, None, "a", "b", 1, None)
+
+    def test_transaction_digest(self):
+        """
+        Verify the splitting and the size- and time-triggered flushing of transaction digests
+        """
+
+        from unittest import mock
+        from mate_bot.config import config
+        from mate_bot.state import transactions
+        from mate_bot.state.transactions import TransactionDigest
+
+        class Bot:
+            def send_message(self, chat, text, **kwargs):
+                pass
+
+        sent = []
+        bot = Bot()
+
+        def submit(key, func, chat, text, **kwargs):
+            self.assertEqual(func, bot.send_message)
+            self.assertEqual(key, chat)
+            sent.append((chat, text))
+
+        limit = TransactionDigest.MAX_MESSAGE_LENGTH
+        self.assertEqual(len(TransactionDigest._split(["a"])), 1)
+        entries = ["x" * 1000] * 9
+        messages = TransactionDigest._split(entries)
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(all(len(m) <= limit for m in messages))
+        self.assertTrue(messages[0].startswith("*Transaction digest* (9 transactions)"))
+        self.assertEqual(sum(m.count("x" * 1000) for m in messages), 9)
+        self.assertEqual(len(TransactionDigest._split(["y" * (limit - 10)] * 2)), 3)
+
+        now = [100.0]
+        digest = TransactionDigest()
+        with mock.patch.object(transactions.outbound_queue, "submit", side_effect=submit), \
+                mock.patch.object(transactions.time, "monotonic", side_effect=lambda: now[0]):
+
+            digest.add(bot, 10, "first", 60, 3)
+            digest.add(bot, 10, "second", 60, 3)
+            digest.add(bot, 20, "other", 30, 3)
+            self.assertEqual(sent, [])
+            digest.add(bot, 10, "third", 60, 3)
+            self.assertEqual(len(sent), 1)
+            self.assertEqual(sent[0][0], 10)
+            self.assertTrue(sent[0][1].endswith("\nfirst\nsecond\nthird"))
+
+            digest.add(bot, 10, "fourth", 60, 3)
+            now[0] = 129.0
+            digest.flush_due()
+            self.assertEqual(len(sent), 1)
+            now[0] = 130.0
+            digest.flush_due()
+            self.assertEqual(sent[1:], [(20, "*Transaction digest* (1 transaction)\n\nother")])
+            now[0] = 160.0
+            digest.flush_due()
+            self.assertEqual(sent[2][0], 10)
+            self.assertTrue(sent[2][1].endswith("\nfourth"))
+
+            digest.flush_due()
+            digest.flush()
+            self.assertEqual(len(sent), 3)
+
+            digest.add(bot, 20, "last", 30, 3)
+            digest.flush()
+            self.assertEqual(sent[3], (20, "*Transaction digest* (1 transaction)\n\nlast"))
+
+        job_queue = mock.Mock()
+        chats = [10, {"chat": 20, "interval": 60, "size": 5}, {"chat": 30, "interval": 15, "size": 5}]
+        with mock.patch.dict(config["chats"], {"transactions": chats}):
+            digest.schedule(job_queue)
+        self.assertEqual(job_queue.run_repeating.call_args[0][1], 15)
+        with mock.patch.dict(config["chats"], {"transactions": {"chat": 20, "interval": 60, "size": 5}}):
+            digest.schedule(job_queue)
+        self.assertEqual(job_queue.run_repeating.call_args[0][1], 60)
+        job_queue.reset_mock()
+        with mock.patch.dict(config["chats"], {"transactions": 10}):
+            self.assertIsNone(digest.schedule(job_queue))
+        job_queue.run_repeating.assert_not_called()
+
+    def test_consumption_reasons(self):
+        """
+        Verify :func:`mate_bot.state.consumptions.parse_reason`
+        """
+
+        from mate_bot.state.consumptions import parse_reason
+
+        self.assertEqual(parse_reason("consume: 3x drink"), ("drink", 3))
+        self.assertEqual(parse_reason("consume: water"), ("water", 1))
+        self.assertIsNone(parse_reason("send: <no description>"))
+        self.assertIsNone(parse_reason(None))
+
+    def test_balance_series(self):
+        """
+        Verify :func:`mate_bot.state.balances.fill_series` and the sparkline of /trend
+        """
+
+        import datetime
+        from mate_bot.state.balances import fill_series
+        from mate_bot.commands.trend import sparkline
+
+        start = datetime.date(2020, 5, 10)
+        rows = [
+            {"day": datetime.date(2020, 5, 11), "balance": -100},
+            {"day": datetime.date(2020, 5, 13), "balance": 600}
+        ]
+        self.assertEqual(fill_series(start, 5, rows), [None, -100, -100, 600, 600])
+        rows.insert(0, {"day": datetime.date(2020, 4, 1), "balance": 50})
+        self.assertEqual(fill_series(start, 2, rows), [50, -100])
+
+        self.assertEqual(sparkline([None, 0, 700, 350]), " ▁█▅")
+        self.assertEqual(sparkline([3, 3]), "▁▁")
+        self.assertEqual(sparkline([None]), " ")
+
+    def test_ledger(self):
+        """
+        Verify the analytics of :class:`mate_bot.state.ledger.Ledger` (requires ``numpy``)
+        """
+
+        import datetime
+        from mate_bot.state.ledger import Ledger
+
+        ledger = Ledger()
+        if not ledger.available:
+            self.skipTest("numpy is not installed")
+
+        start = datetime.datetime(2020, 5, 1)
+        day = 86400
+        base = int(start.timestamp())
+        ledger._append([
+            (1, 2, 1, 100, base, "drink"),
+            (2, 3, 1, 50, base + day, "water"),
+            (3, 3, 1, 100, base + day + 10, "drink"),
+            (4, 1, 2, 300, base + 3 * day, None)
+        ])
+
+        self.assertEqual(ledger.net_flows(), {1: -50, 2: 200, 3: -150})
+        self.assertEqual(ledger.income_by_consumable(), {"drink": (2, 200), "water": (1, 50)})
+        self.assertEqual(ledger.income_by_consumable(start + datetime.timedelta(days=1)), {"drink": (1, 100), "water": (1, 50)})
+        self.assertEqual(ledger.top_debtors(count=1, exclude=[1]), [(3, -150)])
+        self.assertEqual(
+            ledger.turnover(datetime.timedelta(days=2), start, start + datetime.timedelta(days=4)),
+            [(start, 3, 250), (start + datetime.timedelta(days=2), 1, 300)]
+        )
+
+    def test_transaction_log_formats(self):
+        """
+        Verify the output formats of :class:`mate_bot.state.transactions.TransactionLog`
+        """
+
+        import array
+        import datetime
+        from mate_bot.state.transactions import TransactionLog
+
+        class Log(TransactionLog):
+            def __init__(self):
+                self._uid = 2
+                self._limit = None
+                self._names = {1: "community", 2: "me"}
+                self._ids = array.array("q", [7, 9])
+                self._partners = array.array("q", [1, 1])
+                self._amounts = array.array("q", [-150, 1000])
+                self._timestamps = array.array("q", [1588334400, 1588420800])
+                self._reasons = ["consume: 1x drink", None]
+
+        log = Log()
+        self.assertEqual(log.history[0], {
+            "id": 7,
+            "sender": 2,
+            "receiver": 1,
+            "amount": 150,
+            "reason": "consume: 1x drink",
+            "registered": datetime.datetime(2020, 5, 1, 12)
+        })
+        self.assertEqual([e["receiver"] for e in log.to_json()], [1, 2])
+        self.assertEqual(
+            log.to_csv().splitlines()[1:],
+            [
+                '"7","me","community","150","-150","consume: 1x drink","2020-05-01T12:00:00"',
+                '"9","community","me","1000","1000","","2020-05-02T12:00:00"'
+            ]
+        )
+        entries = log.to_list(True)
+        self.assertEqual(entries[0], "01.05.2020 12:00:  -1.50: me >> community        :: consume: 1x drink")
+        self.assertTrue(entries[1].endswith(":: <no description>"))
+        self.assertIn("+10.00: me <<", entries[1])
+
+    def test_archive_cutoff(self):
+        """
+        Verify :func:`mate_bot.state.archive.get_cutoff`
+        """
+
+        import datetime
+        from mate_bot.state.archive import get_cutoff
+
+        self.assertEqual(get_cutoff(0, datetime.date(2020, 5, 17)), datetime.date(2020, 5, 1))
+        self.assertEqual(get_cutoff(4, datetime.date(2020, 5, 17)), datetime.date(2020, 1, 1))
+        self.assertEqual(get_cutoff(5, datetime.date(2020, 5, 17)), datetime.date(2019, 12, 1))
+        self.assertEqual(get_cutoff(25, datetime.date(2020, 1, 1)), datetime.date(2017, 12, 1))
+        self.assertRaises(ValueError, get_cutoff, -1)
+
+    def test_archive_checkpoints(self):
+        """
+        Verify that balance checkpoints and the remaining transactions add up to the full history
+        """
+
+        import array
+        from unittest import mock
+        from mate_bot.state import archive, transactions
+
+        history = [
+            (1, 1, 2, 100, "send", None),
+            (2, 2, 3, 30, "send", None),
+            (3, 3, 1, 50, "send", None),
+            (4, 2, 1, 20, "send", None),
+            (5, 1, 3, 10, "send", None)
+        ]
+        archived, remaining = history[:3], history[3:]
+        self.assertEqual(archive._sum_checkpoints(archived), {1: (-50, 3), 2: (70, 2), 3: (-20, 3)})
+        self.assertEqual(archive._sum_checkpoints([]), {})
+
+        checkpoints = archive._sum_checkpoints(archived)
+        balances = {uid: 0 for uid in (1, 2, 3)}
+        for _, sender, receiver, amount, _, _ in history:
+            balances[sender] -= amount
+            balances[receiver] += amount
+
+        def create_log(uid, rows, include_archive):
+            log = transactions.TransactionLog.__new__(transactions.TransactionLog)
+            log._uid = uid
+            log._limit = None
+            log._archived = include_archive
+            log._amounts = array.array("q", [
+                (-amount if sender == uid else amount)
+                for _, sender, receiver, amount, _, _ in rows if uid in (sender, receiver)
+            ])
+            return log
+
+        for uid in balances:
+            with mock.patch.object(transactions, "get_checkpoint", return_value=(checkpoints[uid][0], 3)), \
+                    mock.patch.object(transactions.user, "MateBotUser") as mate_bot_user:
+                mate_bot_user.return_value.balance = balances[uid]
+                self.assertTrue(create_log(uid, history, True).validate())
+                self.assertTrue(create_log(uid, remaining, False).validate())
+                self.assertFalse(create_log(uid, remaining, True).validate())
+                self.assertFalse(create_log(uid, history, False).validate())
+                self.assertFalse(create_log(uid, remaining, False).validate(5))
+
+        log = create_log(1, history, True)
+        log._limit = 2
+        self.assertIsNone(log.validate())
+
+    def test_archive_references(self):
+        """
+        Verify that foreign keys referencing the transactions block the archival and can be dropped
+        """
+
+        from unittest import mock
+        from mate_bot.state import archive
+        from mate_bot.state.dbhelper import BackendHelper
+
+        queries = []
+        references = [{"TABLE_NAME": "consumptions", "CONSTRAINT_NAME": "consumptions_ibfk_1"}]
+
+        def execute(query, arguments=None):
+            queries.append(query)
+            if query.startswith("SELECT"):
+                return len(references), references
+            return 0, []
+
+        with mock.patch.object(BackendHelper, "_execute", side_effect=execute):
+            self.assertRaises(RuntimeError, archive._check_references)
+            self.assertEqual(archive.drop_references(), 1)
+            self.assertEqual(queries[-1], "ALTER TABLE `consumptions` DROP FOREIGN KEY `consumptions_ibfk_1`")
+            references = []
+            self.assertIsNone(archive._check_references())
+            self.assertEqual(archive.drop_references(), 0)
+
+    def test_backfill_consumptions(self):
+        """
+        Verify that :func:`mate_bot.state.consumptions.backfill_consumptions` reads both transactions tables
+        """
+
+        import datetime
+        from unittest import mock
+        from mate_bot.state import consumptions
+        from mate_bot.state.dbhelper import BackendHelper
+
+        registered = datetime.datetime(2020, 5, 17, 12)
+        batches = [
+            [
+                {"id": 3, "amount": 100, "reason": "consume: drink", "registered": registered},
+                {"id": 8, "amount": 300, "reason": "consume: 2x pizza", "registered": registered},
+                {"id": 9, "amount": 50, "reason": "consume: something else", "registered": registered}
+            ],
+            []
+        ]
+        inserted = []
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def executemany(self, query, rows):
+                inserted.extend(rows)
+
+        connection = mock.Mock()
+        connection.cursor.return_value = Cursor()
+
+        with mock.patch.object(BackendHelper, "_execute", side_effect=lambda *a: (0, batches.pop(0))) as execute, \
+                mock.patch.object(consumptions.pymysql, "connect", return_value=connection):
+            self.assertEqual(consumptions.backfill_consumptions(2), 2)
+
+        query, arguments = execute.call_args_list[0][0]
+        self.assertIn("FROM transactions_archive", query)
+        self.assertIn("FROM transactions WHERE", query)
+        self.assertEqual(arguments, (0, 0, 2))
+        self.assertEqual(execute.call_args_list[1][0][1], (9, 9, 2))
+        self.assertEqual(inserted, [(3, "drink", 1, 100, registered), (8, "pizza", 2, 300, registered)])
+        connection.commit.assert_called_once_with()
+        connection.close.assert_called_once_with()
+
+    def test_db_add_unique_keys(self):
+        """
+        Verify that the upgrade adds missing unique keys after deleting duplicates and skips existing ones
+        """
+
+        from unittest import mock
+        from mate_bot.state.dbhelper import BackendHelper, DATABASE_SCHEMA
+
+        table = DATABASE_SCHEMA["collective_messages"]
+        indexes = [{"INDEX_NAME": "PRIMARY", "COLUMN_NAME": "id"}]
+        queries = []
+
+        def execute(query, arguments=None):
+            queries.append(query)
+            if query.startswith("SELECT"):
+                self.assertEqual(arguments, ("collective_messages",))
+                return len(indexes), indexes
+            if query.startswith("DELETE"):
+                return 3, []
+            return 0, []
+
+        with mock.patch.object(BackendHelper, "_execute", side_effect=execute):
+            added = BackendHelper.add_unique_keys(table)
+            self.assertEqual([(str(unique), deleted) for unique, deleted in added], [
+                ("UNIQUE KEY (collectives_id, chat_id)", 3)
+            ])
+            self.assertEqual(len(queries), 3)
+            self.assertIn("older.collectives_id = newer.collectives_id AND older.chat_id = newer.chat_id", queries[1])
+            self.assertIn("older.id < newer.id", queries[1])
+            self.assertEqual(queries[2], "ALTER TABLE collective_messages ADD UNIQUE KEY (collectives_id, chat_id)")
+
+            queries.clear()
+            indexes += [
+                {"INDEX_NAME": "collectives_id", "COLUMN_NAME": "collectives_id"},
+                {"INDEX_NAME": "collectives_id", "COLUMN_NAME": "chat_id"}
+            ]
+            self.assertEqual(BackendHelper.add_unique_keys(table), [])
+            self.assertEqual(len(queries), 1)
+
     @significance(6)
     def test_db_schema_conversion(self):
         """
@@ -420,6 +1807,17 @@ class StateTests(unittest.TestCase):
             "FOREIGN KEY (external) REFERENCES users(id) ON DELETE CASCADE);"
         )
 
+        self.assertEqual(
+            SCHEMA["collective_messages"]._to_string(0),
+            "CREATE TABLE collective_messages ("
+            "`id` INT NOT NULL PRIMARY KEY AUTO_INCREMENT, "
+            "`collectives_id` INT NOT NULL, "
+            "`chat_id` BIGINT NOT NULL, "
+            "`msg_id` INT NOT NULL, "
+            "UNIQUE KEY (collectives_id, chat_id), "
+            "FOREIGN KEY (collectives_id) REFERENCES collectives(id) ON DELETE CASCADE);"
+        )
+
     @significance(5)
     def test_db_execute_no_commit(self):
         """